@@ -25,9 +25,11 @@ target_metadata = Base.metadata
 # Override sqlalchemy.url from environment if available
 database_url = os.getenv("DATABASE_URL")
 if database_url:
-    # Convert asyncpg URL to psycopg2 URL for Alembic
+    # Convert async driver URLs to their sync counterparts for Alembic
     if "postgresql+asyncpg" in database_url:
         database_url = database_url.replace("postgresql+asyncpg", "postgresql")
+    if "sqlite+aiosqlite" in database_url:
+        database_url = database_url.replace("sqlite+aiosqlite", "sqlite")
     config.set_main_option("sqlalchemy.url", database_url)
 
 
@@ -55,7 +57,10 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite cannot ALTER constraints in place; batch mode copies the table
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
@@ -0,0 +1,63 @@
+"""Initial schema: users, achievements and awards
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('language', sa.Enum('RU', 'EN', name='languageenum'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'achievements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name_ru', sa.String(), nullable=False),
+        sa.Column('name_en', sa.String(), nullable=False),
+        sa.Column('description_ru', sa.Text(), nullable=False),
+        sa.Column('description_en', sa.Text(), nullable=False),
+        sa.Column('points', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_achievements_id', 'achievements', ['id'])
+
+    op.create_table(
+        'user_achievements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('achievement_id', sa.Integer(), nullable=False),
+        sa.Column('awarded_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['achievement_id'], ['achievements.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_user_achievements_id', 'user_achievements', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_achievements_id', table_name='user_achievements')
+    op.drop_table('user_achievements')
+    op.drop_index('ix_achievements_id', table_name='achievements')
+    op.drop_table('achievements')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='languageenum').drop(op.get_bind(), checkfirst=True)
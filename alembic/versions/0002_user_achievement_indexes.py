@@ -0,0 +1,40 @@
+"""Index user_achievements: unique (user_id, achievement_id), (user_id, awarded_at), achievement_id
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the earliest award of each repeated (user, achievement) pair so the
+    # unique constraint can be created on existing data
+    op.execute(
+        "DELETE FROM user_achievements WHERE id NOT IN ("
+        "SELECT MIN(id) FROM user_achievements GROUP BY user_id, achievement_id)"
+    )
+    with op.batch_alter_table('user_achievements') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_user_achievements_user_achievement', ['user_id', 'achievement_id']
+        )
+    op.create_index(
+        'ix_user_achievements_user_id_awarded_at', 'user_achievements', ['user_id', 'awarded_at']
+    )
+    op.create_index('ix_user_achievements_achievement_id', 'user_achievements', ['achievement_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_achievements_achievement_id', table_name='user_achievements')
+    op.drop_index('ix_user_achievements_user_id_awarded_at', table_name='user_achievements')
+    with op.batch_alter_table('user_achievements') as batch_op:
+        batch_op.drop_constraint('uq_user_achievements_user_achievement', type_='unique')
@@ -0,0 +1,65 @@
+"""Award aggregate tables: user_stats and user_streaks
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 12:00:00.000000
+
+Existing award history is folded into user_stats here; user_streaks is
+filled by ``python -m app.commands.rebuild_aggregates`` after upgrading.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('achievement_count', sa.Integer(), nullable=False),
+        sa.Column('total_points', sa.Integer(), nullable=False),
+        sa.Column('last_awarded_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index(
+        'ix_user_stats_achievement_count', 'user_stats', [sa.text('achievement_count DESC'), 'user_id']
+    )
+    op.create_index(
+        'ix_user_stats_total_points', 'user_stats', [sa.text('total_points DESC'), 'user_id']
+    )
+
+    op.create_table(
+        'user_streaks',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('current_start', sa.Date(), nullable=False),
+        sa.Column('current_length', sa.Integer(), nullable=False),
+        sa.Column('longest_start', sa.Date(), nullable=False),
+        sa.Column('longest_length', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index(
+        'ix_user_streaks_longest_length', 'user_streaks', [sa.text('longest_length DESC'), 'user_id']
+    )
+
+    op.execute(
+        "INSERT INTO user_stats (user_id, achievement_count, total_points, last_awarded_at) "
+        "SELECT ua.user_id, COUNT(ua.id), SUM(a.points), MAX(ua.awarded_at) "
+        "FROM user_achievements ua JOIN achievements a ON a.id = ua.achievement_id "
+        "GROUP BY ua.user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_streaks_longest_length', table_name='user_streaks')
+    op.drop_table('user_streaks')
+    op.drop_index('ix_user_stats_total_points', table_name='user_stats')
+    op.drop_index('ix_user_stats_achievement_count', table_name='user_stats')
+    op.drop_table('user_stats')
@@ -0,0 +1,48 @@
+"""Daily activity rollup: user_daily_activity
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_daily_activity',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('award_count', sa.Integer(), nullable=False),
+        sa.Column('points', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'day'),
+    )
+    op.create_index(
+        'ix_user_daily_activity_day', 'user_daily_activity', ['day', 'user_id', 'award_count', 'points']
+    )
+
+    # Award days are UTC calendar days
+    if op.get_bind().dialect.name == 'postgresql':
+        day = "CAST(timezone('UTC', ua.awarded_at) AS DATE)"
+    else:
+        day = "date(ua.awarded_at)"
+    op.execute(
+        "INSERT INTO user_daily_activity (user_id, day, award_count, points) "
+        f"SELECT ua.user_id, {day}, COUNT(ua.id), SUM(a.points) "
+        "FROM user_achievements ua JOIN achievements a ON a.id = ua.achievement_id "
+        f"GROUP BY ua.user_id, {day}"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_daily_activity_day', table_name='user_daily_activity')
+    op.drop_table('user_daily_activity')
@@ -1,12 +1,23 @@
 """Achievement API endpoints."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
-from app.core.database import get_db
-from app.schemas import AchievementCreate, AchievementResponse, UserAchievementCreate
+from app.core.database import get_db, get_read_db
+from app.core.http_cache import CATALOG_CACHE_MAX_AGE, cached_json_response, make_etag
+from app.core.pagination import PageParams, next_cursor_headers, page_params
+from app.schemas import (
+    AchievementCreate, AchievementResponse, UserAchievementCreate, UserAchievementResponse,
+    UserAchievementBatchResult, UserAchievementQueued, AwardStatus
+)
 from app.services.achievement_service import AchievementService
+from app.services.award_feed import award_feed, stream_events
+from app.services.award_queue import AwardQueueFull, award_queue
+from app.services.export_service import ExportService, ExportFormat
 
 router = APIRouter()
 
@@ -19,28 +30,97 @@ async def create_achievement(achievement: AchievementCreate, db: AsyncSession =
 
 
 @router.get("/", response_model=List[AchievementResponse])
-async def get_achievements(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    """Get all achievements."""
+async def get_achievements(
+    request: Request,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get all achievements. Pass the ``X-Next-Cursor`` header value as ``after`` for the next page."""
     service = AchievementService(db)
-    return await service.get_achievements(skip=skip, limit=limit)
+    achievements = await service.get_achievements_json(
+        skip=page.skip, limit=page.limit, after_id=page.after_id
+    )
+    return cached_json_response(
+        request, achievements.body, achievements.etag, CATALOG_CACHE_MAX_AGE,
+        next_cursor_headers(achievements, page.limit)
+    )
 
 
 @router.get("/{achievement_id}", response_model=AchievementResponse)
-async def get_achievement(achievement_id: int, db: AsyncSession = Depends(get_db)):
+async def get_achievement(achievement_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get achievement by ID."""
     service = AchievementService(db)
-    achievement = await service.get_achievement(achievement_id)
-    if not achievement:
+    body = await service.get_achievement_json(achievement_id)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Achievement not found"
         )
-    return achievement
+    return cached_json_response(request, body, make_etag(body), CATALOG_CACHE_MAX_AGE)
+
+
+# Error details for batch statuses, matching the single-award path
+_AWARD_REJECTIONS = {
+    AwardStatus.DUPLICATE: "User already has this achievement",
+    AwardStatus.UNKNOWN_USER: "User not found",
+    AwardStatus.UNKNOWN_ACHIEVEMENT: "Achievement not found",
+}
 
 
-@router.post("/award", status_code=status.HTTP_201_CREATED)
-async def award_achievement(award: UserAchievementCreate, db: AsyncSession = Depends(get_db)):
-    """Award achievement to user."""
+async def _queue_award(award: UserAchievementCreate, wait: bool, db: AsyncSession):
+    """Hand an award to the write-behind queue."""
+    try:
+        future = await award_queue.enqueue(db, award)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except AwardQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Award queue is full",
+            headers={"Retry-After": "1"}
+        )
+    if not wait:
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=UserAchievementQueued(user_id=award.user_id, achievement_id=award.achievement_id).model_dump()
+        )
+    try:
+        # Shielded: a client disconnect must not cancel the batch result for others
+        result = await asyncio.shield(future)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    if result.status != AwardStatus.AWARDED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=_AWARD_REJECTIONS[result.status]
+        )
+    return result
+
+
+@router.post(
+    "/award",
+    response_model=UserAchievementResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": UserAchievementQueued}}
+)
+async def award_achievement(
+    award: UserAchievementCreate,
+    wait: bool = Query(True, description="With the award queue enabled, false returns 202 before the commit"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Award achievement to user.
+    
+    With the award queue enabled the award is committed together with
+    other pending awards by the background writer.
+    """
+    if award_queue.running:
+        return await _queue_award(award, wait, db)
     try:
         service = AchievementService(db)
         return await service.award_achievement(award)
@@ -53,4 +133,46 @@ async def award_achievement(award: UserAchievementCreate, db: AsyncSession = Dep
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/award/batch", response_model=List[UserAchievementBatchResult])
+async def award_achievements(awards: List[UserAchievementCreate], db: AsyncSession = Depends(get_db)):
+    """Award many achievements in one request, with a result per item."""
+    try:
+        service = AchievementService(db)
+        return await service.award_achievements(awards)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+
+@router.get("/awards/export")
+async def export_awards(
+    format: ExportFormat = ExportFormat.NDJSON,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Stream all awards as NDJSON or CSV."""
+    service = ExportService(db)
+    return StreamingResponse(
+        service.export_awards(format),
+        media_type=format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="awards.{format.value}"'}
+    )
+
+
+@router.get("/awards/stream")
+async def stream_awards(user_id: Optional[int] = None):
+    """Server-Sent Events stream of new awards, optionally for one user."""
+    return StreamingResponse(
+        stream_events(award_feed, user_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Tell nginx not to buffer the stream
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -0,0 +1,19 @@
+"""Health and diagnostics API endpoints."""
+
+from fastapi import APIRouter
+
+from app.core.database import engine, read_engine, pool_stats
+
+router = APIRouter()
+
+
+@router.get("/pool")
+async def get_pool_stats():
+    """Connection pool counters: checkouts, wait/hold histograms, in-use connections, timeouts."""
+    return pool_stats(engine)
+
+
+@router.get("/pool/read")
+async def get_read_pool_stats():
+    """Counters for the read replica pool (the primary pool when no replica is configured)."""
+    return pool_stats(read_engine)
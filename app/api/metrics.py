@@ -0,0 +1,18 @@
+"""Metrics API endpoint."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.database import engine, read_engine, pool_stats
+from app.core.metrics import CONTENT_TYPE, pool_samples, registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Application metrics in the Prometheus text exposition format."""
+    pools = {"primary": pool_stats(engine)}
+    if read_engine is not engine:
+        pools["read"] = pool_stats(read_engine)
+    return PlainTextResponse(registry.render(pool_samples(pools)), media_type=CONTENT_TYPE)
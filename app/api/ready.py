@@ -0,0 +1,18 @@
+"""Readiness API endpoint."""
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.services.warmup import readiness
+
+router = APIRouter()
+
+
+@router.get("/ready")
+async def get_readiness():
+    """200 once this worker has warmed up, 503 before; health checks route traffic on it."""
+    return JSONResponse(
+        readiness.stats(),
+        status_code=status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Cache-Control": "no-store"}
+    )
@@ -1,37 +1,141 @@
 """Statistics API endpoints."""
 
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.services.statistics_service import StatisticsService
+from app.core.database import get_read_db
+from app.core.http_cache import STATS_CACHE_MAX_AGE, cached_json_response, make_etag
+from app.core.pagination import MAX_PAGE_SIZE, dump_json
+from app.services.statistics_service import StatisticsService, PointsSource, resolve_window
+from app.services.statistics_snapshot import statistics_snapshots
 
 router = APIRouter()
 
+# Response header carrying the time the served snapshot was computed
+COMPUTED_AT_HEADER = "X-Computed-At"
+
+
+async def _serve_snapshot(request: Request, db: AsyncSession, method: str, *args) -> Response:
+    """Return a statistics snapshot, exposing when it was computed."""
+    snapshot = await statistics_snapshots.get(db, method, *args)
+    return cached_json_response(
+        request, snapshot.body, snapshot.etag, STATS_CACHE_MAX_AGE,
+        {COMPUTED_AT_HEADER: snapshot.computed_at.isoformat()},
+        stale_while_revalidate=int(statistics_snapshots.stale_while_revalidate)
+    )
+
+
+def _serve_json(request: Request, value) -> Response:
+    """Render a live statistics result, tagged with a digest of the body."""
+    body = dump_json(jsonable_encoder(value))
+    return cached_json_response(request, body, make_etag(body), STATS_CACHE_MAX_AGE)
+
 
 @router.get("/top-by-achievements")
-async def get_top_by_achievements(db: AsyncSession = Depends(get_db)):
+async def get_top_by_achievements(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get user with most achievements."""
-    service = StatisticsService(db)
-    return await service.get_top_by_achievements()
+    return await _serve_snapshot(request, db, "get_top_by_achievements")
 
 
 @router.get("/top-by-points")
-async def get_top_by_points(db: AsyncSession = Depends(get_db)):
+async def get_top_by_points(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get user with most points."""
-    service = StatisticsService(db)
-    return await service.get_top_by_points()
+    return await _serve_snapshot(request, db, "get_top_by_points")
+
+
+async def _serve_window_snapshot(
+    request: Request, db: AsyncSession, method: str,
+    start: Optional[date], end: Optional[date], days: Optional[int]
+):
+    """Serve a date-window statistic; relative windows are pinned to dates first."""
+    try:
+        start, end = resolve_window(start, end, days)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return await _serve_snapshot(request, db, method, start, end)
+
+
+@router.get("/top-by-achievements/window")
+async def get_top_by_achievements_in_window(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    days: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get user with most achievements in a date window (``start``/``end`` inclusive, or last ``days`` days)."""
+    return await _serve_window_snapshot(
+        request, db, "get_top_by_achievements_in_window", start, end, days
+    )
+
+
+@router.get("/top-by-points/window")
+async def get_top_by_points_in_window(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    days: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get user with most points in a date window; only ``end`` gives totals as of that date."""
+    return await _serve_window_snapshot(
+        request, db, "get_top_by_points_in_window", start, end, days
+    )
 
 
 @router.get("/min-max-points-difference")
-async def get_min_max_points_difference(db: AsyncSession = Depends(get_db)):
+async def get_min_max_points_difference(
+    request: Request,
+    source: PointsSource = PointsSource.PRECOMPUTED,
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get users with min and max points difference."""
-    service = StatisticsService(db)
-    return await service.get_min_max_points_difference()
+    return await _serve_snapshot(request, db, "get_min_max_points_difference", source)
 
 
 @router.get("/7-day-streak-users")
-async def get_7_day_streak_users(db: AsyncSession = Depends(get_db)):
-    """Get users with 7-day achievement streaks."""
+async def get_7_day_streak_users(
+    request: Request,
+    min_days: int = Query(7, ge=1),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get users with achievement streaks of at least ``min_days`` days (7 by default)."""
+    return await _serve_snapshot(request, db, "get_streak_users", min_days)
+
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a page of the points leaderboard with competition and dense ranks."""
     service = StatisticsService(db)
-    return await service.get_7_day_streak_users()
\ No newline at end of file
+    return _serve_json(request, await service.get_leaderboard(offset=offset, limit=limit))
+
+
+@router.get("/leaderboard/{user_id}")
+async def get_leaderboard_position(
+    user_id: int,
+    request: Request,
+    neighbours: int = Query(5, ge=0, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a user's leaderboard rank and neighbours."""
+    try:
+        service = StatisticsService(db)
+        position = await service.get_leaderboard_position(user_id, neighbours=neighbours)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    return _serve_json(request, position)
@@ -1,12 +1,15 @@
 """User API endpoints."""
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.pagination import PageParams, json_page_response, page_params
 from app.models import User
 from app.schemas import UserCreate, UserResponse
+from app.services.export_service import ExportService, ExportFormat
 from app.services.user_service import UserService
 
 router = APIRouter()
@@ -30,8 +33,22 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
         )
 
 
+@router.get("/export")
+async def export_users(
+    format: ExportFormat = ExportFormat.NDJSON,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Stream all users as NDJSON or CSV."""
+    service = ExportService(db)
+    return StreamingResponse(
+        service.export_users(format),
+        media_type=format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format.value}"'}
+    )
+
+
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get user by ID."""
     service = UserService(db)
     user = await service.get_user(user_id)
@@ -44,14 +61,15 @@ async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/", response_model=List[UserResponse])
-async def get_users(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    """Get all users."""
+async def get_users(page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_read_db)):
+    """Get all users. Pass the ``X-Next-Cursor`` header value as ``after`` for the next page."""
     service = UserService(db)
-    return await service.get_users(skip=skip, limit=limit)
+    users = await service.get_users_json(skip=page.skip, limit=page.limit, after_id=page.after_id)
+    return json_page_response(users, page.limit)
 
 
 @router.get("/{user_id}/achievements")
-async def get_user_achievements(user_id: int, db: AsyncSession = Depends(get_db)):
+async def get_user_achievements(user_id: int, db: AsyncSession = Depends(get_read_db)):
     """Get user achievements in user's language."""
     try:
         service = UserService(db)
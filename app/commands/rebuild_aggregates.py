@@ -0,0 +1,22 @@
+"""Rebuild award aggregate tables from the award log.
+
+Usage::
+
+    python -m app.commands.rebuild_aggregates
+"""
+
+import asyncio
+
+from app.core.database import AsyncSessionLocal
+from app.services.aggregates import rebuild_aggregates
+
+
+async def main() -> None:
+    """Recompute all aggregates in a single transaction."""
+    async with AsyncSessionLocal() as session:
+        await session.run_sync(rebuild_aggregates)
+        await session.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""HTTP caching helpers: strong ETags, conditional GETs and Cache-Control.
+
+ETags are digests of the data a response is rendered from, so every
+process serving the same data hands out the same tag. A request whose
+``If-None-Match`` matches gets an empty ``304 Not Modified``; responses
+carry ``Cache-Control: public, max-age=...`` so nginx (see ``nginx.conf``)
+and clients can reuse them without asking at all.
+"""
+
+import hashlib
+import os
+from typing import Mapping, Optional
+
+from fastapi import Request, Response, status
+
+# Seconds clients and proxies may reuse catalog responses (matches the catalog TTL)
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "60"))
+# Seconds clients and proxies may reuse /stats/* responses
+STATS_CACHE_MAX_AGE = int(os.getenv("STATS_CACHE_MAX_AGE", "10"))
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over ``parts`` (bytes are hashed as-is, anything else by ``repr``)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header value covers ``etag`` (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cached_json_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    max_age: int,
+    headers: Optional[Mapping[str, str]] = None,
+    stale_while_revalidate: int = 0
+) -> Response:
+    """Serve a rendered JSON body, or ``304`` when the client already has this version."""
+    cache_control = f"public, max-age={max_age}"
+    if stale_while_revalidate > 0:
+        cache_control += f", stale-while-revalidate={stale_while_revalidate}"
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
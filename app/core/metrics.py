@@ -0,0 +1,284 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Request latency, in-flight requests and response sizes are recorded by
+``MetricsMiddleware`` per route template; SQL statement timings are
+recorded by cursor execute hooks on every ``Engine``, keyed by a normalised
+statement fingerprint, together with whether SQLAlchemy's compiled cache
+served the statement. Everything is plain dictionaries and counters, cheap
+enough to stay enabled in production.
+"""
+
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CacheStats
+
+from app.core.pool_metrics import LATENCY_BUCKETS, LatencyHistogram
+from app.core.query_budget import record_statement
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Response size bucket upper bounds (bytes)
+SIZE_BUCKETS: Tuple[float, ...] = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Bound on distinct statement fingerprints; the rest are counted as "other"
+MAX_FINGERPRINTS = 500
+MAX_FINGERPRINT_LENGTH = 300
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter family."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Gauge family: a value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self.values[labels] = value
+
+
+class Histogram:
+    """Histogram family backed by one ``LatencyHistogram`` per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.values: Dict[Labels, LatencyHistogram] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        histogram = self.values.get(labels)
+        if histogram is None:
+            histogram = self.values[labels] = LatencyHistogram(self.buckets)
+        histogram.observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for labels, histogram in self.values.items():
+            yield from histogram_samples(self.name, labels, histogram.snapshot())
+
+
+def histogram_samples(name: str, labels: Labels, snapshot: Dict) -> Iterable[str]:
+    """Sample lines for a ``LatencyHistogram.snapshot()``."""
+    for bound, count in snapshot["buckets"].items():
+        yield f"{name}_bucket{_format_labels(labels, ('le', bound))} {count}"
+    yield f"{name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}"
+    yield f"{name}_count{_format_labels(labels)} {snapshot['count']}"
+
+
+class MetricsRegistry:
+    """Named metric families rendered together."""
+
+    def __init__(self):
+        self._families: Dict[str, object] = {}
+
+    def register(self, family):
+        self._families[family.name] = family
+        return family
+
+    def reset(self) -> None:
+        """Clear all recorded values (families stay registered)."""
+        for family in self._families.values():
+            family.values.clear()
+
+    def render(self, extra: Iterable[str] = ()) -> str:
+        lines: List[str] = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(family.samples())
+        lines.extend(extra)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template."
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served."
+))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size by route template.", SIZE_BUCKETS
+))
+db_statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement execution time by statement fingerprint."
+))
+db_compiled_cache = registry.register(Counter(
+    "db_compiled_cache_total", "SQL statements by compiled cache outcome (hit, miss, disabled, no_key)."
+))
+
+_CACHE_RESULTS: Dict[CacheStats, Labels] = {
+    CacheStats.CACHE_HIT: (("result", "hit"),),
+    CacheStats.CACHE_MISS: (("result", "miss"),),
+    CacheStats.CACHING_DISABLED: (("result", "disabled"),),
+    # Plain SQL strings (exec_driver_sql, text() without caching) and DDL
+    CacheStats.NO_CACHE_KEY: (("result", "no_key"),),
+    CacheStats.NO_DIALECT_SUPPORT: (("result", "disabled"),),
+}
+
+
+# (metric suffix, type, help) for the PoolStats counters
+_POOL_FAMILIES = (
+    ("checkouts", "counter", "Connections checked out of the pool."),
+    ("timeouts", "counter", "Checkouts that timed out waiting for a connection."),
+    ("connects", "counter", "New DBAPI connections opened by the pool."),
+    ("invalidations", "counter", "Pooled connections invalidated."),
+    ("in_use", "gauge", "Connections currently checked out."),
+    ("max_in_use", "gauge", "Highest number of connections checked out at once."),
+)
+
+
+def pool_samples(pools: Mapping[str, Dict]) -> List[str]:
+    """Exposition lines for ``pool_stats()`` snapshots, labelled by pool name."""
+    lines: List[str] = []
+    for key, kind, help_text in _POOL_FAMILIES:
+        name = f"db_pool_{key}" if kind == "gauge" else f"db_pool_{key}_total"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for pool, stats in pools.items():
+            if key in stats:
+                lines.append(f"{name}{_format_labels((('pool', pool),))} {stats[key]}")
+    for key, help_text in (
+        ("checkout_wait_seconds", "Time spent waiting for a pooled connection."),
+        ("checkout_hold_seconds", "Time a connection stays checked out."),
+    ):
+        name = f"db_pool_{key}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for pool, stats in pools.items():
+            if key in stats:
+                lines.extend(histogram_samples(name, (("pool", pool),), stats[key]))
+    return lines
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, in-flight requests and response sizes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.inc(amount=-1)
+            # Matched route template, so /users/1 and /users/2 share a series;
+            # unmatched paths are folded together to bound cardinality
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            labels = (("method", scope["method"]), ("route", template), ("status", str(status_code)))
+            http_request_duration.observe(elapsed, labels)
+            http_response_size.observe(size, labels[:2])
+
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_NAMED_PARAMETER = re.compile(r"(?:%\(\w+\)s|\$\d+|(?<!:):\w+)")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Normalise a SQL statement: literals and parameters become ``?``, lists collapse."""
+    normalised = _STRING_LITERAL.sub("?", statement)
+    normalised = _NAMED_PARAMETER.sub("?", normalised)
+    normalised = _NUMBER_LITERAL.sub("?", normalised)
+    normalised = _PARAMETER_LIST.sub("(?)", normalised)
+    normalised = _VALUES_LIST.sub(r"\1", normalised)
+    normalised = _WHITESPACE.sub(" ", normalised).strip()
+    return normalised[:MAX_FINGERPRINT_LENGTH]
+
+
+_QUERY_START_KEY = "metrics_query_start"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_QUERY_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_failed_statement(exception_context):
+    # Failed statements never reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get(_QUERY_START_KEY):
+        connection.info[_QUERY_START_KEY].pop()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get(_QUERY_START_KEY)
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    key = fingerprint(statement)
+    record_statement(statement, elapsed, key)
+    labels = (("statement", key),)
+    if labels not in db_statement_duration.values and len(db_statement_duration.values) >= MAX_FINGERPRINTS:
+        labels = (("statement", "other"),)
+    db_statement_duration.observe(elapsed, labels)
+    cache_result = _CACHE_RESULTS.get(getattr(context, "cache_hit", None))
+    if cache_result is not None:
+        db_compiled_cache.inc(cache_result)
@@ -0,0 +1,93 @@
+"""Pagination helpers shared by list endpoints."""
+
+import base64
+import binascii
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Query, Response, status
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+_CURSOR_PREFIX = "id:"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Build an opaque cursor pointing just after ``last_id``."""
+    raw = f"{_CURSOR_PREFIX}{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Return the primary key encoded in a cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not raw.startswith(_CURSOR_PREFIX) or not raw[len(_CURSOR_PREFIX):].isdigit():
+        raise ValueError("Invalid cursor")
+    return int(raw[len(_CURSOR_PREFIX):])
+
+
+@dataclass(frozen=True)
+class PageParams:
+    """Resolved pagination parameters: offset mode, or keyset mode when ``after_id`` is set."""
+    skip: int
+    limit: int
+    after_id: Optional[int] = None
+
+
+def page_params(
+    skip: int = Query(0, ge=0, description="Offset (legacy; deep offsets are slow)"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header"),
+) -> PageParams:
+    """Dependency parsing ``skip``/``limit``/``after`` query parameters."""
+    if after is None:
+        return PageParams(skip=skip, limit=limit)
+    if skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either skip or after, not both"
+        )
+    try:
+        return PageParams(skip=0, limit=limit, after_id=decode_cursor(after))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def dump_json(content: Any) -> bytes:
+    """Serialise exactly like FastAPI's ``JSONResponse``."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class JSONPage:
+    """A list page already rendered as a JSON array."""
+    body: bytes
+    count: int
+    last_id: Optional[int] = None
+    # ETag of the page, when the source keeps a content version
+    etag: Optional[str] = None
+
+
+def next_cursor_headers(page: JSONPage, limit: int) -> Dict[str, str]:
+    """The next page cursor header, when the page is full."""
+    if page.count and page.count == limit and page.last_id is not None:
+        return {NEXT_CURSOR_HEADER: encode_cursor(page.last_id)}
+    return {}
+
+
+def json_page_response(page: JSONPage, limit: int) -> Response:
+    """Return a pre-rendered page as-is, with the next page cursor when the page is full."""
+    return Response(content=page.body, media_type="application/json", headers=next_cursor_headers(page, limit))
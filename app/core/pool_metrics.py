@@ -0,0 +1,133 @@
+"""Connection pool instrumentation."""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+# Histogram bucket upper bounds (seconds) for checkout wait and hold times
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self) -> Dict:
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "buckets": cumulative,
+        }
+
+
+class PoolStats:
+    """Counters for one engine's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkout_wait = LatencyHistogram()
+        self.checkout_hold = LatencyHistogram()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.in_use = 0
+        self.max_in_use = 0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "checkout_wait_seconds": self.checkout_wait.snapshot(),
+                "checkout_hold_seconds": self.checkout_hold.snapshot(),
+            }
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection."""
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; event listeners are carried
+        # over by SQLAlchemy, the counters by us
+        pool = super().recreate()
+        pool.stats = getattr(self, "stats", None)
+        return pool
+
+    def connect(self):
+        stats: PoolStats = getattr(self, "stats", None)
+        if stats is None:
+            return super().connect()
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with stats._lock:
+                stats.timeouts += 1
+            raise
+        finally:
+            with stats._lock:
+                stats.checkout_wait.observe(time.perf_counter() - started)
+
+
+def instrument_pool(pool: Pool) -> PoolStats:
+    """Attach counters and event listeners to a pool."""
+    stats = PoolStats()
+    pool.stats = stats
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        with stats._lock:
+            stats.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        with stats._lock:
+            stats.checkouts += 1
+            stats.in_use += 1
+            stats.max_in_use = max(stats.max_in_use, stats.in_use)
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is None:
+            return
+        with stats._lock:
+            stats.in_use -= 1
+            stats.checkout_hold.observe(time.perf_counter() - checked_out_at)
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        with stats._lock:
+            stats.invalidations += 1
+
+    return stats
@@ -0,0 +1,144 @@
+"""Per-request SQL statement accounting.
+
+``QueryBudgetMiddleware`` opens a ``QueryStats`` scope for every request;
+the statement hooks in ``app.core.metrics`` add each executed statement to
+the scopes active in the current context. With ``DEBUG`` enabled the
+totals are returned as ``X-Query-Count`` / ``X-Query-Time-Ms`` response
+headers, and requests slower than ``SLOW_REQUEST_SECONDS`` are logged
+together with their statements. Statements are also counted by fingerprint,
+so one run more than ``REPEATED_QUERY_THRESHOLD`` times in a request is
+flagged as a likely N+1.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEBUG = os.getenv("DEBUG", "false").strip().lower() in ("1", "true", "yes", "on")
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+# Runs of one statement fingerprint per request above which it is flagged
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", "5"))
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_TIME_HEADER = "X-Query-Time-Ms"
+
+# Statements kept per scope for the slow-request log; the totals count all
+MAX_RECORDED_STATEMENTS = 200
+
+
+class QueryStats:
+    """Statements executed within one scope (usually one request)."""
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.parent = parent
+        self.count = 0
+        self.total_time = 0.0
+        self.statements: List[Tuple[str, float]] = []
+        # Fingerprint -> executions, over all statements (not only the recorded ones)
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, duration: float, fingerprint: Optional[str] = None) -> None:
+        key = fingerprint or " ".join(statement.split())
+        scope = self
+        while scope is not None:
+            scope.count += 1
+            scope.total_time += duration
+            scope.fingerprints[key] += 1
+            if len(scope.statements) < MAX_RECORDED_STATEMENTS:
+                scope.statements.append((statement, duration))
+            scope = scope.parent
+
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Fingerprints executed more than ``threshold`` times, most frequent first."""
+        if threshold is None:
+            threshold = REPEATED_QUERY_THRESHOLD
+        return [(key, runs) for key, runs in self.fingerprints.most_common() if runs > threshold]
+
+    def describe(self, repeat_threshold: Optional[int] = None) -> str:
+        """One line per recorded statement, then the repeated ones, for logs and assertion messages."""
+        lines = [
+            f"  {duration * 1000:8.2f} ms  {' '.join(statement.split())}"
+            for statement, duration in self.statements
+        ]
+        repeated = self.repeated(repeat_threshold)
+        if repeated:
+            lines.append("Repeated statements (possible N+1):")
+            lines.extend(f"  {runs:5d} x  {key}" for key, runs in repeated)
+        return "\n".join(lines)
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """The innermost active scope, if any."""
+    return _current_stats.get()
+
+
+def record_statement(statement: str, duration: float, fingerprint: Optional[str] = None) -> None:
+    """Add an executed statement to the active scopes."""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration, fingerprint)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count statements executed inside the block (and in enclosing scopes)."""
+    stats = QueryStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryBudgetMiddleware:
+    """Pure ASGI middleware scoping statement accounting to each request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            streaming = False
+
+            async def send_wrapper(message):
+                nonlocal streaming
+                if message["type"] == "http.response.start":
+                    # Event streams stay open by design; they are not slow requests
+                    streaming = any(
+                        name == b"content-type" and value.startswith(b"text/event-stream")
+                        for name, value in message.get("headers", [])
+                    )
+                if DEBUG and message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((QUERY_COUNT_HEADER.lower().encode(), str(stats.count).encode()))
+                    headers.append((
+                        QUERY_TIME_HEADER.lower().encode(),
+                        f"{stats.total_time * 1000:.2f}".encode(),
+                    ))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            started = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - started
+                if elapsed >= SLOW_REQUEST_SECONDS and not streaming:
+                    logger.warning(
+                        "Slow request %s %s: %.1f ms, %d statements (%.1f ms)\n%s",
+                        scope["method"], scope["path"], elapsed * 1000,
+                        stats.count, stats.total_time * 1000, stats.describe(),
+                    )
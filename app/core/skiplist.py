@@ -0,0 +1,138 @@
+"""Indexable skip list (order-statistics structure)."""
+
+import random
+from typing import Any, Iterator, List, Optional
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, level: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * level
+        # width[i]: number of level-0 steps from this node to next[i]
+        self.width: List[int] = [1] * level
+
+
+class IndexableSkipList:
+    """Sorted set of unique, mutually comparable keys.
+
+    Insert, remove, rank (number of smaller keys) and positional access all
+    run in expected O(log n); iterating k keys from a position costs
+    O(log n + k).
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self._head = _Node(None, MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _predecessors(self, key: Any):
+        """Last node with a smaller key on every level, and its position (head is 0)."""
+        update: List[_Node] = [self._head] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node, position = self._head, 0
+        for level in reversed(range(self._level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            update[level] = node
+            positions[level] = position
+        return update, positions
+
+    def insert(self, key: Any) -> None:
+        """Add a key; raises ``KeyError`` if it is already present."""
+        update, positions = self._predecessors(key)
+        following = update[0].next[0]
+        if following is not None and following.key == key:
+            raise KeyError(key)
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                update[i] = self._head
+                positions[i] = 0
+                self._head.width[i] = self._size + 1
+            self._level = level
+
+        node = _Node(key, level)
+        new_position = positions[0] + 1
+        for i in range(level):
+            previous = update[i]
+            node.next[i] = previous.next[i]
+            previous.next[i] = node
+            node.width[i] = previous.width[i] - (new_position - positions[i]) + 1
+            previous.width[i] = new_position - positions[i]
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key: Any) -> None:
+        """Remove a key; raises ``KeyError`` if it is missing."""
+        update, _ = self._predecessors(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+
+        for i in range(self._level):
+            previous = update[i]
+            if previous.next[i] is node:
+                previous.width[i] += node.width[i] - 1
+                previous.next[i] = node.next[i]
+            else:
+                previous.width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def rank(self, key: Any) -> int:
+        """Number of keys strictly smaller than ``key``."""
+        _, positions = self._predecessors(key)
+        return positions[0]
+
+    def __contains__(self, key: Any) -> bool:
+        update, _ = self._predecessors(key)
+        node = update[0].next[0]
+        return node is not None and node.key == key
+
+    def _node_at(self, index: int) -> _Node:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        node, position = self._head, 0
+        for level in reversed(range(self._level)):
+            while node.next[level] is not None and position + node.width[level] <= index + 1:
+                position += node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        return self._node_at(index).key
+
+    def iter_from(self, index: int, count: Optional[int] = None) -> Iterator[Any]:
+        """Yield up to ``count`` keys starting at position ``index``."""
+        if index >= self._size or count == 0:
+            return
+        node = self._node_at(max(index, 0))
+        remaining = count
+        while node is not None and (remaining is None or remaining > 0):
+            yield node.key
+            node = node.next[0]
+            if remaining is not None:
+                remaining -= 1
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.iter_from(0)
@@ -0,0 +1,178 @@
+"""Memory-mapped, double-buffered snapshot file shared by worker processes.
+
+Layout (little endian)::
+
+    header  (64 bytes)  magic, format version, active slot, generation, slot size
+    slot 0              generation, payload length, CRC32, payload
+    slot 1              same
+
+A writer takes an exclusive ``flock``, fills the inactive slot, and only
+then points the header at it with a new generation, so readers never see a
+half-written payload through the header. Writes are not ``msync``ed: pages
+of a ``MAP_SHARED`` mapping are visible to every process mapping the file
+and outlive the writer; only a host crash loses them. Writers block on the
+lock, so async callers run them in an executor. Readers take no lock: they map the
+file, compare the generation with the last one they decoded, and verify
+the slot's generation and checksum (a slot rewritten while it was being
+read fails the check and is read again).
+
+``LeaderLock`` elects one process per file to run periodic work; the lock
+is released by the kernel when its holder exits.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Callable, Optional, Tuple
+
+_MAGIC = b"ACHSNAP\0"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIIQQ")
+_HEADER_SIZE = 64
+_SLOT_HEADER = struct.Struct("<QII")
+
+# Attempts to read a consistent slot while writers keep swapping
+_READ_ATTEMPTS = 3
+
+
+class SnapshotFile:
+    """Two fixed-size payload slots behind an atomically swapped header."""
+
+    def __init__(self, path: str, size: int):
+        if size < _HEADER_SIZE + 2 * (_SLOT_HEADER.size + 1):
+            raise ValueError(f"Snapshot file size {size} is too small")
+        self.path = path
+        self.size = size
+        self.slot_size = (size - _HEADER_SIZE) // 2
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        # flock does not exclude threads sharing this descriptor
+        self._thread_lock = threading.Lock()
+        try:
+            with self._locked():
+                if os.fstat(self._fd).st_size < size:
+                    os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    @property
+    def capacity(self) -> int:
+        """Largest payload a slot holds."""
+        return self.slot_size - _SLOT_HEADER.size
+
+    def close(self) -> None:
+        with self._thread_lock:
+            self._map.close()
+            os.close(self._fd)
+
+    def _locked(self):
+        return _FileLock(self._fd, self._thread_lock)
+
+    def _header(self) -> Tuple[int, int]:
+        magic, version, active, generation, slot_size = _HEADER.unpack_from(self._map, 0)
+        # A file laid out for another size reads as empty and is overwritten
+        if magic != _MAGIC or version != _FORMAT_VERSION or active not in (0, 1) or slot_size != self.slot_size:
+            return 0, 0
+        return active, generation
+
+    def generation(self) -> int:
+        """Generation of the current payload (0 when nothing was written yet)."""
+        return self._header()[1]
+
+    def read(self) -> Tuple[int, Optional[bytes]]:
+        """``(generation, payload)`` of the current slot; ``payload`` is None when empty or unreadable."""
+        for _ in range(_READ_ATTEMPTS):
+            active, generation = self._header()
+            if generation == 0:
+                return 0, None
+            offset = _HEADER_SIZE + active * self.slot_size
+            slot_generation, length, checksum = _SLOT_HEADER.unpack_from(self._map, offset)
+            if slot_generation != generation or length > self.capacity:
+                continue
+            start = offset + _SLOT_HEADER.size
+            payload = self._map[start:start + length]
+            if zlib.crc32(payload) == checksum and self.generation() == generation:
+                return generation, payload
+        return self.generation(), None
+
+    def _write(self, payload: bytes) -> int:
+        if len(payload) > self.capacity:
+            raise ValueError(f"Snapshot payload of {len(payload)} bytes exceeds slot capacity {self.capacity}")
+        active, generation = self._header()
+        target = 1 - active if generation else 0
+        generation += 1
+        offset = _HEADER_SIZE + target * self.slot_size
+        start = offset + _SLOT_HEADER.size
+        self._map[start:start + len(payload)] = payload
+        _SLOT_HEADER.pack_into(self._map, offset, generation, len(payload), zlib.crc32(payload))
+        # Swap only after the slot is complete
+        _HEADER.pack_into(self._map, 0, _MAGIC, _FORMAT_VERSION, target, generation, self.slot_size)
+        return generation
+
+    def write(self, payload: bytes) -> int:
+        """Publish ``payload`` as the next generation; returns that generation."""
+        with self._locked():
+            return self._write(payload)
+
+    def update(self, change: Callable[[Optional[bytes]], bytes]) -> int:
+        """Atomically replace the payload with ``change(current payload or None)``."""
+        with self._locked():
+            return self._write(change(self.read()[1]))
+
+
+class _FileLock:
+    """Exclusive ``flock`` (and the descriptor's thread lock) held for a ``with`` block."""
+
+    def __init__(self, fd: int, thread_lock: threading.Lock):
+        self._fd = fd
+        self._thread_lock = thread_lock
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+
+class LeaderLock:
+    """Non-blocking exclusive lock on ``<path>.leader``, held until ``release``."""
+
+    def __init__(self, path: str):
+        self.path = f"{path}.leader"
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """Become the leader if no other process is; True if this process leads."""
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
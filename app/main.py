@@ -1,23 +1,84 @@
 """Main FastAPI application."""
 
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from app.api.users import router as users_router
 from app.api.achievements import router as achievements_router
 from app.api.statistics import router as statistics_router
+from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
+from app.api.ready import router as ready_router
+from app.core.database import AsyncSessionLocal, ReadSessionLocal, engine, read_engine
+from app.core.metrics import MetricsMiddleware
+from app.core.query_budget import QueryBudgetMiddleware
+from app.services.award_feed import award_feed
+from app.services.award_queue import award_queue, AWARD_QUEUE_ENABLED
+from app.services.statistics_snapshot import statistics_snapshots, STATS_REFRESH_INTERVAL, STATS_SHARED_FILE
+from app.services.warmup import readiness, run_warmup, WARMUP_ENABLED
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background tasks for the lifetime of the application."""
+    if STATS_SHARED_FILE:
+        statistics_snapshots.attach_shared(STATS_SHARED_FILE)
+    refresher = None
+    if STATS_REFRESH_INTERVAL > 0:
+        refresher = asyncio.create_task(
+            statistics_snapshots.run_refresher(ReadSessionLocal, STATS_REFRESH_INTERVAL)
+        )
+    if AWARD_QUEUE_ENABLED:
+        award_queue.start(AsyncSessionLocal)
+    # LISTEN on the primary: notifications are not delivered on replicas
+    award_feed.start(engine)
+    warmup = None
+    if WARMUP_ENABLED:
+        # Serve /ready (503) while warming up; health checks hold traffic back
+        engines = {"primary": engine}
+        if read_engine is not engine:
+            engines["read"] = read_engine
+        warmup = asyncio.create_task(run_warmup(engines, AsyncSessionLocal, ReadSessionLocal))
+    else:
+        readiness.mark_ready()
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+            with suppress(asyncio.CancelledError):
+                await warmup
+        # Flush queued awards before the process exits
+        await award_queue.stop()
+        await award_feed.stop()
+        if refresher is not None:
+            refresher.cancel()
+            with suppress(asyncio.CancelledError):
+                await refresher
+        statistics_snapshots.detach_shared()
+
 
 app = FastAPI(
     title="Achievements API",
     description="API для управления достижениями пользователей",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(QueryBudgetMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(users_router, prefix="/users", tags=["users"])
 app.include_router(achievements_router, prefix="/achievements", tags=["achievements"])
 app.include_router(statistics_router, prefix="/stats", tags=["statistics"])
+app.include_router(health_router, prefix="/health", tags=["health"])
+app.include_router(metrics_router, tags=["health"])
+app.include_router(ready_router, tags=["health"])
 
 
 @app.get("/")
 async def root():
     """Root endpoint."""
-    return {"message": "Achievements API is running!"}
\ No newline at end of file
+    return {"message": "Achievements API is running!"}
@@ -3,5 +3,8 @@
 from .user import User, LanguageEnum
 from .achievement import Achievement
 from .user_achievement import UserAchievement
+from .user_stats import UserStats
+from .user_streak import UserStreak
+from .user_daily_activity import UserDailyActivity
 
-__all__ = ["User", "Achievement", "UserAchievement", "LanguageEnum"]
\ No newline at end of file
+__all__ = ["User", "Achievement", "UserAchievement", "UserStats", "UserStreak", "UserDailyActivity", "LanguageEnum"]
\ No newline at end of file
@@ -1,6 +1,6 @@
 """User achievement relationship model."""
 
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -14,6 +14,18 @@ class UserAchievement(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     achievement_id = Column(Integer, ForeignKey("achievements.id"), nullable=False)
     awarded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # A user can hold each achievement at most once
+        UniqueConstraint("user_id", "achievement_id", name="uq_user_achievements_user_achievement"),
+        # Per-user history in time order (achievement lists, streak rebuilds)
+        Index("ix_user_achievements_user_id_awarded_at", "user_id", "awarded_at"),
+        # Joins and lookups from the achievement side
+        Index("ix_user_achievements_achievement_id", "achievement_id"),
+    )
+
+    # Fetch awarded_at on INSERT so aggregates can use it without a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
     # Relationships
     user = relationship("User", back_populates="user_achievements")
@@ -0,0 +1,19 @@
+"""Per-user daily activity rollup model."""
+
+from sqlalchemy import Column, Integer, ForeignKey, Date, Index
+from app.core.database import Base
+
+
+class UserDailyActivity(Base):
+    """Awards and points per user per (UTC) day, maintained incrementally on every award."""
+    __tablename__ = "user_daily_activity"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    award_count = Column(Integer, nullable=False, default=0)
+    points = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Covering index for date-window sums: only the window's buckets are read
+        Index("ix_user_daily_activity_day", day, user_id, award_count, points),
+    )
@@ -0,0 +1,19 @@
+"""Per-user statistics aggregate model."""
+
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
+from app.core.database import Base
+
+
+class UserStats(Base):
+    """Per-user award aggregate, maintained incrementally on every award."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    achievement_count = Column(Integer, nullable=False, default=0)
+    total_points = Column(Integer, nullable=False, default=0)
+    last_awarded_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_user_stats_achievement_count", achievement_count.desc(), user_id),
+        Index("ix_user_stats_total_points", total_points.desc(), user_id),
+    )
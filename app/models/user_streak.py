@@ -0,0 +1,19 @@
+"""Per-user award streak state model."""
+
+from sqlalchemy import Column, Integer, ForeignKey, Date, Index
+from app.core.database import Base
+
+
+class UserStreak(Base):
+    """Consecutive award-day runs per user, maintained incrementally on every award."""
+    __tablename__ = "user_streaks"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    current_start = Column(Date, nullable=False)
+    current_length = Column(Integer, nullable=False)
+    longest_start = Column(Date, nullable=False)
+    longest_length = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_user_streaks_longest_length", longest_length.desc(), user_id),
+    )
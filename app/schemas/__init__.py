@@ -2,10 +2,14 @@
 
 from .user import UserCreate, UserResponse
 from .achievement import AchievementCreate, AchievementResponse, AchievementLocalized
-from .user_achievement import UserAchievementCreate, UserAchievementResponse
+from .user_achievement import (
+    UserAchievementCreate, UserAchievementResponse, UserAchievementBatchResult, UserAchievementQueued,
+    AwardStatus
+)
 
 __all__ = [
     "UserCreate", "UserResponse",
     "AchievementCreate", "AchievementResponse", "AchievementLocalized",
-    "UserAchievementCreate", "UserAchievementResponse"
+    "UserAchievementCreate", "UserAchievementResponse",
+    "UserAchievementBatchResult", "UserAchievementQueued", "AwardStatus"
 ]
\ No newline at end of file
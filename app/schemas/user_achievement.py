@@ -2,6 +2,8 @@
 
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
+from typing import Optional
+import enum
 
 
 class UserAchievementBase(BaseModel):
@@ -20,4 +22,24 @@ class UserAchievementResponse(UserAchievementBase):
     id: int
     awarded_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UserAchievementQueued(UserAchievementBase):
+    """Award accepted by the write-behind queue, not yet committed."""
+    status: str = "queued"
+
+
+class AwardStatus(str, enum.Enum):
+    """Outcome of a single award in a batch."""
+    AWARDED = "awarded"
+    DUPLICATE = "duplicate"
+    UNKNOWN_USER = "unknown_user"
+    UNKNOWN_ACHIEVEMENT = "unknown_achievement"
+
+
+class UserAchievementBatchResult(UserAchievementBase):
+    """Per-item result of a batch award."""
+    status: AwardStatus
+    id: Optional[int] = None
+    awarded_at: Optional[datetime] = None
@@ -1,7 +1,9 @@
 """Business logic services."""
 
+from . import aggregates  # noqa: F401  (registers the award aggregate hooks)
 from .user_service import UserService
 from .achievement_service import AchievementService
 from .statistics_service import StatisticsService
+from .export_service import ExportService
 
-__all__ = ["UserService", "AchievementService", "StatisticsService"]
\ No newline at end of file
+__all__ = ["UserService", "AchievementService", "StatisticsService", "ExportService"]
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""In-process achievement catalog cache.
+
+The achievements table is small and rarely changes, so each process keeps
+the whole catalog in memory as immutable records. ``create_achievement``
+bumps ``version``, which makes the next lookup reload the table; a TTL
+bounds staleness for achievements created by other processes, and an
+unknown id triggers a (rate-limited) reload so new achievements are never
+rejected for long. Each record's ``AchievementResponse`` JSON is rendered
+once per load, so list pages are served by joining cached bytes, and
+``etag`` is a digest of all of it for conditional GETs.
+
+A reload after ``invalidate`` reads the primary through ``session_factory``
+instead of the caller's session, which may be on a replica that has not
+received the new row yet.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.core.http_cache import make_etag
+from app.core.pagination import dump_json
+from app.models import Achievement
+
+ACHIEVEMENT_CACHE_TTL = float(os.getenv("ACHIEVEMENT_CACHE_TTL", "60"))
+
+# Minimum delay between reloads triggered by unknown ids
+_UNKNOWN_ID_RELOAD_INTERVAL = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class CachedAchievement:
+    """Immutable snapshot of an achievement row."""
+    id: int
+    name_ru: str
+    name_en: str
+    description_ru: str
+    description_en: str
+    points: int
+
+
+class AchievementCatalog:
+    """Versioned cache of all achievements, keyed by id."""
+
+    def __init__(
+        self,
+        ttl: float = ACHIEVEMENT_CACHE_TTL,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal
+    ):
+        self.ttl = ttl
+        # Primary sessions for reloads after an invalidation
+        self.session_factory = session_factory
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all cached data and counters."""
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._by_id: Dict[int, CachedAchievement] = {}
+        self._ordered: Tuple[CachedAchievement, ...] = ()
+        self._json: Tuple[bytes, ...] = ()
+        self._json_by_id: Dict[int, bytes] = {}
+        self.etag = make_etag()
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Mark the catalog stale; the next lookup reloads it."""
+        self.version += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_version == self.version
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    async def _load(self, db: AsyncSession) -> None:
+        version = self.version
+        result = await db.execute(
+            select(
+                Achievement.id,
+                Achievement.name_ru,
+                Achievement.name_en,
+                Achievement.description_ru,
+                Achievement.description_en,
+                Achievement.points
+            ).order_by(Achievement.id)
+        )
+        ordered = tuple(CachedAchievement(*row) for row in result)
+        self._ordered = ordered
+        # Same field order as AchievementResponse
+        self._json = tuple(
+            dump_json({
+                "name_ru": achievement.name_ru,
+                "name_en": achievement.name_en,
+                "description_ru": achievement.description_ru,
+                "description_en": achievement.description_en,
+                "points": achievement.points,
+                "id": achievement.id,
+            })
+            for achievement in ordered
+        )
+        self._json_by_id = {achievement.id: rendered for achievement, rendered in zip(ordered, self._json)}
+        self.etag = make_etag(*self._json)
+        self._by_id = {achievement.id: achievement for achievement in ordered}
+        self._loaded_version = version
+        self._loaded_at = time.monotonic()
+
+    async def _ensure_loaded(self, db: AsyncSession, force: bool = False) -> None:
+        if not force and self._is_fresh():
+            self.hits += 1
+            return
+        async with self._lock:
+            # Another coroutine may have reloaded while we waited
+            if not force and self._is_fresh():
+                self.hits += 1
+                return
+            self.misses += 1
+            # ``version`` only moves past the loaded one (or 0) on invalidate
+            if self.version <= max(self._loaded_version, 0):
+                await self._load(db)
+                return
+            async with self.session_factory() as session:
+                await self._load(session)
+
+    async def all(self, db: AsyncSession) -> Tuple[CachedAchievement, ...]:
+        """All achievements ordered by id."""
+        await self._ensure_loaded(db)
+        return self._ordered
+
+    async def all_json(self, db: AsyncSession) -> Tuple[Tuple[CachedAchievement, ...], Tuple[bytes, ...], str]:
+        """All achievements ordered by id, each one's JSON at the same position, and the catalog ETag."""
+        await self._ensure_loaded(db)
+        # Read everything from one load; a reload replaces it all together
+        return self._ordered, self._json, self.etag
+
+    async def get_json(self, db: AsyncSession, achievement_id: int) -> Optional[bytes]:
+        """An achievement's ``AchievementResponse`` JSON, with the same reload rules as ``get``."""
+        if await self.get(db, achievement_id) is None:
+            return None
+        return self._json_by_id.get(achievement_id)
+
+    async def get(self, db: AsyncSession, achievement_id: int) -> Optional[CachedAchievement]:
+        """Look up an achievement by id in O(1)."""
+        await self._ensure_loaded(db)
+        achievement = self._by_id.get(achievement_id)
+        if achievement is None and time.monotonic() - self._loaded_at >= _UNKNOWN_ID_RELOAD_INTERVAL:
+            await self._ensure_loaded(db, force=True)
+            achievement = self._by_id.get(achievement_id)
+        return achievement
+
+    async def get_many(self, db: AsyncSession, achievement_ids: Iterable[int]) -> Dict[int, CachedAchievement]:
+        """Look up several achievements; unknown ids are omitted."""
+        achievement_ids = set(achievement_ids)
+        await self._ensure_loaded(db)
+        if not achievement_ids <= self._by_id.keys() and (
+            time.monotonic() - self._loaded_at >= _UNKNOWN_ID_RELOAD_INTERVAL
+        ):
+            await self._ensure_loaded(db, force=True)
+        return {i: self._by_id[i] for i in achievement_ids if i in self._by_id}
+
+    def peek_points(self, achievement_ids: Iterable[int]) -> Dict[int, int]:
+        """Points for ids present in a fresh catalog, without touching the database."""
+        if not self._is_fresh():
+            return {}
+        return {i: self._by_id[i].points for i in achievement_ids if i in self._by_id}
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters."""
+        return {
+            "version": self.version,
+            "size": len(self._ordered),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+achievement_catalog = AchievementCatalog()
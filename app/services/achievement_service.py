@@ -1,11 +1,58 @@
 """Achievement service."""
 
+from bisect import bisect_right
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import Integer, bindparam, select, tuple_, exists
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from app.core.database import dialect_insert
+from app.core.http_cache import make_etag
+from app.core.pagination import JSONPage
 from app.models import Achievement, UserAchievement, User
-from app.schemas import AchievementCreate, UserAchievementCreate
+from app.schemas import (
+    AchievementCreate, UserAchievementCreate, UserAchievementBatchResult, AwardStatus
+)
+from app.services.achievement_catalog import CachedAchievement, achievement_catalog
+from app.services.aggregates import AwardRecord, apply_awards
+
+# Upper bound on awards per batch request (keeps bind parameters well under driver limits)
+MAX_AWARD_BATCH_SIZE = 5000
+
+_AWARD_USER_ID = bindparam("user_id", type_=Integer)
+_AWARD_ACHIEVEMENT_ID = bindparam("achievement_id", type_=Integer)
+
+_AWARD_REJECTION = select(
+    exists().where(User.id == _AWARD_USER_ID).label("user_exists"),
+    exists().where(Achievement.id == _AWARD_ACHIEVEMENT_ID).label("achievement_exists")
+)
+
+# Single-award INSERT per dialect name, built on first use
+_award_inserts: Dict[str, Any] = {}
+
+
+def _award_insert(bind):
+    """``INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING`` for one award, with bound ids.
+    
+    Built on the Core table: an ORM insert executed with a parameter dict
+    would be treated as a bulk insert.
+    """
+    stmt = _award_inserts.get(bind.dialect.name)
+    if stmt is None:
+        table = UserAchievement.__table__
+        stmt = _award_inserts[bind.dialect.name] = dialect_insert(bind, table).from_select(
+            ["user_id", "achievement_id"],
+            select(
+                _AWARD_USER_ID, _AWARD_ACHIEVEMENT_ID
+            ).where(
+                exists().where(User.id == _AWARD_USER_ID)
+            ).where(
+                exists().where(Achievement.id == _AWARD_ACHIEVEMENT_ID)
+            )
+        ).on_conflict_do_nothing(
+            index_elements=["user_id", "achievement_id"]
+        ).returning(table.c.id, table.c.user_id, table.c.achievement_id, table.c.awarded_at)
+    return stmt
 
 
 class AchievementService:
@@ -26,58 +73,203 @@ class AchievementService:
         self.db.add(db_achievement)
         await self.db.commit()
         await self.db.refresh(db_achievement)
+        achievement_catalog.invalidate()
         return db_achievement
     
-    async def get_achievement(self, achievement_id: int) -> Optional[Achievement]:
-        """Get achievement by ID."""
-        result = await self.db.execute(
-            select(Achievement).filter(Achievement.id == achievement_id)
-        )
-        return result.scalar_one_or_none()
+    async def get_achievement(self, achievement_id: int) -> Optional[CachedAchievement]:
+        """Get achievement by ID (served from the catalog cache)."""
+        return await achievement_catalog.get(self.db, achievement_id)
     
-    async def get_achievements(self, skip: int = 0, limit: int = 100) -> List[Achievement]:
-        """Get all achievements."""
-        result = await self.db.execute(
-            select(Achievement).offset(skip).limit(limit)
+    async def get_achievement_json(self, achievement_id: int) -> Optional[bytes]:
+        """Get achievement by ID as the ``AchievementResponse`` JSON body."""
+        return await achievement_catalog.get_json(self.db, achievement_id)
+    
+    async def get_achievements(
+        self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None
+    ) -> List[CachedAchievement]:
+        """Get all achievements ordered by id (served from the catalog cache).
+        
+        With ``after_id`` the page starts right after that id.
+        """
+        achievements = await achievement_catalog.all(self.db)
+        if after_id is not None:
+            skip = bisect_right(achievements, after_id, key=lambda achievement: achievement.id)
+        return list(achievements[skip:skip + limit])
+    
+    async def get_achievements_json(
+        self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None
+    ) -> JSONPage:
+        """Same page as ``get_achievements``, as the ``List[AchievementResponse]`` JSON body.
+        
+        The body is joined from per-achievement JSON kept by the catalog,
+        and the ETag derives from the catalog's.
+        """
+        achievements, rendered, catalog_etag = await achievement_catalog.all_json(self.db)
+        if after_id is not None:
+            skip = bisect_right(achievements, after_id, key=lambda achievement: achievement.id)
+        page = achievements[skip:skip + limit]
+        return JSONPage(
+            body=b"[" + b",".join(rendered[skip:skip + limit]) + b"]",
+            count=len(page),
+            last_id=page[-1].id if page else None,
+            etag=make_etag(catalog_etag, skip, limit)
         )
-        return result.scalars().all()
     
     async def award_achievement(self, award: UserAchievementCreate) -> UserAchievement:
-        """Award achievement to user."""
-        # Check if user exists
-        user_result = await self.db.execute(
-            select(User).filter(User.id == award.user_id)
-        )
-        user = user_result.scalar_one_or_none()
-        if not user:
-            raise ValueError("User not found")
+        """Award achievement to user.
         
-        # Check if achievement exists
-        achievement_result = await self.db.execute(
-            select(Achievement).filter(Achievement.id == award.achievement_id)
-        )
-        achievement = achievement_result.scalar_one_or_none()
-        if not achievement:
+        Unknown achievements are rejected from the catalog cache. The
+        remaining checks are folded into a single
+        ``INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING`` backed by
+        the (user_id, achievement_id) unique constraint, so concurrent
+        requests cannot double-award. The reason is only looked up when
+        nothing was inserted.
+        """
+        if await achievement_catalog.get(self.db, award.achievement_id) is None:
             raise ValueError("Achievement not found")
         
-        # Check if user already has this achievement
-        existing_result = await self.db.execute(
-            select(UserAchievement).filter(
-                UserAchievement.user_id == award.user_id,
-                UserAchievement.achievement_id == award.achievement_id
-            )
+        ids = {"user_id": award.user_id, "achievement_id": award.achievement_id}
+        try:
+            row = (await self.db.execute(_award_insert(self.db.bind), ids)).one_or_none()
+            if row is None:
+                raise ValueError(await self._award_rejection_reason(award))
+            await self.db.run_sync(apply_awards, [AwardRecord(row.user_id, row.achievement_id, row.awarded_at)])
+            await self.db.commit()
+        except IntegrityError:
+            # Referenced user or achievement removed concurrently
+            await self.db.rollback()
+            raise ValueError(await self._award_rejection_reason(award))
+        except Exception:
+            await self.db.rollback()
+            raise
+        return UserAchievement(
+            id=row.id, user_id=row.user_id, achievement_id=row.achievement_id, awarded_at=row.awarded_at
         )
-        existing_award = existing_result.scalar_one_or_none()
+    
+    async def _check_batch(
+        self, awards: List[UserAchievementCreate], known_achievements: Iterable[int]
+    ) -> Tuple[List[AwardStatus], List[Dict[str, int]]]:
+        """Status per award and the rows to insert, from one set-based query per check."""
+        known_achievements = set(known_achievements)
+        user_ids = {award.user_id for award in awards}
+        pairs = {(award.user_id, award.achievement_id) for award in awards}
         
-        if existing_award:
-            raise ValueError("User already has this achievement")
+        known_users = set((await self.db.execute(
+            select(User.id).filter(User.id.in_(user_ids))
+        )).scalars())
+        existing_pairs = set((await self.db.execute(
+            select(UserAchievement.user_id, UserAchievement.achievement_id).filter(
+                tuple_(UserAchievement.user_id, UserAchievement.achievement_id).in_(pairs)
+            )
+        )).tuples())
         
-        # Create new user achievement
-        db_user_achievement = UserAchievement(
-            user_id=award.user_id,
-            achievement_id=award.achievement_id
+        statuses = []
+        to_insert = []
+        for award in awards:
+            pair = (award.user_id, award.achievement_id)
+            if award.user_id not in known_users:
+                statuses.append(AwardStatus.UNKNOWN_USER)
+            elif award.achievement_id not in known_achievements:
+                statuses.append(AwardStatus.UNKNOWN_ACHIEVEMENT)
+            elif pair in existing_pairs:
+                statuses.append(AwardStatus.DUPLICATE)
+            else:
+                # Later repeats of the same pair in this batch are duplicates
+                existing_pairs.add(pair)
+                to_insert.append({"user_id": award.user_id, "achievement_id": award.achievement_id})
+                statuses.append(AwardStatus.AWARDED)
+        return statuses, to_insert
+    
+    async def _insert_batch(self, to_insert: List[Dict[str, int]]) -> Dict[Tuple[int, int], Any]:
+        """Write the awards with one multi-row INSERT and commit; returns inserted rows by pair."""
+        if not to_insert:
+            return {}
+        # Pairs awarded concurrently since the check are skipped by the
+        # unique constraint and reported as duplicates
+        result = await self.db.execute(
+            dialect_insert(self.db.bind, UserAchievement.__table__).values(
+                to_insert
+            ).on_conflict_do_nothing(
+                index_elements=["user_id", "achievement_id"]
+            ).returning(
+                UserAchievement.id,
+                UserAchievement.user_id,
+                UserAchievement.achievement_id,
+                UserAchievement.awarded_at
+            )
         )
-        self.db.add(db_user_achievement)
+        inserted = {(row.user_id, row.achievement_id): row for row in result}
+        await self.db.run_sync(apply_awards, [
+            AwardRecord(row.user_id, row.achievement_id, row.awarded_at)
+            for row in inserted.values()
+        ])
         await self.db.commit()
-        await self.db.refresh(db_user_achievement)
-        return db_user_achievement
\ No newline at end of file
+        return inserted
+    
+    async def _award_rejection_reason(self, award: UserAchievementCreate) -> str:
+        """Explain why an award was not inserted (slow path only)."""
+        result = await self.db.execute(
+            _AWARD_REJECTION, {"user_id": award.user_id, "achievement_id": award.achievement_id}
+        )
+        row = result.one()
+        if not row.user_exists:
+            return "User not found"
+        if not row.achievement_exists:
+            return "Achievement not found"
+        return "User already has this achievement"
+    
+    async def award_achievements(
+        self, awards: List[UserAchievementCreate]
+    ) -> List[UserAchievementBatchResult]:
+        """Award many achievements at once.
+        
+        Users, achievements and existing awards are checked with one set-based
+        query each, and all new awards are written with a single multi-row
+        INSERT. If a referenced row disappears before the INSERT, the batch is
+        checked and written again once; a second conflict is a ``ValueError``.
+        Returns one result per input item, in input order.
+        """
+        if len(awards) > MAX_AWARD_BATCH_SIZE:
+            raise ValueError(f"Batch size exceeds {MAX_AWARD_BATCH_SIZE} awards")
+        if not awards:
+            return []
+        
+        achievement_ids = {award.achievement_id for award in awards}
+        known_achievements = (await achievement_catalog.get_many(self.db, achievement_ids)).keys()
+        statuses, to_insert = await self._check_batch(awards, known_achievements)
+        try:
+            inserted = await self._insert_batch(to_insert)
+        except IntegrityError:
+            # A user or achievement was removed after the check: check again
+            # against the tables (not the catalog cache) and retry once
+            await self.db.rollback()
+            achievement_catalog.invalidate()
+            known_achievements = set((await self.db.execute(
+                select(Achievement.id).filter(Achievement.id.in_(achievement_ids))
+            )).scalars())
+            statuses, to_insert = await self._check_batch(awards, known_achievements)
+            try:
+                inserted = await self._insert_batch(to_insert)
+            except IntegrityError:
+                await self.db.rollback()
+                raise ValueError("Batch conflicts with concurrent changes, retry it")
+        except Exception:
+            await self.db.rollback()
+            raise
+        
+        results = []
+        for award, award_status in zip(awards, statuses):
+            result_item = UserAchievementBatchResult(
+                user_id=award.user_id,
+                achievement_id=award.achievement_id,
+                status=award_status
+            )
+            if award_status == AwardStatus.AWARDED:
+                row = inserted.get((award.user_id, award.achievement_id))
+                if row is None:
+                    result_item.status = AwardStatus.DUPLICATE
+                else:
+                    result_item.id = row.id
+                    result_item.awarded_at = row.awarded_at
+            results.append(result_item)
+        return results
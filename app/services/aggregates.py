@@ -0,0 +1,436 @@
+"""Incrementally maintained award aggregates.
+
+Every new ``UserAchievement`` is folded into the aggregate tables inside the
+transaction that inserts it, so statistics can read one indexed row per user
+instead of re-aggregating the award log. ORM inserts are picked up by a
+session ``after_flush`` hook; Core bulk inserts must call ``apply_awards``
+themselves. ``rebuild_aggregates`` recomputes everything from scratch.
+
+In-process consumers (leaderboard, caches) register with
+``on_awards_committed`` and are called once the awarding transaction has
+committed. On PostgreSQL each award is also published with ``pg_notify`` on
+``AWARD_CHANNEL``, which the database delivers to listeners in every
+process when the transaction commits.
+"""
+
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Sequence
+
+from sqlalchemy import Date, cast, case, delete, event, func, insert, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.database import dialect_insert, recent_writes
+from app.models import Achievement, UserAchievement, UserDailyActivity, UserStats, UserStreak
+from app.services.achievement_catalog import achievement_catalog
+
+
+logger = logging.getLogger(__name__)
+
+# Session.info key holding awards written in the current transaction
+_PENDING_AWARDS_KEY = "pending_awards"
+
+# PostgreSQL NOTIFY channel carrying award events
+AWARD_CHANNEL = "awards"
+# Events per NOTIFY payload; keeps payloads well under the 8000 byte limit
+_NOTIFY_CHUNK_SIZE = 50
+
+AwardListener = Callable[[Sequence["AwardRecord"], Mapping[int, int]], None]
+_award_listeners: List[AwardListener] = []
+
+
+class AwardRecord(NamedTuple):
+    """A single persisted award, as seen by the aggregates."""
+    user_id: int
+    achievement_id: int
+    awarded_at: datetime
+
+
+def as_utc(value: datetime) -> datetime:
+    """Normalize a timestamp to an aware UTC datetime (naive values are UTC)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def award_day(value: datetime) -> date:
+    """Calendar day (UTC) an award counts towards for streaks."""
+    return as_utc(value).date()
+
+
+def award_day_expression(dialect_name: str, column):
+    """SQL equivalent of ``award_day`` for ``column``."""
+    if dialect_name == "postgresql":
+        return cast(func.timezone("UTC", column), Date)
+    # SQLite stores timestamps as naive UTC strings
+    return func.date(column)
+
+
+def award_event(award: AwardRecord, points: Mapping[int, int]) -> Dict:
+    """JSON-ready description of an award, as published to the award feed."""
+    return {
+        "user_id": award.user_id,
+        "achievement_id": award.achievement_id,
+        "points": points.get(award.achievement_id, 0),
+        "awarded_at": as_utc(award.awarded_at).isoformat(),
+    }
+
+
+def _achievement_points(connection: Connection, achievement_ids: Iterable[int]) -> Dict[int, int]:
+    """Points for the given achievements, from the catalog cache when possible."""
+    achievement_ids = set(achievement_ids)
+    points = achievement_catalog.peek_points(achievement_ids)
+    missing = achievement_ids - points.keys()
+    if missing:
+        result = connection.execute(
+            select(Achievement.id, Achievement.points).filter(Achievement.id.in_(missing))
+        )
+        points.update({row.id: row.points for row in result})
+    return points
+
+
+def _apply_user_stats(
+    connection: Connection, awards: Sequence[AwardRecord], points: Mapping[int, int]
+) -> None:
+    """Add the awards to ``user_stats`` with an atomic per-user upsert."""
+    per_user: Dict[int, Dict] = {}
+    for award in awards:
+        row = per_user.setdefault(award.user_id, {
+            "user_id": award.user_id,
+            "achievement_count": 0,
+            "total_points": 0,
+            "last_awarded_at": None,
+        })
+        awarded_at = as_utc(award.awarded_at)
+        row["achievement_count"] += 1
+        row["total_points"] += points.get(award.achievement_id, 0)
+        if row["last_awarded_at"] is None or awarded_at > row["last_awarded_at"]:
+            row["last_awarded_at"] = awarded_at
+
+    table = UserStats.__table__
+    stmt = dialect_insert(connection, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            "achievement_count": table.c.achievement_count + stmt.excluded.achievement_count,
+            "total_points": table.c.total_points + stmt.excluded.total_points,
+            "last_awarded_at": case(
+                (
+                    or_(
+                        table.c.last_awarded_at.is_(None),
+                        stmt.excluded.last_awarded_at > table.c.last_awarded_at,
+                    ),
+                    stmt.excluded.last_awarded_at,
+                ),
+                else_=table.c.last_awarded_at,
+            ),
+        },
+    )
+    connection.execute(stmt, list(per_user.values()))
+
+
+def _apply_daily_activity(
+    connection: Connection, awards: Sequence[AwardRecord], points: Mapping[int, int]
+) -> None:
+    """Add the awards to their (user, day) buckets in ``user_daily_activity``."""
+    buckets: Dict[tuple, Dict] = {}
+    for award in awards:
+        day = award_day(award.awarded_at)
+        row = buckets.setdefault((award.user_id, day), {
+            "user_id": award.user_id,
+            "day": day,
+            "award_count": 0,
+            "points": 0,
+        })
+        row["award_count"] += 1
+        row["points"] += points.get(award.achievement_id, 0)
+
+    table = UserDailyActivity.__table__
+    stmt = dialect_insert(connection, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={
+            "award_count": table.c.award_count + stmt.excluded.award_count,
+            "points": table.c.points + stmt.excluded.points,
+        },
+    )
+    connection.execute(stmt, list(buckets.values()))
+
+
+def _new_streak() -> Dict:
+    """An empty streak row; filled in by ``_extend_streak``."""
+    return {
+        "current_start": None,
+        "current_length": 0,
+        "longest_start": None,
+        "longest_length": 0,
+    }
+
+
+def _extend_streak(streak: Dict, day: date) -> None:
+    """Advance a streak row by one award day. Days must arrive in order."""
+    if streak["current_length"]:
+        current_end = streak["current_start"] + timedelta(days=streak["current_length"] - 1)
+        if day <= current_end:
+            return
+        if day == current_end + timedelta(days=1):
+            streak["current_length"] += 1
+        else:
+            streak["current_start"], streak["current_length"] = day, 1
+    else:
+        streak["current_start"], streak["current_length"] = day, 1
+
+    if streak["current_length"] > streak["longest_length"]:
+        streak["longest_start"] = streak["current_start"]
+        streak["longest_length"] = streak["current_length"]
+
+
+def _streaks_from_history(connection: Connection, user_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Recompute streak rows for the given users from their award history."""
+    days: Dict[int, set] = {}
+    result = connection.execute(
+        select(UserAchievement.user_id, UserAchievement.awarded_at).filter(
+            UserAchievement.user_id.in_(set(user_ids))
+        )
+    )
+    for row in result:
+        days.setdefault(row.user_id, set()).add(award_day(row.awarded_at))
+
+    streaks = {}
+    for user_id, user_days in days.items():
+        streak = _new_streak()
+        for day in sorted(user_days):
+            _extend_streak(streak, day)
+        streaks[user_id] = streak
+    return streaks
+
+
+def _upsert_streaks(connection: Connection, streaks: Dict[int, Dict]) -> None:
+    """Write streak rows, replacing any existing state."""
+    if not streaks:
+        return
+    table = UserStreak.__table__
+    stmt = dialect_insert(connection, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            column: getattr(stmt.excluded, column)
+            for column in ("current_start", "current_length", "longest_start", "longest_length")
+        },
+    )
+    connection.execute(stmt, [
+        {"user_id": user_id, **streak} for user_id, streak in streaks.items()
+    ])
+
+
+def _apply_user_streaks(connection: Connection, awards: Sequence[AwardRecord]) -> None:
+    """Fold award days into ``user_streaks``.
+
+    Awards newer than the user's current run extend it in place; an award
+    dated before the current run (backfilled history) triggers a recompute
+    of that user's streaks from the award log.
+    """
+    new_days: Dict[int, set] = {}
+    for award in awards:
+        new_days.setdefault(award.user_id, set()).add(award_day(award.awarded_at))
+
+    query = select(UserStreak).filter(UserStreak.user_id.in_(set(new_days)))
+    if connection.dialect.name == "postgresql":
+        query = query.with_for_update()
+    existing = {
+        row.user_id: {
+            "current_start": row.current_start,
+            "current_length": row.current_length,
+            "longest_start": row.longest_start,
+            "longest_length": row.longest_length,
+        }
+        for row in connection.execute(query)
+    }
+
+    streaks: Dict[int, Dict] = {}
+    backfilled: List[int] = []
+    for user_id, days in new_days.items():
+        streak = existing.get(user_id) or _new_streak()
+        # Days inside the current run are already counted; only earlier ones need the history
+        if streak["current_length"] and min(days) < streak["current_start"]:
+            backfilled.append(user_id)
+            continue
+        for day in sorted(days):
+            _extend_streak(streak, day)
+        streaks[user_id] = streak
+
+    if backfilled:
+        streaks.update(_streaks_from_history(connection, backfilled))
+    _upsert_streaks(connection, streaks)
+
+
+def _notify_awards(
+    connection: Connection, awards: Sequence[AwardRecord], points: Mapping[int, int]
+) -> None:
+    """Queue award events on ``AWARD_CHANNEL``; PostgreSQL sends them at commit."""
+    events = [award_event(award, points) for award in awards]
+    payloads = [
+        json.dumps(events[i:i + _NOTIFY_CHUNK_SIZE], separators=(",", ":"))
+        for i in range(0, len(events), _NOTIFY_CHUNK_SIZE)
+    ]
+    connection.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": AWARD_CHANNEL, "payloads": payloads}
+    )
+
+
+def apply_awards(session: Session, awards: Sequence[AwardRecord]) -> None:
+    """Fold freshly inserted awards into the aggregates.
+
+    Must run inside the transaction that inserted the awards. Async callers
+    use ``await db.run_sync(apply_awards, awards)``.
+    """
+    if not awards:
+        return
+    connection = session.connection()
+    points = _achievement_points(connection, (award.achievement_id for award in awards))
+    _apply_user_stats(connection, awards, points)
+    _apply_daily_activity(connection, awards, points)
+    _apply_user_streaks(connection, awards)
+    if connection.dialect.name == "postgresql":
+        _notify_awards(connection, awards, points)
+
+    pending_awards, pending_points = session.info.setdefault(_PENDING_AWARDS_KEY, ([], {}))
+    pending_awards.extend(awards)
+    pending_points.update(points)
+
+
+def rebuild_user_stats(session: Session) -> None:
+    """Recompute ``user_stats`` from the full award log."""
+    connection = session.connection()
+    connection.execute(delete(UserStats))
+    connection.execute(
+        insert(UserStats).from_select(
+            ["user_id", "achievement_count", "total_points", "last_awarded_at"],
+            select(
+                UserAchievement.user_id,
+                func.count(UserAchievement.id),
+                func.sum(Achievement.points),
+                func.max(UserAchievement.awarded_at),
+            ).join(
+                Achievement, UserAchievement.achievement_id == Achievement.id
+            ).group_by(
+                UserAchievement.user_id
+            )
+        )
+    )
+
+
+def rebuild_user_daily_activity(session: Session) -> None:
+    """Recompute ``user_daily_activity`` from the full award log."""
+    connection = session.connection()
+    day = award_day_expression(connection.dialect.name, UserAchievement.awarded_at)
+    connection.execute(delete(UserDailyActivity))
+    connection.execute(
+        insert(UserDailyActivity).from_select(
+            ["user_id", "day", "award_count", "points"],
+            select(
+                UserAchievement.user_id,
+                day,
+                func.count(UserAchievement.id),
+                func.sum(Achievement.points),
+            ).join(
+                Achievement, UserAchievement.achievement_id == Achievement.id
+            ).group_by(
+                UserAchievement.user_id, day
+            )
+        )
+    )
+
+
+def rebuild_user_streaks(session: Session, batch_size: int = 1000) -> None:
+    """Recompute ``user_streaks`` from the full award log.
+
+    Awards are streamed in user order, so only one user's days are held in
+    memory at a time.
+    """
+    connection = session.connection()
+    connection.execute(delete(UserStreak))
+    result = connection.execute(
+        select(UserAchievement.user_id, UserAchievement.awarded_at).order_by(
+            UserAchievement.user_id
+        ),
+        execution_options={"yield_per": batch_size},
+    )
+
+    streaks: Dict[int, Dict] = {}
+    current_user, current_days = None, set()
+
+    def flush_user() -> None:
+        streak = _new_streak()
+        for day in sorted(current_days):
+            _extend_streak(streak, day)
+        streaks[current_user] = streak
+        if len(streaks) >= batch_size:
+            _upsert_streaks(connection, streaks)
+            streaks.clear()
+
+    for row in result:
+        if row.user_id != current_user:
+            if current_user is not None:
+                flush_user()
+            current_user, current_days = row.user_id, set()
+        current_days.add(award_day(row.awarded_at))
+    if current_user is not None:
+        flush_user()
+    _upsert_streaks(connection, streaks)
+
+
+def rebuild_aggregates(session: Session) -> None:
+    """Recompute every aggregate table from the award log."""
+    rebuild_user_stats(session)
+    rebuild_user_daily_activity(session)
+    rebuild_user_streaks(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_flushed_awards(session: Session, flush_context) -> None:
+    """Apply aggregates for awards inserted through the ORM."""
+    awards = [
+        AwardRecord(obj.user_id, obj.achievement_id, obj.awarded_at)
+        for obj in session.new
+        if isinstance(obj, UserAchievement)
+    ]
+    apply_awards(session, awards)
+
+
+def on_awards_committed(listener: AwardListener) -> AwardListener:
+    """Register ``listener(awards, points_by_achievement)`` to run after awards commit.
+
+    Listeners run synchronously inside ``commit()`` and must not do I/O.
+    """
+    _award_listeners.append(listener)
+    return listener
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed_awards(session: Session) -> None:
+    """Hand committed awards to the registered listeners."""
+    pending = session.info.pop(_PENDING_AWARDS_KEY, None)
+    if not pending:
+        return
+    awards, points = pending
+    for listener in _award_listeners:
+        try:
+            listener(awards, points)
+        except Exception:
+            logger.exception("Award listener %r failed", listener)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_awards(session: Session) -> None:
+    """Forget awards from a transaction that did not commit."""
+    session.info.pop(_PENDING_AWARDS_KEY, None)
+
+
+@on_awards_committed
+def _mark_recent_writes(awards: Sequence[AwardRecord], points: Mapping[int, int]) -> None:
+    """Keep reads about freshly awarded users on the primary for a while."""
+    recent_writes.mark({award.user_id for award in awards})
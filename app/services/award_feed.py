@@ -0,0 +1,180 @@
+"""Real-time award feed.
+
+Subscribers (``GET /achievements/awards/stream``) get a bounded queue each,
+optionally filtered to one user. Events come from one of two sources:
+
+* PostgreSQL: ``apply_awards`` publishes every award with ``pg_notify``;
+  ``start`` LISTENs on a single connection per process and fans the events
+  out to all local subscribers, so awards committed by any process reach
+  every subscriber.
+* Anything else (SQLite): committed awards are broadcast in-process through
+  ``on_awards_committed``.
+
+Subscribers that fall behind lose events rather than slowing publishers.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from contextlib import suppress
+from typing import AsyncIterator, Dict, Iterable, Mapping, Optional, Sequence, Set
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.services.aggregates import AWARD_CHANNEL, AwardRecord, award_event, on_awards_committed
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on idle streams
+AWARD_FEED_HEARTBEAT = float(os.getenv("AWARD_FEED_HEARTBEAT", "15"))
+# Events buffered per subscriber before new ones are dropped
+AWARD_FEED_QUEUE_SIZE = int(os.getenv("AWARD_FEED_QUEUE_SIZE", "100"))
+# Seconds between checks that the LISTEN connection is alive
+_LISTENER_CHECK_INTERVAL = 5.0
+
+
+class Subscription:
+    """One subscriber's event queue."""
+
+    def __init__(self, user_id: Optional[int], max_size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Dict]" = asyncio.Queue(max_size)
+        self.dropped = 0
+
+
+class AwardFeed:
+    """Fan-out of award events to subscribers, fed by LISTEN or in-process commits."""
+
+    def __init__(self, queue_size: int = AWARD_FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._listener: Optional[asyncio.Task] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop subscribers and counters (the listener must be stopped)."""
+        # Subscriptions by user id; None holds subscribers to every award
+        self._subscriptions: Dict[Optional[int], Set[Subscription]] = {}
+        self.listening = False
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def subscribe(self, user_id: Optional[int] = None) -> Subscription:
+        """Start receiving events (all awards, or only ``user_id``'s)."""
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, events: Iterable[Dict]) -> None:
+        """Deliver events to matching subscribers without blocking."""
+        everyone = self._subscriptions.get(None, ())
+        for event in events:
+            self.published += 1
+            for subscription in (*everyone, *self._subscriptions.get(event["user_id"], ())):
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    subscription.dropped += 1
+                    self.dropped += 1
+
+    def start(self, engine: AsyncEngine) -> None:
+        """LISTEN for award events on PostgreSQL; other dialects keep the in-process broadcast."""
+        if engine.dialect.name != "postgresql" or self._listener is not None:
+            return
+        self._listener = asyncio.create_task(self._listen(engine))
+
+    async def stop(self) -> None:
+        """Stop listening; later awards fall back to the in-process broadcast."""
+        if self._listener is None:
+            return
+        self._listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._listener
+        self._listener = None
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            events = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed award notification: %r", payload[:200])
+            return
+        self.publish(events)
+
+    async def _listen(self, engine: AsyncEngine) -> None:
+        """Hold one pooled connection LISTENing on ``AWARD_CHANNEL``, reconnecting on failure."""
+        while True:
+            try:
+                async with engine.connect() as connection:
+                    await self._listen_on(connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Award feed listener failed; reconnecting")
+            finally:
+                self.listening = False
+            await asyncio.sleep(_LISTENER_CHECK_INTERVAL)
+
+    async def _listen_on(self, connection: AsyncConnection) -> None:
+        raw = await connection.get_raw_connection()
+        driver_connection = raw.driver_connection
+        await driver_connection.add_listener(AWARD_CHANNEL, self._on_notify)
+        self.listening = True
+        try:
+            while not driver_connection.is_closed():
+                await asyncio.sleep(_LISTENER_CHECK_INTERVAL)
+        finally:
+            if not driver_connection.is_closed():
+                with suppress(Exception):
+                    await driver_connection.remove_listener(AWARD_CHANNEL, self._on_notify)
+        raise ConnectionError("LISTEN connection closed")
+
+    def stats(self) -> Dict[str, int]:
+        """Feed counters."""
+        return {
+            "subscribers": self.subscribers,
+            "listening": int(self.listening),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+async def stream_events(
+    feed: "AwardFeed", user_id: Optional[int] = None, heartbeat: float = AWARD_FEED_HEARTBEAT
+) -> AsyncIterator[bytes]:
+    """Server-Sent Events for new awards, with keep-alive comments while idle."""
+    subscription = feed.subscribe(user_id)
+    try:
+        # Flush headers right away so clients and proxies see an open stream
+        yield b": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            data = json.dumps(event, separators=(",", ":"))
+            yield f"event: award\ndata: {data}\n\n".encode()
+    finally:
+        feed.unsubscribe(subscription)
+
+
+award_feed = AwardFeed()
+
+
+@on_awards_committed
+def _broadcast_committed_awards(awards: Sequence[AwardRecord], points: Mapping[int, int]) -> None:
+    """In-process source, used while no LISTEN connection delivers the events."""
+    if award_feed.listening or not award_feed.subscribers:
+        return
+    award_feed.publish(award_event(award, points) for award in awards)
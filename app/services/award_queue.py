@@ -0,0 +1,162 @@
+"""Write-behind award queue with group commit.
+
+With ``AWARD_QUEUE_ENABLED`` the application lifespan starts a background
+writer, and ``POST /achievements/award`` validates the award and enqueues it
+instead of committing its own transaction. The writer waits up to
+``AWARD_QUEUE_FLUSH_INTERVAL`` seconds (or until ``AWARD_QUEUE_BATCH_SIZE``
+awards are pending) and writes the whole batch through
+``AchievementService.award_achievements`` in one transaction, so a burst of
+awards costs one commit instead of one per request.
+
+Callers either await the batch result (durable once it resolves) or get
+``202 Accepted`` right away. Queued awards live only in process memory:
+shutdown drains the queue, a crash loses what was not yet flushed.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from contextlib import suppress
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas import UserAchievementBatchResult, UserAchievementCreate
+from app.services.achievement_catalog import achievement_catalog
+from app.services.achievement_service import AchievementService, MAX_AWARD_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+AWARD_QUEUE_ENABLED = os.getenv("AWARD_QUEUE_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+AWARD_QUEUE_BATCH_SIZE = min(int(os.getenv("AWARD_QUEUE_BATCH_SIZE", "500")), MAX_AWARD_BATCH_SIZE)
+AWARD_QUEUE_FLUSH_INTERVAL = float(os.getenv("AWARD_QUEUE_FLUSH_INTERVAL", "0.01"))
+# Pending awards beyond this are refused, so a stalled database cannot grow memory unbounded
+AWARD_QUEUE_MAX_SIZE = int(os.getenv("AWARD_QUEUE_MAX_SIZE", "10000"))
+
+PendingAward = Tuple[UserAchievementCreate, "asyncio.Future[UserAchievementBatchResult]"]
+
+
+class AwardQueueFull(Exception):
+    """Raised when ``AWARD_QUEUE_MAX_SIZE`` awards are already pending."""
+
+
+class AwardQueue:
+    """In-process queue of awards written in batched transactions."""
+
+    def __init__(
+        self,
+        batch_size: int = AWARD_QUEUE_BATCH_SIZE,
+        flush_interval: float = AWARD_QUEUE_FLUSH_INTERVAL,
+        max_size: int = AWARD_QUEUE_MAX_SIZE
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._task: Optional[asyncio.Task] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop pending awards and counters (the writer must be stopped)."""
+        self._pending: Deque[PendingAward] = deque()
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closed
+
+    def start(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Start the background writer."""
+        if self._task is not None:
+            raise RuntimeError("Award queue is already running")
+        self._closed = False
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        """Refuse new awards, flush the pending ones and stop the writer."""
+        if self._task is None:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._full.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+    def submit(self, award: UserAchievementCreate) -> "asyncio.Future[UserAchievementBatchResult]":
+        """Queue an award; the future resolves with its result once its batch is committed."""
+        if not self.running:
+            raise RuntimeError("Award queue is not running")
+        if len(self._pending) >= self.max_size:
+            raise AwardQueueFull(f"{self.max_size} awards already pending")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((award, future))
+        self.enqueued += 1
+        self._wakeup.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        return future
+
+    async def enqueue(
+        self, db: AsyncSession, award: UserAchievementCreate
+    ) -> "asyncio.Future[UserAchievementBatchResult]":
+        """Reject unknown achievements up front (from the catalog cache), then ``submit``."""
+        if await achievement_catalog.get(db, award.achievement_id) is None:
+            raise ValueError("Achievement not found")
+        return self.submit(award)
+
+    async def _run(self, session_factory: Callable[[], AsyncSession]) -> None:
+        while self._pending or not self._closed:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if len(self._pending) < self.batch_size and not self._closed:
+                # Give concurrent requests a moment to join this commit
+                self._full.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            await self._flush(session_factory, batch)
+
+    async def _flush(self, session_factory: Callable[[], AsyncSession], batch: List[PendingAward]) -> None:
+        try:
+            async with session_factory() as session:
+                results = await AchievementService(session).award_achievements(
+                    [award for award, _ in batch]
+                )
+        except Exception as e:
+            self.failed += len(batch)
+            logger.exception("Award batch of %d failed", len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+                    # Callers that got 202 never await it; don't log it again
+                    future.exception()
+            return
+        self.batches += 1
+        self.written += len(batch)
+        for (_, future), result in zip(batch, results):
+            # A waiting request may have gone away; its award is written regardless
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, int]:
+        """Queue counters."""
+        return {
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
+
+
+award_queue = AwardQueue()
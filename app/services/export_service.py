@@ -0,0 +1,102 @@
+"""Export service."""
+
+import csv
+import enum
+import io
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User, UserAchievement
+
+# Rows fetched from the server-side cursor per chunk
+EXPORT_CHUNK_SIZE = 1000
+
+
+class ExportFormat(str, enum.Enum):
+    """Supported export formats."""
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    @property
+    def media_type(self) -> str:
+        if self == ExportFormat.CSV:
+            return "text/csv; charset=utf-8"
+        return "application/x-ndjson"
+
+
+def _encode_ndjson(rows: Sequence[Dict[str, Any]]) -> bytes:
+    return "".join(
+        json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in rows
+    ).encode()
+
+
+def _encode_csv(rows: Sequence[Dict[str, Any]], fieldnames: List[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=fieldnames, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode()
+
+
+class ExportService:
+    """Streams tables as NDJSON or CSV with constant memory use.
+
+    Rows are read through a server-side cursor in chunks of
+    ``EXPORT_CHUNK_SIZE`` and each chunk is encoded and yielded before the
+    next one is fetched.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _stream(
+        self,
+        query,
+        fieldnames: List[str],
+        to_dict: Callable[[Any], Dict[str, Any]],
+        export_format: ExportFormat
+    ) -> AsyncIterator[bytes]:
+        if export_format == ExportFormat.CSV:
+            yield (",".join(fieldnames) + "\n").encode()
+
+        result = await self.db.stream(
+            query.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        try:
+            async for partition in result.partitions():
+                rows = [to_dict(row) for row in partition]
+                if export_format == ExportFormat.CSV:
+                    yield _encode_csv(rows, fieldnames)
+                else:
+                    yield _encode_ndjson(rows)
+        finally:
+            await result.close()
+
+    def export_users(self, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        """Stream all users ordered by id."""
+        return self._stream(
+            select(User.id, User.username, User.language).order_by(User.id),
+            ["id", "username", "language"],
+            lambda row: {"id": row.id, "username": row.username, "language": row.language.value},
+            export_format
+        )
+
+    def export_awards(self, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        """Stream all awards ordered by id."""
+        return self._stream(
+            select(
+                UserAchievement.id,
+                UserAchievement.user_id,
+                UserAchievement.achievement_id,
+                UserAchievement.awarded_at
+            ).order_by(UserAchievement.id),
+            ["id", "user_id", "achievement_id", "awarded_at"],
+            lambda row: {
+                "id": row.id,
+                "user_id": row.user_id,
+                "achievement_id": row.achievement_id,
+                "awarded_at": row.awarded_at.isoformat()
+            },
+            export_format
+        )
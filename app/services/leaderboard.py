@@ -0,0 +1,179 @@
+"""In-process points leaderboard.
+
+Point totals from ``user_stats`` are kept in an indexable skip list ordered
+by (points desc, user id), so rank lookups, top-N pages and neighbours of a
+user all cost O(log n) instead of a window function over the aggregate.
+Committed awards are applied as they happen; the whole board is reloaded
+from ``user_stats`` on the primary every ``LEADERBOARD_RELOAD_SECONDS`` to
+pick up awards made by other processes. Users awarded while a load runs are
+re-read before the new board is swapped in, so no award is lost to it.
+"""
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal
+from app.core.skiplist import IndexableSkipList
+from app.models import UserStats
+from app.services.aggregates import AwardRecord, on_awards_committed
+
+LEADERBOARD_RELOAD_SECONDS = float(os.getenv("LEADERBOARD_RELOAD_SECONDS", "300"))
+
+_LOAD_CHUNK_SIZE = 10000
+
+
+class Leaderboard:
+    """Order-statistics view over per-user point totals.
+
+    Only users with at least one award are on the board; users without
+    awards rank after everyone on it.
+    """
+
+    def __init__(
+        self,
+        reload_interval: float = LEADERBOARD_RELOAD_SECONDS,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal
+    ):
+        self.reload_interval = reload_interval
+        # The primary: a lagging replica would drop recent awards until the next reload
+        self.session_factory = session_factory
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all entries; the next read reloads from the database."""
+        # Keys are (-points, user_id), so ascending order is the leaderboard order
+        self._entries = IndexableSkipList()
+        # Distinct -points values, for dense ranks
+        self._values = IndexableSkipList()
+        self._value_counts: Dict[int, int] = {}
+        self._points: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        # Users awarded while a load is running
+        self._awarded_during_load: Optional[Set[int]] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def _add(self, user_id: int, points: int) -> None:
+        self._points[user_id] = points
+        self._entries.insert((-points, user_id))
+        count = self._value_counts.get(points, 0)
+        if count == 0:
+            self._values.insert(-points)
+        self._value_counts[points] = count + 1
+
+    def _remove(self, user_id: int) -> None:
+        points = self._points.pop(user_id)
+        self._entries.remove((-points, user_id))
+        count = self._value_counts[points] - 1
+        if count == 0:
+            del self._value_counts[points]
+            self._values.remove(-points)
+        else:
+            self._value_counts[points] = count
+
+    def set_points(self, user_id: int, points: int) -> None:
+        """Set a user's total."""
+        if user_id in self._points:
+            self._remove(user_id)
+        self._add(user_id, points)
+
+    def add_points(self, deltas: Mapping[int, int]) -> None:
+        """Add point deltas per user; before the first load only a running load is told."""
+        if self._awarded_during_load is not None:
+            self._awarded_during_load.update(deltas)
+        if not self.is_loaded:
+            return
+        for user_id, delta in deltas.items():
+            self.set_points(user_id, self._points.get(user_id, 0) + delta)
+
+    async def ensure_loaded(self) -> None:
+        """Load (or periodically reload) the board from ``user_stats``."""
+        if self.is_loaded and time.monotonic() - self._loaded_at < self.reload_interval:
+            return
+        async with self._lock:
+            if self.is_loaded and time.monotonic() - self._loaded_at < self.reload_interval:
+                return
+            self._awarded_during_load = set()
+            try:
+                async with self.session_factory() as session:
+                    # Build aside and swap, so readers never see a half-loaded board
+                    fresh = await self._load(session)
+                    await session.commit()
+                    # Their awards may or may not be in what was streamed, so
+                    # read their totals again rather than replaying the deltas
+                    while self._awarded_during_load:
+                        user_ids, self._awarded_during_load = self._awarded_during_load, set()
+                        await self._reload_users(session, fresh, user_ids)
+                self._entries, self._values = fresh._entries, fresh._values
+                self._value_counts, self._points = fresh._value_counts, fresh._points
+                self._loaded_at = time.monotonic()
+            finally:
+                self._awarded_during_load = None
+
+    async def _load(self, db: AsyncSession) -> "Leaderboard":
+        result = await db.stream(
+            select(UserStats.user_id, UserStats.total_points).filter(
+                UserStats.achievement_count > 0
+            ).execution_options(yield_per=_LOAD_CHUNK_SIZE)
+        )
+        fresh = Leaderboard(self.reload_interval, self.session_factory)
+        async for row in result:
+            fresh._add(row.user_id, row.total_points)
+        return fresh
+
+    @staticmethod
+    async def _reload_users(db: AsyncSession, board: "Leaderboard", user_ids: Iterable[int]) -> None:
+        result = await db.execute(
+            select(UserStats.user_id, UserStats.total_points).filter(
+                UserStats.user_id.in_(list(user_ids)), UserStats.achievement_count > 0
+            )
+        )
+        for row in result:
+            board.set_points(row.user_id, row.total_points)
+        await db.commit()
+
+    def points_of(self, user_id: int) -> Optional[int]:
+        """A user's total, or None if they are not on the board."""
+        return self._points.get(user_id)
+
+    def ranks(self, points: int) -> Tuple[int, int]:
+        """Competition and dense rank (both 1-based) for a points total."""
+        competition = self._entries.rank((-points, 0)) + 1
+        dense = self._values.rank(-points) + 1
+        return competition, dense
+
+    def position(self, user_id: int) -> Optional[int]:
+        """Zero-based position of a user on the board."""
+        points = self._points.get(user_id)
+        if points is None:
+            return None
+        return self._entries.rank((-points, user_id))
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, int]]:
+        """(user_id, points) entries in leaderboard order."""
+        return [
+            (user_id, -negative_points)
+            for negative_points, user_id in self._entries.iter_from(offset, limit)
+        ]
+
+
+leaderboard = Leaderboard()
+
+
+@on_awards_committed
+def _apply_committed_awards(awards: Sequence[AwardRecord], points: Mapping[int, int]) -> None:
+    deltas: Dict[int, int] = {}
+    for award in awards:
+        deltas[award.user_id] = deltas.get(award.user_id, 0) + points.get(award.achievement_id, 0)
+    leaderboard.add_points(deltas)
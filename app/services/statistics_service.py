@@ -1,11 +1,147 @@
 """Statistics service."""
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, asc, text
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from sqlalchemy import ARRAY, Integer, any_, bindparam, select, func, desc, asc, literal
+from sqlalchemy.engine import Row
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+import enum
 
-from app.models import User, Achievement, UserAchievement
+from app.models import User, Achievement, UserAchievement, UserDailyActivity, UserStats, UserStreak
+from app.services.leaderboard import leaderboard
+
+
+class PointsSource(str, enum.Enum):
+    """Where per-user point totals are read from."""
+    PRECOMPUTED = "precomputed"  # the incrementally maintained user_stats table
+    LIVE = "live"                # aggregated from the award log on each call
+
+
+def resolve_window(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    days: Optional[int] = None,
+    today: Optional[date] = None,
+) -> Tuple[Optional[date], date]:
+    """Turn window parameters into inclusive (start, end) award days.
+
+    ``end`` defaults to today (UTC); ``days`` counts back from ``end``;
+    no ``start`` means all awards up to ``end`` (an as-of query).
+    """
+    if days is not None and start is not None:
+        raise ValueError("Pass either start or days, not both")
+    end = end or today or datetime.now(timezone.utc).date()
+    if days is not None:
+        try:
+            start = end - timedelta(days=days - 1)
+        except OverflowError:
+            raise ValueError("days reaches before the first representable date")
+    if start is not None and start > end:
+        raise ValueError("start must not be after end")
+    return start, end
+
+
+def _top_by_stats(column):
+    """The user with the highest ``column`` in ``user_stats``."""
+    return select(
+        User.id,
+        User.username,
+        column
+    ).join(
+        UserStats, User.id == UserStats.user_id
+    ).filter(
+        UserStats.achievement_count > 0
+    ).order_by(
+        desc(column), UserStats.user_id
+    ).limit(1)
+
+
+_TOP_BY_ACHIEVEMENTS = _top_by_stats(UserStats.achievement_count)
+_TOP_BY_POINTS = _top_by_stats(UserStats.total_points)
+
+
+def _build_top_in_window(column, bounded: bool):
+    """Sum ``column`` over the daily buckets up to ``:end`` (from ``:start`` when ``bounded``)."""
+    total = func.sum(column).label("total")
+    buckets = select(
+        UserDailyActivity.user_id,
+        total
+    ).filter(
+        UserDailyActivity.day <= bindparam("end")
+    )
+    if bounded:
+        buckets = buckets.filter(UserDailyActivity.day >= bindparam("start"))
+    top = buckets.group_by(
+        UserDailyActivity.user_id
+    ).order_by(
+        desc(total), UserDailyActivity.user_id
+    ).limit(1).subquery()
+    return select(User.id, User.username, top.c.total).join(top, User.id == top.c.user_id)
+
+
+# (summed column, has a start day) -> statement
+_TOP_IN_WINDOW = {
+    (column.key, bounded): _build_top_in_window(column, bounded)
+    for column in (UserDailyActivity.award_count, UserDailyActivity.points)
+    for bounded in (False, True)
+}
+
+_LIVE_TOTAL_POINTS = func.coalesce(func.sum(Achievement.points), 0).label("total_points")
+_LIVE_POINTS = select(
+    User.id,
+    User.username,
+    _LIVE_TOTAL_POINTS
+).outerjoin(
+    UserAchievement, User.id == UserAchievement.user_id
+).outerjoin(
+    Achievement, UserAchievement.achievement_id == Achievement.id
+).group_by(
+    User.id, User.username
+)
+# LIMIT 2 doubles as the "at least two users" check
+_LIVE_LOWEST = _LIVE_POINTS.order_by(_LIVE_TOTAL_POINTS, User.id).limit(2)
+_LIVE_HIGHEST = _LIVE_POINTS.order_by(desc(_LIVE_TOTAL_POINTS), User.id).limit(1)
+
+_TWO_USERS = select(User.id).limit(2)
+# Users without a stats row have no awards, i.e. zero points
+_ZERO_POINTS_USER = select(
+    User.id,
+    User.username,
+    literal(0).label("total_points")
+).outerjoin(
+    UserStats, User.id == UserStats.user_id
+).filter(
+    UserStats.user_id.is_(None)
+).order_by(User.id).limit(1)
+_STATS_POINTS = select(
+    User.id,
+    User.username,
+    UserStats.total_points
+).join(
+    UserStats, User.id == UserStats.user_id
+)
+_STATS_LOWEST = _STATS_POINTS.order_by(UserStats.total_points, UserStats.user_id).limit(1)
+_STATS_HIGHEST = _STATS_POINTS.order_by(desc(UserStats.total_points), UserStats.user_id).limit(1)
+
+_STREAK_USERS = select(
+    User.id,
+    User.username,
+    UserStreak.longest_start,
+    UserStreak.longest_length
+).join(
+    UserStreak, User.id == UserStreak.user_id
+).filter(
+    UserStreak.longest_length >= bindparam("min_days")
+).order_by(
+    desc(UserStreak.longest_length), UserStreak.user_id
+)
+
+# An expanding IN renders one placeholder per id, i.e. a new prepared
+# statement for every page size; PostgreSQL takes the ids as one array
+_USERNAMES = select(User.id, User.username).filter(User.id.in_(bindparam("user_ids", expanding=True)))
+_USERNAMES_ARRAY = select(User.id, User.username).filter(
+    User.id == any_(bindparam("user_ids", type_=ARRAY(Integer)))
+)
 
 
 class StatisticsService:
@@ -16,19 +152,7 @@ class StatisticsService:
     
     async def get_top_by_achievements(self) -> Dict[str, Any]:
         """Get user with most achievements (count)."""
-        result = await self.db.execute(
-            select(
-                User.id,
-                User.username,
-                func.count(UserAchievement.id).label("achievement_count")
-            ).join(
-                UserAchievement, User.id == UserAchievement.user_id
-            ).group_by(
-                User.id, User.username
-            ).order_by(
-                desc("achievement_count")
-            ).limit(1)
-        )
+        result = await self.db.execute(_TOP_BY_ACHIEVEMENTS)
         
         top_user = result.first()
         if not top_user:
@@ -42,21 +166,7 @@ class StatisticsService:
     
     async def get_top_by_points(self) -> Dict[str, Any]:
         """Get user with most points (sum)."""
-        result = await self.db.execute(
-            select(
-                User.id,
-                User.username,
-                func.sum(Achievement.points).label("total_points")
-            ).join(
-                UserAchievement, User.id == UserAchievement.user_id
-            ).join(
-                Achievement, UserAchievement.achievement_id == Achievement.id
-            ).group_by(
-                User.id, User.username
-            ).order_by(
-                desc("total_points")
-            ).limit(1)
-        )
+        result = await self.db.execute(_TOP_BY_POINTS)
         
         top_user = result.first()
         if not top_user:
@@ -68,31 +178,60 @@ class StatisticsService:
             "total_points": int(top_user.total_points)
         }
     
-    async def get_min_max_points_difference(self) -> Dict[str, Any]:
-        """Get users with min and max points difference."""
-        # Get all users with their total points
-        result = await self.db.execute(
-            select(
-                User.id,
-                User.username,
-                func.coalesce(func.sum(Achievement.points), 0).label("total_points")
-            ).outerjoin(
-                UserAchievement, User.id == UserAchievement.user_id
-            ).outerjoin(
-                Achievement, UserAchievement.achievement_id == Achievement.id
-            ).group_by(
-                User.id, User.username
-            ).order_by(
-                "total_points"
-            )
-        )
+    async def get_top_by_achievements_in_window(self, start: Optional[date], end: date) -> Dict[str, Any]:
+        """Get user with most achievements awarded between ``start`` and ``end`` (inclusive)."""
+        top_user = await self._top_in_window(UserDailyActivity.award_count, start, end)
+        window = self._window(start, end)
+        if not top_user:
+            return {"message": "No users with achievements found", **window}
         
-        users_with_points = result.all()
-        if len(users_with_points) < 2:
-            return {"message": "Not enough users to calculate difference"}
+        return {
+            "user_id": top_user.id,
+            "username": top_user.username,
+            "achievement_count": int(top_user.total),
+            **window
+        }
+    
+    async def get_top_by_points_in_window(self, start: Optional[date], end: date) -> Dict[str, Any]:
+        """Get user with most points earned between ``start`` and ``end`` (inclusive)."""
+        top_user = await self._top_in_window(UserDailyActivity.points, start, end)
+        window = self._window(start, end)
+        if not top_user:
+            return {"message": "No users with achievements found", **window}
         
-        min_user = users_with_points[0]
-        max_user = users_with_points[-1]
+        return {
+            "user_id": top_user.id,
+            "username": top_user.username,
+            "total_points": int(top_user.total),
+            **window
+        }
+    
+    async def _top_in_window(self, column, start: Optional[date], end: date) -> Optional[Row]:
+        """Sum ``column`` over the window's daily buckets and return the top user."""
+        params = {"end": end} if start is None else {"start": start, "end": end}
+        result = await self.db.execute(_TOP_IN_WINDOW[column.key, start is not None], params)
+        return result.first()
+    
+    @staticmethod
+    def _window(start: Optional[date], end: date) -> Dict[str, Any]:
+        return {"start": start.isoformat() if start else None, "end": end.isoformat()}
+    
+    async def get_min_max_points_difference(
+        self, source: PointsSource = PointsSource.PRECOMPUTED
+    ) -> Dict[str, Any]:
+        """Get users with min and max points difference.
+        
+        Only the two extreme rows are fetched, so memory use does not depend
+        on the number of users. Ties are broken by the lowest user id.
+        """
+        if source == PointsSource.LIVE:
+            extremes = await self._live_points_extremes()
+        else:
+            extremes = await self._precomputed_points_extremes()
+        
+        if extremes is None:
+            return {"message": "Not enough users to calculate difference"}
+        min_user, max_user = extremes
         
         return {
             "min_points_user": {
@@ -108,116 +247,101 @@ class StatisticsService:
             "points_difference": int(max_user.total_points) - int(min_user.total_points)
         }
     
-    async def get_7_day_streak_users(self) -> List[Dict[str, Any]]:
-        """Get users with 7-day achievement streaks."""
-        # Check if we're using SQLite (for tests) or PostgreSQL (for production)
-        engine_name = self.db.bind.dialect.name
-        
-        if engine_name == "sqlite":
-            # SQLite-compatible query
-            query = text("""
-                WITH user_achievement_dates AS (
-                    SELECT 
-                        ua.user_id,
-                        u.username,
-                        DATE(ua.awarded_at) as achievement_date
-                    FROM user_achievements ua
-                    JOIN users u ON ua.user_id = u.id
-                    GROUP BY ua.user_id, u.username, DATE(ua.awarded_at)
-                ),
-                consecutive_days AS (
-                    SELECT 
-                        user_id,
-                        username,
-                        achievement_date,
-                        DATE(achievement_date, '-' || (ROW_NUMBER() OVER (
-                            PARTITION BY user_id 
-                            ORDER BY achievement_date
-                        ) - 1) || ' day') as group_date
-                    FROM user_achievement_dates
-                ),
-                streak_groups AS (
-                    SELECT 
-                        user_id,
-                        username,
-                        group_date,
-                        COUNT(*) as consecutive_days_count,
-                        MIN(achievement_date) as streak_start,
-                        MAX(achievement_date) as streak_end
-                    FROM consecutive_days
-                    GROUP BY user_id, username, group_date
-                    HAVING COUNT(*) >= 7
-                )
-                SELECT 
-                    user_id,
-                    username,
-                    consecutive_days_count,
-                    streak_start,
-                    streak_end
-                FROM streak_groups
-                ORDER BY consecutive_days_count DESC, user_id
-            """)
-        else:
-            # PostgreSQL-compatible query
-            query = text("""
-                WITH user_achievement_dates AS (
-                    SELECT 
-                        ua.user_id,
-                        u.username,
-                        DATE(ua.awarded_at) as achievement_date
-                    FROM user_achievements ua
-                    JOIN users u ON ua.user_id = u.id
-                    GROUP BY ua.user_id, u.username, DATE(ua.awarded_at)
-                ),
-                consecutive_days AS (
-                    SELECT 
-                        user_id,
-                        username,
-                        achievement_date,
-                        achievement_date - INTERVAL '1 day' * ROW_NUMBER() OVER (
-                            PARTITION BY user_id 
-                            ORDER BY achievement_date
-                        ) as group_date
-                    FROM user_achievement_dates
-                ),
-                streak_groups AS (
-                    SELECT 
-                        user_id,
-                        username,
-                        group_date,
-                        COUNT(*) as consecutive_days_count,
-                        MIN(achievement_date) as streak_start,
-                        MAX(achievement_date) as streak_end
-                    FROM consecutive_days
-                    GROUP BY user_id, username, group_date
-                    HAVING COUNT(*) >= 7
-                )
-                SELECT 
-                    user_id,
-                    username,
-                    consecutive_days_count,
-                    streak_start,
-                    streak_end
-                FROM streak_groups
-                ORDER BY consecutive_days_count DESC, user_id
-            """)
+    async def _live_points_extremes(self) -> Optional[Tuple[Row, Row]]:
+        """Aggregate the award log, keeping only the top and bottom rows."""
+        lowest = (await self.db.execute(_LIVE_LOWEST)).all()
+        if len(lowest) < 2:
+            return None
+        highest = (await self.db.execute(_LIVE_HIGHEST)).one()
+        return lowest[0], highest
+    
+    async def _precomputed_points_extremes(self) -> Optional[Tuple[Row, Row]]:
+        """Read the extremes from ``user_stats`` using index lookups only."""
+        enough_users = (await self.db.execute(_TWO_USERS)).all()
+        if len(enough_users) < 2:
+            return None
         
-        result = await self.db.execute(query)
-        streak_users = result.all()
+        zero_user = (await self.db.execute(_ZERO_POINTS_USER)).first()
+        lowest = (await self.db.execute(_STATS_LOWEST)).first()
+        highest = (await self.db.execute(_STATS_HIGHEST)).first()
         
-        if not streak_users:
-            return []
+        candidates = [row for row in (zero_user, lowest, highest) if row is not None]
+        min_user = min(candidates, key=lambda row: (row.total_points, row.id))
+        max_user = min(candidates, key=lambda row: (-row.total_points, row.id))
+        return min_user, max_user
+    
+    async def get_streak_users(self, min_days: int = 7) -> List[Dict[str, Any]]:
+        """Get users whose longest run of consecutive award days is at least ``min_days``."""
+        result = await self.db.execute(_STREAK_USERS, {"min_days": min_days})
         
         response_data = []
-        for user in streak_users:
-            # Handle both string (SQLite) and date (PostgreSQL) formats
-            streak_start = user.streak_start if isinstance(user.streak_start, str) else user.streak_start.isoformat()
-            streak_end = user.streak_end if isinstance(user.streak_end, str) else user.streak_end.isoformat()
+        for user in result.all():
+            streak_end = user.longest_start + timedelta(days=user.longest_length - 1)
             response_data.append({
-                "user_id": user.user_id,
+                "user_id": user.id,
                 "username": user.username,
-                "consecutive_days": user.consecutive_days_count,
-                "streak_start": streak_start,
-                "streak_end": streak_end
+                "consecutive_days": user.longest_length,
+                "streak_start": user.longest_start.isoformat(),
+                "streak_end": streak_end.isoformat()
             })
-        return response_data
\ No newline at end of file
+        return response_data
+    
+    async def get_leaderboard(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """Get a page of the points leaderboard."""
+        await leaderboard.ensure_loaded()
+        entries = leaderboard.page(offset, limit)
+        usernames = await self._usernames([user_id for user_id, _ in entries])
+        return {
+            "total": len(leaderboard),
+            "offset": offset,
+            "entries": [
+                self._leaderboard_entry(user_id, points, usernames)
+                for user_id, points in entries
+            ]
+        }
+    
+    async def get_leaderboard_position(self, user_id: int, neighbours: int = 5) -> Dict[str, Any]:
+        """Get a user's rank and the users directly above and below them."""
+        usernames = await self._usernames([user_id])
+        if user_id not in usernames:
+            raise ValueError("User not found")
+        
+        await leaderboard.ensure_loaded()
+        points = leaderboard.points_of(user_id)
+        if points is None:
+            # Users without awards rank after everyone on the board
+            points = 0
+            position = len(leaderboard)
+            below = []
+        else:
+            position = leaderboard.position(user_id)
+            below = leaderboard.page(position + 1, neighbours)
+        start = max(0, position - neighbours)
+        above = leaderboard.page(start, position - start)
+        
+        usernames.update(await self._usernames(
+            [entry_user_id for entry_user_id, _ in above + below]
+        ))
+        return {
+            **self._leaderboard_entry(user_id, points, usernames),
+            "above": [self._leaderboard_entry(u, p, usernames) for u, p in above],
+            "below": [self._leaderboard_entry(u, p, usernames) for u, p in below]
+        }
+    
+    async def _usernames(self, user_ids: List[int]) -> Dict[int, str]:
+        if not user_ids:
+            return {}
+        query = _USERNAMES_ARRAY if self.db.bind.dialect.name == "postgresql" else _USERNAMES
+        result = await self.db.execute(query, {"user_ids": user_ids})
+        return {row.id: row.username for row in result}
+    
+    @staticmethod
+    def _leaderboard_entry(user_id: int, points: int, usernames: Dict[int, str]) -> Dict[str, Any]:
+        rank, dense_rank = leaderboard.ranks(points)
+        return {
+            "rank": rank,
+            "dense_rank": dense_rank,
+            "user_id": user_id,
+            "username": usernames.get(user_id),
+            "total_points": points
+        }
@@ -0,0 +1,359 @@
+"""Precomputed statistics snapshots.
+
+Results of ``StatisticsService`` methods are kept per (method, arguments)
+and served until they are older than ``STATS_MAX_STALENESS`` seconds. A
+background task started from the application lifespan recomputes the
+default snapshots and those read within the last ``STATS_MAX_STALENESS``
+seconds each ``STATS_REFRESH_INTERVAL`` seconds, so dashboards polling
+``/stats/*`` read memory instead of aggregating on every request. Other
+snapshots (one-off ``min_days`` values or date windows) are left to expire.
+Each snapshot is rendered to JSON once, together with an ETag over that
+body, so serving it is a byte copy and identical results share a tag.
+
+Computations are single-flight: concurrent requests for the same stale
+snapshot await one in-flight query instead of each running it. With
+``STATS_STALE_WHILE_REVALIDATE`` set, a snapshot past its staleness bound
+but within that many extra seconds is served at once while a background
+task recomputes it.
+
+With ``STATS_SHARED_FILE`` set, snapshots are also published to a
+memory-mapped file (``app.core.snapshot_file``) that every worker on the
+host maps. A worker adopts any newer snapshot another worker wrote, only
+the worker holding the file's leader lock runs the periodic refresh, and a
+restarted worker starts from the persisted snapshots.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import ReadSessionLocal
+from app.core.http_cache import make_etag
+from app.core.pagination import dump_json
+from app.core.snapshot_file import LeaderLock, SnapshotFile
+from app.services.statistics_service import StatisticsService, PointsSource
+
+logger = logging.getLogger(__name__)
+
+STATS_MAX_STALENESS = float(os.getenv("STATS_MAX_STALENESS", "30"))
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", "10"))
+# Extra seconds a stale snapshot may be served while it is recomputed (0 disables)
+STATS_STALE_WHILE_REVALIDATE = float(os.getenv("STATS_STALE_WHILE_REVALIDATE", "0"))
+# Snapshot file shared by the workers on one host (empty disables sharing)
+STATS_SHARED_FILE = os.getenv("STATS_SHARED_FILE", "")
+STATS_SHARED_FILE_SIZE = int(os.getenv("STATS_SHARED_FILE_SIZE", str(8 * 1024 * 1024)))
+
+# Bound on distinct (method, arguments) snapshots, e.g. different min_days
+MAX_SNAPSHOTS = 128
+
+SnapshotKey = Tuple[str, Tuple[Hashable, ...]]
+
+# Snapshots the refresher keeps warm even before the first request
+DEFAULT_SNAPSHOT_KEYS: Tuple[SnapshotKey, ...] = (
+    ("get_top_by_achievements", ()),
+    ("get_top_by_points", ()),
+    ("get_min_max_points_difference", (PointsSource.PRECOMPUTED,)),
+    ("get_streak_users", (7,)),
+)
+
+
+@dataclass(frozen=True)
+class StatisticsSnapshot:
+    """A computed statistics result."""
+    value: Any
+    computed_at: datetime
+    computed_monotonic: float
+    # The value rendered as a JSON response body, and its ETag
+    body: bytes
+    etag: str
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.computed_monotonic
+
+
+# Shared file payload: entry count, then per entry the key, ETag and body
+_ENTRY_COUNT = struct.Struct("<I")
+# key length, ETag length, computed_at (Unix time), body length
+_ENTRY = struct.Struct("<HBdI")
+
+# (computed_at, etag, body) by key id
+SharedEntries = Dict[str, Tuple[float, str, bytes]]
+
+
+@lru_cache(maxsize=MAX_SNAPSHOTS * 4)
+def _key_id(key: SnapshotKey) -> str:
+    """Process-independent name of a snapshot key."""
+    method, args = key
+    return json.dumps([method, jsonable_encoder(list(args))], separators=(",", ":"))
+
+
+def _encode_entries(entries: SharedEntries) -> bytes:
+    parts = [_ENTRY_COUNT.pack(len(entries))]
+    for key_id, (computed_at, etag, body) in entries.items():
+        key_bytes, etag_bytes = key_id.encode(), etag.encode()
+        parts.append(_ENTRY.pack(len(key_bytes), len(etag_bytes), computed_at, len(body)))
+        parts.extend((key_bytes, etag_bytes, body))
+    return b"".join(parts)
+
+
+def _decode_entries(payload: bytes) -> SharedEntries:
+    view = memoryview(payload)
+    (count,), offset = _ENTRY_COUNT.unpack_from(view, 0), _ENTRY_COUNT.size
+    entries: SharedEntries = {}
+    for _ in range(count):
+        key_length, etag_length, computed_at, body_length = _ENTRY.unpack_from(view, offset)
+        offset += _ENTRY.size
+        key_id = bytes(view[offset:offset + key_length]).decode()
+        offset += key_length
+        etag = bytes(view[offset:offset + etag_length]).decode()
+        offset += etag_length
+        entries[key_id] = (computed_at, etag, bytes(view[offset:offset + body_length]))
+        offset += body_length
+    return entries
+
+
+class StatisticsSnapshotStore:
+    """Bounded LRU store of statistics snapshots."""
+
+    def __init__(
+        self,
+        max_staleness: float = STATS_MAX_STALENESS,
+        stale_while_revalidate: float = STATS_STALE_WHILE_REVALIDATE,
+        session_factory: Callable[[], AsyncSession] = ReadSessionLocal
+    ):
+        self.max_staleness = max_staleness
+        self.stale_while_revalidate = stale_while_revalidate
+        # Sessions for background revalidation, which outlives the request
+        self.session_factory = session_factory
+        self.shared: Optional[SnapshotFile] = None
+        self.leader: Optional[LeaderLock] = None
+        self.reset()
+
+    def attach_shared(self, path: str, size: int = STATS_SHARED_FILE_SIZE) -> None:
+        """Share snapshots with other workers through the file at ``path``."""
+        self.shared = SnapshotFile(path, size)
+        self.leader = LeaderLock(path)
+        self._shared_generation = 0
+        # Serve the snapshots persisted before a restart right away
+        self._sync_shared()
+
+    def detach_shared(self) -> None:
+        if self.shared is not None:
+            self.leader.release()
+            self.shared.close()
+            self.shared = self.leader = None
+
+    def reset(self) -> None:
+        """Drop all snapshots and counters."""
+        self._snapshots: "OrderedDict[SnapshotKey, StatisticsSnapshot]" = OrderedDict()
+        # Monotonic time each key was last requested through ``get``
+        self._last_read: Dict[SnapshotKey, float] = {}
+        self._inflight: Dict[SnapshotKey, asyncio.Future] = {}
+        self._revalidations: Set[asyncio.Task] = set()
+        # Latest decoded contents of the shared file
+        self._shared_snapshots: Dict[str, StatisticsSnapshot] = {}
+        self._shared_generation = 0
+        self.computations = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    def _store(self, key: SnapshotKey, snapshot: StatisticsSnapshot) -> None:
+        self._snapshots[key] = snapshot
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > MAX_SNAPSHOTS:
+            evicted, _ = self._snapshots.popitem(last=False)
+            self._last_read.pop(evicted, None)
+
+    async def _compute(self, db: AsyncSession, key: SnapshotKey) -> StatisticsSnapshot:
+        method, args = key
+        self.computations += 1
+        value = await getattr(StatisticsService(db), method)(*args)
+        body = dump_json(jsonable_encoder(value))
+        snapshot = StatisticsSnapshot(
+            value, datetime.now(timezone.utc), time.monotonic(), body, make_etag(body)
+        )
+        self._store(key, snapshot)
+        await self._publish(key, snapshot)
+        return snapshot
+
+    def _sync_shared(self) -> None:
+        """Decode the shared file if another worker published since the last look."""
+        if self.shared.generation() == self._shared_generation:
+            return
+        generation, payload = self.shared.read()
+        if payload is None:
+            return
+        now_wall, now_monotonic = time.time(), time.monotonic()
+        snapshots = {}
+        for key_id, (computed_at, etag, body) in _decode_entries(payload).items():
+            previous = self._shared_snapshots.get(key_id)
+            if previous is not None and previous.etag == etag and previous.computed_at.timestamp() == computed_at:
+                snapshots[key_id] = previous
+                continue
+            snapshots[key_id] = StatisticsSnapshot(
+                json.loads(body),
+                datetime.fromtimestamp(computed_at, timezone.utc),
+                now_monotonic - (now_wall - computed_at),
+                body,
+                etag
+            )
+        self._shared_snapshots = snapshots
+        self._shared_generation = generation
+
+    async def _publish(self, key: SnapshotKey, snapshot: StatisticsSnapshot) -> None:
+        """Merge a computed snapshot into the shared file (off the event loop: the file lock blocks)."""
+        if self.shared is None:
+            return
+
+        def merge(payload: Optional[bytes]) -> bytes:
+            entries = _decode_entries(payload) if payload else {}
+            entries[_key_id(key)] = (snapshot.computed_at.timestamp(), snapshot.etag, snapshot.body)
+            if len(entries) > MAX_SNAPSHOTS:
+                newest = sorted(entries.items(), key=lambda item: item[1][0])[-MAX_SNAPSHOTS:]
+                entries = dict(newest)
+            return _encode_entries(entries)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.shared.update, merge)
+        except (OSError, ValueError):
+            logger.exception("Publishing statistics snapshot %s to the shared file failed", key[0])
+
+    async def compute(self, db: AsyncSession, key: SnapshotKey) -> StatisticsSnapshot:
+        """Recompute one snapshot and store it, joining a computation already in flight."""
+        while (future := self._inflight.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                # Shielded, so a cancelled waiter does not cancel the shared computation
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The computing request was cancelled; take over
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            snapshot = await self._compute(db, key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; don't log it as never retrieved when there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(snapshot)
+            return snapshot
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _revalidate(self, key: SnapshotKey) -> None:
+        try:
+            async with self.session_factory() as session:
+                await self.compute(session, key)
+        except Exception:
+            logger.exception("Statistics snapshot revalidation failed for %s", key[0])
+
+    def _schedule_revalidation(self, key: SnapshotKey) -> None:
+        if key in self._inflight:
+            return
+        task = asyncio.create_task(self._revalidate(key))
+        # Hold a reference until done so the task is not garbage collected
+        self._revalidations.add(task)
+        task.add_done_callback(self._revalidations.discard)
+
+    async def get(self, db: AsyncSession, method: str, *args: Hashable) -> StatisticsSnapshot:
+        """Latest snapshot for ``StatisticsService.<method>(*args)``, recomputed if too stale."""
+        key = (method, args)
+        self._last_read[key] = time.monotonic()
+        snapshot: Optional[StatisticsSnapshot] = self._snapshots.get(key)
+        if self.shared is not None:
+            self._sync_shared()
+            shared = self._shared_snapshots.get(_key_id(key))
+            if shared is not None and (snapshot is None or shared.computed_at > snapshot.computed_at):
+                # Another worker computed it more recently
+                self._store(key, shared)
+                snapshot = shared
+        if snapshot is not None:
+            age = snapshot.age
+            if age < self.max_staleness:
+                self._snapshots.move_to_end(key)
+                return snapshot
+            if age < self.max_staleness + self.stale_while_revalidate:
+                self._snapshots.move_to_end(key)
+                self.stale_served += 1
+                self._schedule_revalidation(key)
+                return snapshot
+        return await self.compute(db, key)
+
+    def stats(self) -> Dict[str, int]:
+        """Store counters."""
+        return {
+            "snapshots": len(self._snapshots),
+            "computations": self.computations,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "in_flight": len(self._inflight),
+            "shared_generation": self._shared_generation,
+            "leader": int(self.leader is not None and self.leader.held),
+        }
+
+    def _expire_unread(self) -> Tuple[SnapshotKey, ...]:
+        """Drop snapshots nobody can be served any more; returns the keys read recently."""
+        now = time.monotonic()
+        recent = tuple(
+            key for key in self._snapshots
+            if now - self._last_read.get(key, float("-inf")) <= self.max_staleness
+        )
+        servable = self.max_staleness + self.stale_while_revalidate
+        for key in [
+            key for key, snapshot in self._snapshots.items()
+            if key not in recent and key not in DEFAULT_SNAPSHOT_KEYS and snapshot.age >= servable
+        ]:
+            del self._snapshots[key]
+            self._last_read.pop(key, None)
+        return recent
+
+    async def refresh_all(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Recompute the default snapshots and those read within the staleness window."""
+        keys = list(dict.fromkeys(DEFAULT_SNAPSHOT_KEYS + self._expire_unread()))
+        async with session_factory() as session:
+            for key in keys:
+                await self.compute(session, key)
+                # Release the read snapshot between statements
+                await session.commit()
+
+    async def run_refresher(
+        self, session_factory: Callable[[], AsyncSession], interval: float = STATS_REFRESH_INTERVAL
+    ) -> None:
+        """Refresh all snapshots every ``interval`` seconds until cancelled.
+        
+        With a shared file only the leader refreshes; the others keep trying
+        to take over in case it exits.
+        """
+        while True:
+            try:
+                if self.leader is None or self.leader.try_acquire():
+                    await self.refresh_all(session_factory)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Statistics snapshot refresh failed")
+            await asyncio.sleep(interval)
+
+
+statistics_snapshots = StatisticsSnapshotStore()
@@ -1,12 +1,26 @@
 """User service."""
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import String, bindparam, case, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 
-from app.models import User, UserAchievement, Achievement
+from app.core.database import dialect_insert, recent_writes
+from app.core.pagination import JSONPage, dump_json
+from app.models import User, UserAchievement
 from app.schemas import UserCreate, AchievementLocalized
 from app.models.user import LanguageEnum
+from app.services.achievement_catalog import achievement_catalog
+
+_USER_BY_ID = select(User).filter(User.id == bindparam("user_id"))
+_USER_ACHIEVEMENT_IDS = select(
+    UserAchievement.achievement_id
+).filter(
+    UserAchievement.user_id == bindparam("user_id")
+).order_by(
+    UserAchievement.id
+)
 
 
 class UserService:
@@ -16,69 +30,107 @@ class UserService:
         self.db = db
     
     async def create_user(self, user: UserCreate) -> User:
-        """Create a new user."""
+        """Create a new user.
+        
+        Uniqueness is enforced by the username constraint in a single
+        ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` statement.
+        """
+        stmt = dialect_insert(self.db.bind, User).values(
+            username=user.username,
+            language=user.language
+        ).on_conflict_do_nothing(
+            index_elements=["username"]
+        ).returning(User)
         try:
-            # Check if username already exists
-            result = await self.db.execute(
-                select(User).filter(User.username == user.username)
-            )
-            existing_user = result.scalar_one_or_none()
-            if existing_user:
+            db_user = (await self.db.scalars(stmt)).one_or_none()
+            if db_user is None:
                 raise ValueError("Username already exists")
-            
-            db_user = User(
-                username=user.username,
-                language=user.language
-            )
-            self.db.add(db_user)
             await self.db.commit()
-            await self.db.refresh(db_user)
+            recent_writes.mark([db_user.id])
             return db_user
+        except IntegrityError:
+            await self.db.rollback()
+            raise ValueError("Username already exists")
         except Exception as e:
             await self.db.rollback()
             raise e
     
     async def get_user(self, user_id: int) -> Optional[User]:
         """Get user by ID."""
-        result = await self.db.execute(
-            select(User).filter(User.id == user_id)
-        )
+        result = await self.db.execute(_USER_BY_ID, {"user_id": user_id})
         return result.scalar_one_or_none()
     
-    async def get_users(self, skip: int = 0, limit: int = 100) -> List[User]:
-        """Get all users."""
-        result = await self.db.execute(
-            select(User).offset(skip).limit(limit)
-        )
+    @staticmethod
+    def _page(query, skip: int, limit: int, after_id: Optional[int]):
+        query = query.order_by(User.id).limit(limit)
+        if after_id is not None:
+            return query.filter(User.id > after_id)
+        return query.offset(skip)
+    
+    async def get_users(self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[User]:
+        """Get all users ordered by id.
+        
+        With ``after_id`` the page starts right after that id (keyset
+        pagination), so every page costs the same as the first one.
+        """
+        result = await self.db.execute(self._page(select(User), skip, limit, after_id))
         return result.scalars().all()
     
+    async def get_users_json(self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> JSONPage:
+        """Same page as ``get_users``, rendered as the ``List[UserResponse]`` JSON body.
+        
+        On PostgreSQL ``json_agg`` builds the body in the database and it
+        comes back as ``bytea``; elsewhere plain rows are serialised without
+        ORM objects or Pydantic models.
+        """
+        page = self._page(select(User.id, User.username, User.language), skip, limit, after_id)
+        if self.db.bind.dialect.name == "postgresql":
+            page = page.subquery()
+            # Enum columns store member names; the API returns the values
+            language = case(
+                {member.name: member.value for member in LanguageEnum},
+                value=cast(page.c.language, String)
+            )
+            rows = func.json_agg(aggregate_order_by(
+                func.json_build_object(
+                    "username", page.c.username, "language", language, "id", page.c.id
+                ),
+                page.c.id
+            ))
+            body = func.convert_to(
+                cast(func.coalesce(rows, literal_column("'[]'::json")), String), "UTF8"
+            )
+            result = await self.db.execute(select(body, func.count(), func.max(page.c.id)))
+            body, count, last_id = result.one()
+            return JSONPage(body=bytes(body), count=count, last_id=last_id)
+        
+        rows = (await self.db.execute(page)).all()
+        return JSONPage(
+            body=dump_json([
+                {"username": username, "language": language.value, "id": user_id}
+                for user_id, username, language in rows
+            ]),
+            count=len(rows),
+            last_id=rows[-1].id if rows else None
+        )
+    
     async def get_user_achievements(self, user_id: int) -> List[AchievementLocalized]:
         """Get user achievements in user's language."""
         user = await self.get_user(user_id)
         if not user:
             raise ValueError("User not found")
         
-        # Get user's achievements with localized names
-        result = await self.db.execute(
-            select(
-                Achievement.id,
-                Achievement.name_ru,
-                Achievement.name_en,
-                Achievement.description_ru,
-                Achievement.description_en,
-                Achievement.points,
-                UserAchievement.awarded_at
-            ).join(
-                UserAchievement, Achievement.id == UserAchievement.achievement_id
-            ).filter(
-                UserAchievement.user_id == user_id
-            )
-        )
-        achievements = result.all()
+        # Only the award keys come from the database; texts come from the catalog cache
+        result = await self.db.execute(_USER_ACHIEVEMENT_IDS, {"user_id": user_id})
+        achievement_ids = result.scalars().all()
+        catalog = await achievement_catalog.get_many(self.db, achievement_ids)
         
         # Localize based on user's language
         localized_achievements = []
-        for achievement in achievements:
+        for achievement_id in achievement_ids:
+            achievement = catalog.get(achievement_id)
+            if achievement is None:
+                continue
             if user.language == LanguageEnum.RU:
                 name = achievement.name_ru
                 description = achievement.description_ru
@@ -93,4 +145,4 @@ class UserService:
                 points=achievement.points
             ))
         
-        return localized_achievements
\ No newline at end of file
+        return localized_achievements
@@ -0,0 +1,190 @@
+"""Startup warmup and readiness.
+
+A fresh worker pays for opening connections, compiling statements (and, on
+asyncpg, preparing them) and loading its in-process caches on its first
+requests. The application lifespan runs ``run_warmup`` in the background
+instead: it opens ``WARMUP_CONNECTIONS`` pooled connections, issues every
+read-path service query once and primes the achievement catalog, the
+leaderboard and the statistics snapshots. ``GET /ready`` answers 503 until
+that has finished, so health checks only send traffic to warm workers.
+
+Warmup only reads (the award path is exercised with a user that cannot
+exist, so nothing is inserted). A failed attempt, e.g. while the database
+is still starting, is retried every ``WARMUP_RETRY_INTERVAL`` seconds.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import AsyncExitStack, suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.schemas import UserAchievementCreate
+from app.services.achievement_catalog import achievement_catalog
+from app.services.achievement_service import AchievementService
+from app.services.statistics_service import StatisticsService, resolve_window
+from app.services.statistics_snapshot import DEFAULT_SNAPSHOT_KEYS, statistics_snapshots
+from app.services.user_service import UserService
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# Connections opened per engine before serving (capped at the pool size)
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "5"))
+# Seconds between attempts while warmup keeps failing
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))
+
+SessionFactory = Callable[[], AsyncSession]
+
+
+class Readiness:
+    """Whether this process finished warming up, with timings of the last attempt."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.ready = False
+        self.attempts = 0
+        self.error: Optional[str] = None
+        # Step name -> seconds it took
+        self.steps: Dict[str, float] = {}
+        self.finished_at: Optional[float] = None
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.error = None
+        self.finished_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        """Readiness state for ``GET /ready``."""
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "attempts": self.attempts,
+            "error": self.error,
+            "steps": {name: round(seconds, 4) for name, seconds in self.steps.items()},
+        }
+
+
+readiness = Readiness()
+
+
+def _pool_capacity(engine: AsyncEngine) -> int:
+    """Persistent connections the engine's pool keeps (1 for SQLite's static pools)."""
+    size = getattr(engine.sync_engine.pool, "size", None)
+    return size() if callable(size) else 1
+
+
+async def open_connections(engine: AsyncEngine, count: int = WARMUP_CONNECTIONS) -> int:
+    """Check out up to ``count`` connections at once so the pool establishes them; returns how many."""
+    count = min(count, _pool_capacity(engine))
+    async with AsyncExitStack() as stack:
+        for _ in range(count):
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.execute(text("SELECT 1"))
+    return count
+
+
+async def _run_read_queries(db: AsyncSession) -> None:
+    """Issue every read-path service query once; primes the catalog and the leaderboard."""
+    users = UserService(db)
+    achievements = AchievementService(db)
+    statistics = StatisticsService(db)
+
+    page = await users.get_users(0, 1)
+    await users.get_users_json(0, 1)
+    await users.get_users_json(0, 1, 0)
+    await achievements.get_achievements_json(0, 1)
+    await statistics.get_leaderboard(0, 1)
+    if page:
+        await users.get_user(page[0].id)
+        await users.get_user_achievements(page[0].id)
+        await statistics.get_leaderboard_position(page[0].id)
+    catalog = await achievement_catalog.all(db)
+    if catalog:
+        await achievements.get_achievement_json(catalog[0].id)
+    await db.commit()
+
+
+async def _run_award_queries(db: AsyncSession) -> None:
+    """Compile the award statements; user 0 never exists, so both calls write nothing."""
+    catalog = await achievement_catalog.all(db)
+    if not catalog:
+        return
+    award = UserAchievementCreate(user_id=0, achievement_id=catalog[0].id)
+    with suppress(ValueError):
+        await AchievementService(db).award_achievement(award)
+    await AchievementService(db).award_achievements([award])
+
+
+async def _prime_snapshots(session_factory: SessionFactory) -> None:
+    """Load the default statistics snapshots and this week's windows (adopted from the shared file when fresh)."""
+    start, end = resolve_window(None, None, 7)
+    keys = DEFAULT_SNAPSHOT_KEYS + (
+        ("get_top_by_achievements_in_window", (start, end)),
+        ("get_top_by_points_in_window", (start, end)),
+    )
+    async with session_factory() as session:
+        for method, args in keys:
+            await statistics_snapshots.get(session, method, *args)
+            await session.commit()
+
+
+async def _with_session(session_factory: SessionFactory, work: Callable[[AsyncSession], Awaitable[None]]) -> None:
+    async with session_factory() as session:
+        await work(session)
+
+
+async def warm_up(
+    engines: Dict[str, AsyncEngine],
+    session_factory: SessionFactory,
+    read_session_factory: SessionFactory,
+    connections: int = WARMUP_CONNECTIONS
+) -> Dict[str, float]:
+    """Run every warmup step once; returns seconds per step.
+    
+    ``engines`` maps a pool name (``primary``, ``read``) to its engine.
+    """
+    steps: List[Tuple[str, Callable[[], Awaitable[Any]]]] = [
+        (f"connections_{name}", lambda engine=engine: open_connections(engine, connections))
+        for name, engine in engines.items()
+    ]
+    steps += [
+        ("read_queries", lambda: _with_session(read_session_factory, _run_read_queries)),
+        ("award_queries", lambda: _with_session(session_factory, _run_award_queries)),
+        ("statistics_snapshots", lambda: _prime_snapshots(read_session_factory)),
+    ]
+    timings: Dict[str, float] = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        await step()
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+async def run_warmup(
+    engines: Dict[str, AsyncEngine],
+    session_factory: SessionFactory,
+    read_session_factory: SessionFactory,
+    retry_interval: float = WARMUP_RETRY_INTERVAL,
+    state: Readiness = readiness
+) -> None:
+    """Warm up until an attempt succeeds, then mark the process ready."""
+    while True:
+        state.attempts += 1
+        try:
+            state.steps = await warm_up(engines, session_factory, read_session_factory)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            state.error = f"{type(e).__name__}: {e}"
+            logger.exception("Warmup attempt %d failed; retrying in %.1fs", state.attempts, retry_interval)
+            await asyncio.sleep(retry_interval)
+            continue
+        state.mark_ready()
+        logger.info("Warmup finished in %.3fs", sum(state.steps.values()))
+        return
@@ -1,6 +1,7 @@
 """Test configuration and fixtures."""
 
 import asyncio
+from contextlib import contextmanager
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
@@ -9,8 +10,15 @@ from sqlalchemy.pool import StaticPool
 from fastapi import FastAPI
 
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.database import Base, get_db, get_read_db, recent_writes
+from app.core.query_budget import track_queries
 from app.models import User, Achievement, UserAchievement
+from app.services.achievement_catalog import achievement_catalog
+from app.services.award_feed import award_feed
+from app.services.award_queue import award_queue
+from app.services.leaderboard import leaderboard
+from app.services.statistics_snapshot import statistics_snapshots
+from app.services.warmup import readiness
 
 
 # Test database URL - using SQLite for tests
@@ -28,10 +36,24 @@ TestSessionLocal = async_sessionmaker(
     test_engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Background snapshot revalidation, leaderboard loads and catalog reloads open their own sessions
+statistics_snapshots.session_factory = TestSessionLocal
+leaderboard.session_factory = TestSessionLocal
+achievement_catalog.session_factory = TestSessionLocal
+
 
 @pytest_asyncio.fixture(scope="function")
 async def test_db():
     """Create test database and return session."""
+    # Process-wide caches must not leak rows between test databases
+    achievement_catalog.reset()
+    leaderboard.reset()
+    statistics_snapshots.reset()
+    recent_writes.reset()
+    award_queue.reset()
+    award_feed.reset()
+    readiness.reset()
+    
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
@@ -51,6 +73,7 @@ async def client(test_db: AsyncSession):
         yield test_db
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     
     async with AsyncClient(app=app, base_url="http://test") as test_client:
         yield test_client
@@ -59,6 +82,26 @@ async def client(test_db: AsyncSession):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def assert_max_queries():
+    """Fail if the block executes more than ``limit`` SQL statements.
+
+    Usage::
+
+        with assert_max_queries(2):
+            await client.get("/users/1")
+    """
+    @contextmanager
+    def _assert_max_queries(limit: int):
+        with track_queries() as stats:
+            yield stats
+        assert stats.count <= limit, (
+            f"{stats.count} statements executed, budget is {limit}:\n{stats.describe(repeat_threshold=1)}"
+        )
+    
+    return _assert_max_queries
+
+
 @pytest_asyncio.fixture
 async def sample_user(test_db: AsyncSession):
     """Create a sample user for testing."""
@@ -1,10 +1,24 @@
 """Tests for achievement endpoints."""
 
+import asyncio
+import json
+from datetime import datetime, timezone
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import User, Achievement
+from app.core.http_cache import CATALOG_CACHE_MAX_AGE
+from app.core.pagination import NEXT_CURSOR_HEADER, dump_json
+from app.models import User, Achievement, UserAchievement
+from app.schemas import AchievementResponse, UserAchievementCreate
+from app.services.achievement_catalog import achievement_catalog
+from app.services.achievement_service import AchievementService, MAX_AWARD_BATCH_SIZE
+from app.services.award_feed import award_feed, stream_events
+from app.services.award_queue import award_queue
+from app.tests.conftest import TestSessionLocal
 
 
 class TestAchievementEndpoints:
@@ -200,4 +214,388 @@ class TestAchievementEndpoints:
         
         response = await client.post("/achievements/", json=achievement_data)
         
-        assert response.status_code == 422  # Validation error
\ No newline at end of file
+        assert response.status_code == 422  # Validation error
+
+    @pytest.mark.asyncio
+    async def test_award_batch(self, client: AsyncClient, multiple_users, multiple_achievements):
+        """Test batch award with per-item statuses."""
+        user, other_user = multiple_users[0], multiple_users[1]
+        first, second = multiple_achievements[0], multiple_achievements[1]
+        
+        response = await client.post("/achievements/award", json={
+            "user_id": other_user.id, "achievement_id": first.id
+        })
+        assert response.status_code == 201
+        
+        batch = [
+            {"user_id": user.id, "achievement_id": first.id},
+            {"user_id": user.id, "achievement_id": second.id},
+            {"user_id": user.id, "achievement_id": first.id},         # repeated in batch
+            {"user_id": other_user.id, "achievement_id": first.id},   # already awarded
+            {"user_id": 999, "achievement_id": first.id},
+            {"user_id": user.id, "achievement_id": 999},
+        ]
+        response = await client.post("/achievements/award/batch", json=batch)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["status"] for item in data] == [
+            "awarded", "awarded", "duplicate", "duplicate", "unknown_user", "unknown_achievement"
+        ]
+        assert data[0]["id"] is not None and data[0]["awarded_at"] is not None
+        assert data[2]["id"] is None
+        
+        user_achievements = (await client.get(f"/users/{user.id}/achievements")).json()
+        assert {a["id"] for a in user_achievements} == {first.id, second.id}
+        
+        stats = (await client.get("/stats/top-by-achievements")).json()
+        assert stats["user_id"] == user.id
+        assert stats["achievement_count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_award_batch_user_removed_before_insert(
+        self, client: AsyncClient, test_db: AsyncSession, multiple_users, sample_achievement: Achievement, monkeypatch
+    ):
+        """Test that a batch whose user disappears before the INSERT is checked again."""
+        removed, kept = multiple_users[0], multiple_users[1]
+        insert_batch = AchievementService._insert_batch
+        
+        async def remove_user_first(service, to_insert):
+            monkeypatch.setattr(AchievementService, "_insert_batch", insert_batch)
+            await test_db.delete(removed)
+            await test_db.commit()
+            raise IntegrityError("INSERT INTO user_achievements", {}, Exception("FOREIGN KEY constraint failed"))
+        
+        monkeypatch.setattr(AchievementService, "_insert_batch", remove_user_first)
+        response = await client.post("/achievements/award/batch", json=[
+            {"user_id": removed.id, "achievement_id": sample_achievement.id},
+            {"user_id": kept.id, "achievement_id": sample_achievement.id},
+        ])
+        
+        assert response.status_code == 200
+        assert [item["status"] for item in response.json()] == ["unknown_user", "awarded"]
+
+    @pytest.mark.asyncio
+    async def test_award_batch_conflicts_twice(
+        self, client: AsyncClient, sample_user: User, sample_achievement: Achievement, monkeypatch
+    ):
+        """Test that a batch conflicting again after the re-check is rejected."""
+        async def conflict(service, to_insert):
+            raise IntegrityError("INSERT INTO user_achievements", {}, Exception("FOREIGN KEY constraint failed"))
+        
+        monkeypatch.setattr(AchievementService, "_insert_batch", conflict)
+        response = await client.post("/achievements/award/batch", json=[
+            {"user_id": sample_user.id, "achievement_id": sample_achievement.id},
+        ])
+        
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_award_batch_empty(self, client: AsyncClient):
+        """Test that an empty batch is a no-op."""
+        response = await client.post("/achievements/award/batch", json=[])
+        
+        assert response.status_code == 200
+        assert response.json() == []
+
+    @pytest.mark.asyncio
+    async def test_award_batch_too_large(self, client: AsyncClient):
+        """Test that oversized batches are rejected."""
+        batch = [{"user_id": 1, "achievement_id": i} for i in range(MAX_AWARD_BATCH_SIZE + 1)]
+        
+        response = await client.post("/achievements/award/batch", json=batch)
+        
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_award_achievement_response(self, client: AsyncClient, sample_user: User, sample_achievement: Achievement):
+        """Test that the award endpoint returns the created award."""
+        response = await client.post("/achievements/award", json={
+            "user_id": sample_user.id,
+            "achievement_id": sample_achievement.id
+        })
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["user_id"] == sample_user.id
+        assert data["achievement_id"] == sample_achievement.id
+        assert "id" in data and "awarded_at" in data
+
+    @pytest.mark.asyncio
+    async def test_duplicate_award_rejected_by_database(self, test_db: AsyncSession, sample_user: User, sample_achievement: Achievement):
+        """Test that the unique constraint blocks double awards that skip the service."""
+        user_id, achievement_id = sample_user.id, sample_achievement.id
+        test_db.add(UserAchievement(user_id=user_id, achievement_id=achievement_id))
+        await test_db.commit()
+        
+        test_db.add(UserAchievement(user_id=user_id, achievement_id=achievement_id))
+        with pytest.raises(IntegrityError):
+            await test_db.commit()
+        await test_db.rollback()
+        
+        service = AchievementService(test_db)
+        with pytest.raises(ValueError, match="User already has this achievement"):
+            await service.award_achievement(
+                UserAchievementCreate(user_id=user_id, achievement_id=achievement_id)
+            )
+
+    @pytest.mark.asyncio
+    async def test_catalog_cache_serves_reads(self, client: AsyncClient, multiple_achievements):
+        """Test that catalog reads hit the cache and creation invalidates it."""
+        achievement = multiple_achievements[0]
+        
+        for _ in range(3):
+            response = await client.get(f"/achievements/{achievement.id}")
+            assert response.status_code == 200
+            assert response.json()["name_en"] == "Beginner"
+        stats = achievement_catalog.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+        assert stats["size"] == 5
+        
+        response = await client.post("/achievements/", json={
+            "name_ru": "Новое", "name_en": "New",
+            "description_ru": "Новое", "description_en": "New", "points": 7
+        })
+        assert response.status_code == 201
+        assert achievement_catalog.stats()["version"] == 1
+        
+        response = await client.get("/achievements/")
+        assert len(response.json()) == 6
+        assert achievement_catalog.stats()["misses"] == 2
+
+    @pytest.mark.asyncio
+    async def test_catalog_reloads_from_primary_after_create(
+        self, client: AsyncClient, multiple_achievements, monkeypatch
+    ):
+        """Test that only the reload after an invalidation opens a primary session."""
+        primary_sessions = []
+        
+        def primary():
+            primary_sessions.append(True)
+            return TestSessionLocal()
+        
+        monkeypatch.setattr(achievement_catalog, "session_factory", primary)
+        assert (await client.get("/achievements/")).status_code == 200
+        assert primary_sessions == []
+        
+        response = await client.post("/achievements/", json={
+            "name_ru": "Новое", "name_en": "New",
+            "description_ru": "Новое", "description_en": "New", "points": 7
+        })
+        assert response.status_code == 201
+        
+        response = await client.get(f"/achievements/{response.json()['id']}")
+        assert response.status_code == 200
+        assert len(primary_sessions) == 1
+        assert len((await client.get("/achievements/")).json()) == 6
+        assert len(primary_sessions) == 1
+
+    @pytest.mark.asyncio
+    async def test_get_achievements_cursor_pagination(self, client: AsyncClient, multiple_achievements):
+        """Test keyset pagination over the achievement catalog."""
+        response = await client.get("/achievements/?limit=3")
+        first_page = [a["id"] for a in response.json()]
+        cursor = response.headers[NEXT_CURSOR_HEADER]
+        
+        response = await client.get(f"/achievements/?limit=3&after={cursor}")
+        second_page = [a["id"] for a in response.json()]
+        
+        assert first_page + second_page == sorted(a.id for a in multiple_achievements)
+        assert NEXT_CURSOR_HEADER not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_get_achievements_json_matches_response_model(self, client: AsyncClient, multiple_achievements):
+        """Test that the pre-rendered achievement list is the body response_model would produce."""
+        response = await client.get("/achievements/?skip=1&limit=2")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        expected = [
+            AchievementResponse.model_validate(achievement).model_dump(mode="json")
+            for achievement in multiple_achievements[1:3]
+        ]
+        assert response.content == dump_json(expected)
+        
+        response = await client.get("/achievements/?skip=100")
+        assert response.content == b"[]"
+
+    @pytest.mark.asyncio
+    async def test_achievements_conditional_get(self, client: AsyncClient, multiple_achievements, assert_max_queries):
+        """Test ETags, 304 responses and Cache-Control on catalog reads."""
+        achievement_id = multiple_achievements[0].id
+        for url in ("/achievements/?limit=3", f"/achievements/{achievement_id}"):
+            response = await client.get(url)
+            etag = response.headers["etag"]
+            assert response.headers["cache-control"] == f"public, max-age={CATALOG_CACHE_MAX_AGE}"
+            
+            with assert_max_queries(0):
+                response = await client.get(url, headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            assert response.content == b""
+        
+        list_etag = (await client.get("/achievements/?limit=3")).headers["etag"]
+        assert (await client.get("/achievements/?limit=2")).headers["etag"] != list_etag
+        
+        # A new achievement changes the catalog and with it every list ETag
+        await client.post("/achievements/", json={
+            "name_ru": "Новое", "name_en": "New",
+            "description_ru": "Новое", "description_en": "New", "points": 1
+        })
+        response = await client.get("/achievements/?limit=3", headers={"If-None-Match": list_etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != list_etag
+
+    @pytest.mark.asyncio
+    async def test_award_queue_group_commit(self, client: AsyncClient, test_db: AsyncSession, multiple_users, multiple_achievements, monkeypatch):
+        """Test that concurrent queued awards are committed together with per-request results."""
+        monkeypatch.setattr(award_queue, "flush_interval", 0.05)
+        award_queue.start(TestSessionLocal)
+        try:
+            pairs = [(user.id, achievement.id) for user in multiple_users for achievement in multiple_achievements[:2]]
+            responses = await asyncio.gather(*(
+                client.post("/achievements/award", json={"user_id": user_id, "achievement_id": achievement_id})
+                for user_id, achievement_id in pairs
+            ))
+            assert [response.status_code for response in responses] == [201] * len(pairs)
+            assert {(r.json()["user_id"], r.json()["achievement_id"]) for r in responses} == set(pairs)
+            assert all(r.json()["id"] and r.json()["awarded_at"] for r in responses)
+            assert award_queue.stats()["batches"] < len(pairs)
+            
+            user_id, achievement_id = pairs[0]
+            response = await client.post("/achievements/award", json={"user_id": user_id, "achievement_id": achievement_id})
+            assert response.status_code == 400
+            assert response.json()["detail"] == "User already has this achievement"
+            response = await client.post("/achievements/award", json={"user_id": 99999, "achievement_id": achievement_id})
+            assert response.json()["detail"] == "User not found"
+            response = await client.post("/achievements/award", json={"user_id": user_id, "achievement_id": 99999})
+            assert response.json()["detail"] == "Achievement not found"
+        finally:
+            await award_queue.stop()
+        
+        count = await test_db.scalar(select(func.count()).select_from(UserAchievement))
+        assert count == len(pairs)
+
+    @pytest.mark.asyncio
+    async def test_award_queue_accepted_and_full(self, client: AsyncClient, test_db: AsyncSession, sample_user: User, multiple_achievements, monkeypatch):
+        """Test 202 responses, backpressure and flushing on shutdown."""
+        monkeypatch.setattr(award_queue, "flush_interval", 60)
+        monkeypatch.setattr(award_queue, "max_size", 2)
+        award_queue.start(TestSessionLocal)
+        try:
+            for achievement in multiple_achievements[:2]:
+                response = await client.post(
+                    "/achievements/award?wait=false",
+                    json={"user_id": sample_user.id, "achievement_id": achievement.id}
+                )
+                assert response.status_code == 202
+                assert response.json() == {
+                    "user_id": sample_user.id, "achievement_id": achievement.id, "status": "queued"
+                }
+            
+            response = await client.post(
+                "/achievements/award?wait=false",
+                json={"user_id": sample_user.id, "achievement_id": multiple_achievements[2].id}
+            )
+            assert response.status_code == 503
+            assert response.headers["retry-after"] == "1"
+            assert award_queue.stats()["written"] == 0
+        finally:
+            await award_queue.stop()
+        
+        assert award_queue.stats()["written"] == 2
+        result = await test_db.execute(
+            select(UserAchievement.achievement_id).filter(UserAchievement.user_id == sample_user.id)
+        )
+        assert sorted(result.scalars()) == sorted(a.id for a in multiple_achievements[:2])
+
+    @pytest.mark.asyncio
+    async def test_award_feed_broadcast(self, client: AsyncClient, multiple_users, sample_achievement: Achievement, monkeypatch):
+        """Test that committed awards reach matching feed subscribers in process."""
+        everyone = award_feed.subscribe()
+        watched = award_feed.subscribe(multiple_users[0].id)
+        other = award_feed.subscribe(multiple_users[1].id)
+        
+        response = await client.post(
+            "/achievements/award", json={"user_id": multiple_users[0].id, "achievement_id": sample_achievement.id}
+        )
+        assert response.status_code == 201
+        
+        event = watched.queue.get_nowait()
+        assert event == {
+            "user_id": multiple_users[0].id,
+            "achievement_id": sample_achievement.id,
+            "points": sample_achievement.points,
+            "awarded_at": datetime.fromisoformat(response.json()["awarded_at"]).replace(tzinfo=timezone.utc).isoformat(),
+        }
+        assert everyone.queue.get_nowait() == event
+        assert other.queue.empty()
+        
+        # With a LISTEN connection active, events arrive through NOTIFY instead
+        monkeypatch.setattr(award_feed, "listening", True)
+        await client.post(
+            "/achievements/award/batch", json=[{"user_id": multiple_users[1].id, "achievement_id": sample_achievement.id}]
+        )
+        assert other.queue.empty()
+        award_feed._on_notify(None, 1, "awards", json.dumps([{**event, "user_id": multiple_users[1].id}]))
+        assert other.queue.get_nowait()["user_id"] == multiple_users[1].id
+
+    @pytest.mark.asyncio
+    async def test_award_feed_stream(self, monkeypatch):
+        """Test the SSE framing, keep-alives, slow subscribers and unsubscribing."""
+        award_feed.reset()
+        monkeypatch.setattr(award_feed, "queue_size", 1)
+        stream = stream_events(award_feed, user_id=7, heartbeat=0.01)
+        
+        assert await stream.__anext__() == b": connected\n\n"
+        assert await stream.__anext__() == b": keep-alive\n\n"
+        award_feed.publish([{"user_id": 7, "achievement_id": 1}, {"user_id": 7, "achievement_id": 2}])
+        assert await stream.__anext__() == b'event: award\ndata: {"user_id":7,"achievement_id":1}\n\n'
+        assert award_feed.stats()["dropped"] == 1
+        assert award_feed.subscribers == 1
+        
+        await stream.aclose()
+        assert award_feed.subscribers == 0
+
+    @pytest.mark.asyncio
+    async def test_export_awards(self, client: AsyncClient, populated_database):
+        """Test streaming the award log as NDJSON and CSV."""
+        response = await client.get("/achievements/awards/export")
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert len(rows) == len(populated_database["user_achievements"])
+        assert set(rows[0]) == {"id", "user_id", "achievement_id", "awarded_at"}
+        
+        response = await client.get("/achievements/awards/export?format=csv")
+        assert response.status_code == 200
+        lines = response.text.splitlines()
+        assert lines[0] == "id,user_id,achievement_id,awarded_at"
+        assert len(lines) == len(rows) + 1
+
+    @pytest.mark.asyncio
+    async def test_award_query_budget(
+        self, client: AsyncClient, multiple_users, multiple_achievements, assert_max_queries
+    ):
+        """Test the statement count of single and batch awards."""
+        # Warm the catalog so the budgets cover the award path only
+        await client.get("/achievements/")
+        
+        # INSERT ... SELECT, user_stats and daily activity upserts, streak read + upsert
+        with assert_max_queries(5):
+            response = await client.post("/achievements/award", json={
+                "user_id": multiple_users[0].id,
+                "achievement_id": multiple_achievements[0].id
+            })
+        assert response.status_code == 201
+        
+        # Independent of the batch size
+        with assert_max_queries(7):
+            response = await client.post("/achievements/award/batch", json=[
+                {"user_id": user.id, "achievement_id": achievement.id}
+                for user in multiple_users
+                for achievement in multiple_achievements
+            ])
+        assert response.status_code == 200
+        
+        with assert_max_queries(0):
+            await client.get(f"/achievements/{multiple_achievements[0].id}")
@@ -0,0 +1,62 @@
+"""Tests for the benchmark data generator and harness helpers."""
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.main import app
+from app.models import UserAchievement, UserStats
+from benchmarks.generator import DatasetSpec, generate_dataset
+from benchmarks.harness import api_routes, percentile, request_factories
+
+
+class TestBenchmarkGenerator:
+    """Test class for the synthetic dataset generator."""
+
+    @pytest.mark.asyncio
+    async def test_seeded_dataset(self, test_db: AsyncSession):
+        """Test that a seed reproduces the same awards and aggregates match."""
+        spec = DatasetSpec(users=50, achievements=10, awards=300, days=30, seed=3)
+        
+        first = await test_db.run_sync(generate_dataset, spec)
+        await test_db.commit()
+        rows = (await test_db.execute(
+            select(UserAchievement.user_id, UserAchievement.achievement_id, UserAchievement.awarded_at)
+            .order_by(UserAchievement.id)
+        )).all()
+        second = await test_db.run_sync(generate_dataset, spec)
+        await test_db.commit()
+        
+        assert len(first.awarded) == 300
+        assert first.awarded == second.awarded
+        assert (await test_db.execute(
+            select(UserAchievement.user_id, UserAchievement.achievement_id, UserAchievement.awarded_at)
+            .order_by(UserAchievement.id)
+        )).all() == rows
+        assert await test_db.scalar(select(func.sum(UserStats.achievement_count))) == 300
+
+    @pytest.mark.asyncio
+    async def test_too_many_awards(self, test_db: AsyncSession):
+        """Test that impossible award counts are rejected."""
+        with pytest.raises(ValueError):
+            await test_db.run_sync(generate_dataset, DatasetSpec(users=2, achievements=2, awards=5))
+
+
+class TestBenchmarkHarness:
+    """Test class for the benchmark harness helpers."""
+
+    def test_every_route_has_a_request(self):
+        """Test that the harness covers every route in app/api."""
+        dataset = type("Dataset", (), {"user_ids": [1], "achievement_ids": [1], "awarded": set()})
+        factories = request_factories(dataset, batch_size=1)
+        
+        assert set(api_routes(app)) <= set(factories)
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = [float(value) for value in range(1, 101)]
+        
+        assert percentile(values, 0.50) == 50.0
+        assert percentile(values, 0.95) == 95.0
+        assert percentile(values, 0.99) == 99.0
+        assert percentile([], 0.5) == 0.0
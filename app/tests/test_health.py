@@ -0,0 +1,382 @@
+"""Tests for engine configuration and pool diagnostics."""
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import database
+from app.core.database import RecentWrites, engine_options, pool_stats
+from app.core import query_budget
+from app.core.metrics import db_compiled_cache, fingerprint
+from app.core.pool_metrics import InstrumentedAsyncAdaptedQueuePool, instrument_pool
+from app.core.query_budget import track_queries
+from app.models import UserAchievement
+from app.services import achievement_service, warmup
+from app.services.achievement_catalog import achievement_catalog
+from app.services.leaderboard import leaderboard
+from app.services.statistics_snapshot import statistics_snapshots
+from app.services.warmup import open_connections, readiness, run_warmup
+from app.tests.conftest import TestSessionLocal, test_engine
+
+
+class TestEngineProfile:
+    """Test class for the environment-driven engine profile."""
+
+    def test_defaults(self, monkeypatch):
+        """Test that echo is off and the pool is instrumented by default."""
+        for name in ("DB_ECHO", "DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_PRE_PING"):
+            monkeypatch.delenv(name, raising=False)
+        
+        options = engine_options("postgresql+asyncpg://u:p@localhost/db")
+        
+        assert options["echo"] is False
+        assert options["poolclass"] is InstrumentedAsyncAdaptedQueuePool
+        assert options["pool_size"] == 10
+        assert options["max_overflow"] == 20
+        assert options["pool_pre_ping"] is True
+        assert options["connect_args"]["statement_cache_size"] == 100
+
+    def test_environment_overrides(self, monkeypatch):
+        """Test that pool settings are read from the environment."""
+        monkeypatch.setenv("DB_ECHO", "true")
+        monkeypatch.setenv("DB_POOL_SIZE", "3")
+        monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+        monkeypatch.setenv("DB_POOL_TIMEOUT", "2.5")
+        monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+        monkeypatch.setenv("DB_STATEMENT_CACHE_SIZE", "0")
+        
+        options = engine_options("postgresql+asyncpg://u:p@localhost/db")
+        
+        assert options["echo"] is True
+        assert options["pool_size"] == 3
+        assert options["max_overflow"] == 0
+        assert options["pool_timeout"] == 2.5
+        assert options["pool_pre_ping"] is False
+        assert options["connect_args"]["statement_cache_size"] == 0
+
+    def test_sqlite_keeps_default_pool(self):
+        """Test that queue pool settings are not applied to SQLite."""
+        options = engine_options("sqlite+aiosqlite:///:memory:")
+        
+        assert "poolclass" not in options
+        assert "pool_size" not in options
+
+
+class TestPoolInstrumentation:
+    """Test class for connection pool counters."""
+
+    @pytest.mark.asyncio
+    async def test_checkouts_and_timeouts(self, tmp_path):
+        """Test checkout, in-use and timeout counters on an exhausted pool."""
+        pool_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+            poolclass=InstrumentedAsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+        stats = instrument_pool(pool_engine.sync_engine.pool)
+        try:
+            async with pool_engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+                assert stats.in_use == 1
+                
+                with pytest.raises(PoolTimeoutError):
+                    async with pool_engine.connect():
+                        pass
+            
+            snapshot = pool_stats(pool_engine)
+            assert snapshot["checkouts"] == 1
+            assert snapshot["connects"] == 1
+            assert snapshot["timeouts"] == 1
+            assert snapshot["in_use"] == 0
+            assert snapshot["max_in_use"] == 1
+            assert snapshot["checkout_wait_seconds"]["count"] == 2
+            assert snapshot["checkout_wait_seconds"]["max"] >= 0.05
+            assert snapshot["checkout_hold_seconds"]["count"] == 1
+            
+            # Counters survive the pool being recreated
+            await pool_engine.dispose()
+            async with pool_engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            assert pool_stats(pool_engine)["checkouts"] == 2
+        finally:
+            await pool_engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_pool_endpoint(self, client: AsyncClient):
+        """Test the pool diagnostics endpoint."""
+        response = await client.get("/health/pool")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert "checkouts" in data
+        assert "timeouts" in data
+        assert "buckets" in data["checkout_wait_seconds"]
+        assert "status" in data
+
+
+class TestReadiness:
+    """Test class for startup warmup and the readiness endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_open_connections(self, tmp_path):
+        """Test that warmup establishes connections up to the pool size."""
+        pool_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'warmup.db'}",
+            poolclass=InstrumentedAsyncAdaptedQueuePool,
+            pool_size=3,
+            max_overflow=5,
+        )
+        instrument_pool(pool_engine.sync_engine.pool)
+        try:
+            assert await open_connections(pool_engine, 10) == 3
+            
+            snapshot = pool_stats(pool_engine)
+            assert snapshot["connects"] == 3
+            assert snapshot["max_in_use"] == 3
+            assert snapshot["in_use"] == 0
+        finally:
+            await pool_engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_ready_after_warmup(
+        self, client: AsyncClient, test_db, multiple_users, multiple_achievements
+    ):
+        """Test that /ready turns 200 once warmup primed the caches, without writing anything."""
+        await client.post("/achievements/award", json={
+            "user_id": multiple_users[0].id,
+            "achievement_id": multiple_achievements[0].id
+        })
+        achievement_catalog.reset()
+        leaderboard.reset()
+        
+        response = await client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming_up"
+        
+        await run_warmup({"primary": test_engine}, TestSessionLocal, TestSessionLocal)
+        
+        response = await client.get("/ready")
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "no-store"
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["attempts"] == 1
+        assert set(data["steps"]) == {
+            "connections_primary", "read_queries", "award_queries", "statistics_snapshots"
+        }
+        assert achievement_catalog.stats()["size"] == 5
+        assert leaderboard.is_loaded and len(leaderboard) == 1
+        assert statistics_snapshots.stats()["snapshots"] == 6
+        
+        awards = (await test_db.execute(select(UserAchievement))).scalars().all()
+        assert len(awards) == 1
+
+    @pytest.mark.asyncio
+    async def test_warmup_runs_award_path(self, test_db, sample_user, sample_achievement, monkeypatch):
+        """Test that warmup goes through the real award INSERT and finishes on the first attempt."""
+        monkeypatch.setattr(achievement_service, "_award_inserts", {})
+        
+        await run_warmup({"primary": test_engine}, TestSessionLocal, TestSessionLocal, retry_interval=0)
+        
+        assert readiness.ready
+        assert readiness.attempts == 1
+        assert list(achievement_service._award_inserts) == ["sqlite"]
+        awards = (await test_db.execute(select(UserAchievement))).scalars().all()
+        assert awards == []
+
+    @pytest.mark.asyncio
+    async def test_warmup_retries(self, test_db, monkeypatch):
+        """Test that a failed attempt is reported and retried."""
+        calls = []
+        
+        async def flaky_snapshots(session_factory):
+            calls.append(session_factory)
+            if len(calls) == 1:
+                raise ConnectionError("database is starting up")
+        
+        monkeypatch.setattr(warmup, "_prime_snapshots", flaky_snapshots)
+        
+        await run_warmup({"primary": test_engine}, TestSessionLocal, TestSessionLocal, retry_interval=0)
+        
+        assert readiness.ready
+        assert readiness.attempts == 2
+        assert readiness.error is None
+        assert len(calls) == 2
+
+
+class TestReadRouting:
+    """Test class for read replica routing."""
+
+    def test_recent_writes_window(self, monkeypatch):
+        """Test that writes are remembered only for the window."""
+        clock = [100.0]
+        monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+        writes = RecentWrites(window=5)
+        
+        writes.mark([1, 2])
+        assert writes.is_recent(1)
+        assert not writes.is_recent(3)
+        
+        clock[0] += 3
+        writes.mark([2])
+        clock[0] += 3
+        assert not writes.is_recent(1)
+        assert writes.is_recent(2)
+        
+        # Expired entries are pruned on the next write
+        writes.mark([3])
+        assert list(writes._expiries) == [2, 3]
+
+    def test_session_factory_routing(self, monkeypatch):
+        """Test that recently written users are read from the primary."""
+        replica = object()
+        monkeypatch.setattr(database, "read_engine", replica)
+        monkeypatch.setattr(database, "ReadSessionLocal", replica)
+        monkeypatch.setattr(database, "recent_writes", RecentWrites(window=60))
+        database.recent_writes.mark([7])
+        
+        class FakeRequest:
+            def __init__(self, path_params):
+                self.path_params = path_params
+        
+        assert database._read_session_factory(FakeRequest({})) is replica
+        assert database._read_session_factory(FakeRequest({"user_id": "8"})) is replica
+        assert database._read_session_factory(FakeRequest({"user_id": "x"})) is replica
+        assert database._read_session_factory(FakeRequest({"user_id": "7"})) is database.AsyncSessionLocal
+
+    @pytest.mark.asyncio
+    async def test_award_marks_recent_write(self, client: AsyncClient, sample_user, sample_achievement):
+        """Test that committed awards open the read-your-writes window."""
+        assert not database.recent_writes.is_recent(sample_user.id)
+        
+        response = await client.post("/achievements/award", json={
+            "user_id": sample_user.id,
+            "achievement_id": sample_achievement.id
+        })
+        assert response.status_code == 201
+        assert database.recent_writes.is_recent(sample_user.id)
+
+
+class TestMetrics:
+    """Test class for the Prometheus metrics endpoint."""
+
+    def test_fingerprint(self):
+        """Test that literals, parameters and value lists are normalised."""
+        assert fingerprint(
+            "SELECT users.id FROM users WHERE users.id IN (?, ?, ?) AND name = 'o''k' AND x > 5"
+        ) == "SELECT users.id FROM users WHERE users.id IN (?) AND name = ? AND x > ?"
+        assert fingerprint(
+            "INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4)"
+        ) == "INSERT INTO t (a, b) VALUES (?)"
+
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self, client: AsyncClient, sample_user):
+        """Test route, statement and pool metrics in the exposition output."""
+        await client.get(f"/users/{sample_user.id}")
+        await client.get("/users/999999")
+        
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        
+        body = response.text
+        assert "# TYPE http_request_duration_seconds histogram" in body
+        assert 'route="/users/{user_id}",status="200"' in body
+        assert 'route="/users/{user_id}",status="404"' in body
+        assert f'/users/{sample_user.id}"' not in body
+        assert "http_requests_in_flight" in body
+        assert 'http_response_size_bytes_count{method="GET",route="/users/{user_id}"}' in body
+        assert 'db_statement_duration_seconds_count{statement="SELECT users.id' in body
+        assert 'db_pool_checkouts_total{pool="primary"}' in body
+
+    @pytest.mark.asyncio
+    async def test_compiled_cache_counter(self, client: AsyncClient, sample_user, sample_achievement):
+        """Test that repeated service statements are counted as compiled cache hits."""
+        award = {"user_id": sample_user.id, "achievement_id": sample_achievement.id}
+        assert (await client.get(f"/users/{sample_user.id}")).status_code == 200
+        assert (await client.post("/achievements/award", json=award)).status_code == 201
+        hits = db_compiled_cache.values.get((("result", "hit"),), 0)
+        
+        # Same statements again: the user lookup and the prebuilt award INSERT
+        assert (await client.get(f"/users/{sample_user.id}")).status_code == 200
+        response = await client.post("/achievements/award", json=award)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "User already has this achievement"
+        
+        assert db_compiled_cache.values[(("result", "hit"),)] >= hits + 2
+        body = (await client.get("/metrics")).text
+        assert "# TYPE db_compiled_cache_total counter" in body
+        assert 'db_compiled_cache_total{result="hit"}' in body
+
+
+class TestQueryBudget:
+    """Test class for per-request statement accounting."""
+
+    @pytest.mark.asyncio
+    async def test_debug_headers(self, client: AsyncClient, sample_user, monkeypatch):
+        """Test the query count and time headers in debug mode."""
+        response = await client.get(f"/users/{sample_user.id}")
+        assert query_budget.QUERY_COUNT_HEADER not in response.headers
+        
+        monkeypatch.setattr(query_budget, "DEBUG", True)
+        response = await client.get(f"/users/{sample_user.id}")
+        
+        assert response.headers[query_budget.QUERY_COUNT_HEADER] == "1"
+        assert float(response.headers[query_budget.QUERY_TIME_HEADER]) >= 0
+
+    @pytest.mark.asyncio
+    async def test_slow_request_log(self, client: AsyncClient, sample_user, monkeypatch, caplog):
+        """Test that slow requests are logged with their statements."""
+        monkeypatch.setattr(query_budget, "SLOW_REQUEST_SECONDS", 0)
+        
+        with caplog.at_level("WARNING", logger=query_budget.__name__):
+            await client.get(f"/users/{sample_user.id}")
+        
+        assert "Slow request GET /users/" in caplog.text
+        assert "1 statements" in caplog.text
+        assert "FROM users" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_repeated_statements_flagged(self, client: AsyncClient, sample_user, monkeypatch, caplog):
+        """Test that a statement repeated above the threshold is flagged in the slow-request log."""
+        monkeypatch.setattr(query_budget, "SLOW_REQUEST_SECONDS", 0)
+        
+        with caplog.at_level("WARNING", logger=query_budget.__name__):
+            await client.get(f"/users/{sample_user.id}")
+        assert "possible N+1" not in caplog.text
+        
+        monkeypatch.setattr(query_budget, "REPEATED_QUERY_THRESHOLD", 0)
+        with caplog.at_level("WARNING", logger=query_budget.__name__):
+            await client.get(f"/users/{sample_user.id}")
+        assert "Repeated statements (possible N+1):" in caplog.text
+        assert "1 x  SELECT" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_statements_counted_by_fingerprint(self, test_db, sample_user):
+        """Test that statements differing only in literals share a fingerprint."""
+        with track_queries() as stats:
+            for user_id in (1, 2, 3):
+                await test_db.execute(text(f"SELECT username FROM users WHERE id = {user_id}"))
+            await test_db.execute(text("SELECT count(*) FROM users"))
+        
+        assert stats.repeated(2) == [("SELECT username FROM users WHERE id = ?", 3)]
+        assert stats.repeated() == []
+
+    @pytest.mark.asyncio
+    async def test_budget_exceeded(self, client: AsyncClient, sample_user, assert_max_queries):
+        """Test that the budget helper fails with the executed statements."""
+        with pytest.raises(AssertionError, match="budget is 0"):
+            with assert_max_queries(0):
+                await client.get(f"/users/{sample_user.id}")
+
+    @pytest.mark.asyncio
+    async def test_budget_reports_repeats(self, client: AsyncClient, sample_user, assert_max_queries):
+        """Test that the budget failure lists statements run more than once."""
+        with pytest.raises(AssertionError, match=r"possible N\+1"):
+            with assert_max_queries(1):
+                await client.get(f"/users/{sample_user.id}")
+                await client.get(f"/users/{sample_user.id}")
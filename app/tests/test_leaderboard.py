@@ -0,0 +1,164 @@
+"""Tests for the points leaderboard."""
+
+import bisect
+import random
+
+import pytest
+from httpx import AsyncClient
+
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.core.skiplist import IndexableSkipList
+from app.models import User
+from app.services.leaderboard import Leaderboard, leaderboard
+from app.services.statistics_service import _USERNAMES, _USERNAMES_ARRAY
+
+
+class TestIndexableSkipList:
+    """Test class for the order-statistics structure behind the leaderboard."""
+
+    def test_matches_sorted_list(self):
+        """Test insert/remove/rank/index against a plain sorted list."""
+        rng = random.Random(7)
+        skiplist = IndexableSkipList(seed=7)
+        reference = []
+        
+        for _ in range(3000):
+            key = rng.randint(0, 300)
+            if key in reference:
+                skiplist.remove(key)
+                reference.remove(key)
+            else:
+                skiplist.insert(key)
+                bisect.insort(reference, key)
+            
+            probe = rng.randint(-1, 301)
+            assert skiplist.rank(probe) == bisect.bisect_left(reference, probe)
+            if reference:
+                index = rng.randrange(len(reference))
+                assert skiplist[index] == reference[index]
+                assert list(skiplist.iter_from(index, 5)) == reference[index:index + 5]
+        
+        assert len(skiplist) == len(reference)
+        assert list(skiplist) == reference
+
+    def test_duplicate_and_missing_keys(self):
+        """Test that keys are unique and removal of missing keys fails."""
+        skiplist = IndexableSkipList()
+        skiplist.insert(1)
+        
+        with pytest.raises(KeyError):
+            skiplist.insert(1)
+        with pytest.raises(KeyError):
+            skiplist.remove(2)
+
+
+class TestLeaderboardEndpoints:
+    """Test class for leaderboard endpoints."""
+
+    @pytest.mark.asyncio
+    async def test_leaderboard_page_with_ties(self, client: AsyncClient, populated_database):
+        """Test competition and dense ranks for tied totals."""
+        response = await client.get("/stats/leaderboard")
+        
+        assert response.status_code == 200
+        data = response.json()
+        users = populated_database["users"]
+        assert data["total"] == 4
+        assert [(e["user_id"], e["total_points"], e["rank"], e["dense_rank"]) for e in data["entries"]] == [
+            (users[1].id, 100, 1, 1),
+            (users[2].id, 100, 1, 1),
+            (users[0].id, 50, 3, 2),
+            (users[3].id, 20, 4, 3),
+        ]
+        assert data["entries"][0]["username"] == "user2"
+        
+        response = await client.get("/stats/leaderboard?offset=2&limit=1")
+        entries = response.json()["entries"]
+        assert len(entries) == 1
+        assert entries[0]["user_id"] == users[0].id
+
+    @pytest.mark.asyncio
+    async def test_leaderboard_position_and_neighbours(self, client: AsyncClient, populated_database):
+        """Test a user's rank with neighbours, including a user without awards."""
+        users = populated_database["users"]
+        
+        response = await client.get(f"/stats/leaderboard/{users[0].id}?neighbours=1")
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["rank"], data["dense_rank"], data["total_points"]) == (3, 2, 50)
+        assert [e["user_id"] for e in data["above"]] == [users[2].id]
+        assert [e["user_id"] for e in data["below"]] == [users[3].id]
+        
+        response = await client.get(f"/stats/leaderboard/{users[4].id}?neighbours=2")
+        data = response.json()
+        assert (data["rank"], data["dense_rank"], data["total_points"]) == (5, 4, 0)
+        assert [e["user_id"] for e in data["above"]] == [users[0].id, users[3].id]
+        assert data["below"] == []
+
+    @pytest.mark.asyncio
+    async def test_leaderboard_updated_on_award(self, client: AsyncClient, populated_database):
+        """Test that committed awards move users on an already loaded board."""
+        users = populated_database["users"]
+        achievements = populated_database["achievements"]
+        assert (await client.get("/stats/leaderboard")).status_code == 200
+        
+        response = await client.post("/achievements/award", json={
+            "user_id": users[4].id, "achievement_id": achievements[4].id
+        })
+        assert response.status_code == 201
+        response = await client.post("/achievements/award", json={
+            "user_id": users[0].id, "achievement_id": achievements[4].id
+        })
+        assert response.status_code == 201
+        
+        data = (await client.get("/stats/leaderboard")).json()
+        assert data["total"] == 5
+        assert data["entries"][0]["user_id"] == users[0].id
+        assert data["entries"][0]["total_points"] == 150
+        
+        data = (await client.get(f"/stats/leaderboard/{users[4].id}")).json()
+        assert (data["rank"], data["dense_rank"]) == (2, 2)
+
+    @pytest.mark.asyncio
+    async def test_award_during_load_is_kept(self, client: AsyncClient, populated_database, monkeypatch):
+        """Test that awards committed while the board loads are on the swapped-in board, counted once."""
+        users = populated_database["users"]
+        achievements = populated_database["achievements"]
+        load = Leaderboard._load
+        
+        async def load_with_awards(board, db):
+            fresh = await load(board, db)
+            for user in (users[0], users[4]):
+                response = await client.post("/achievements/award", json={
+                    "user_id": user.id, "achievement_id": achievements[4].id
+                })
+                assert response.status_code == 201
+            return fresh
+        
+        monkeypatch.setattr(Leaderboard, "_load", load_with_awards)
+        await leaderboard.ensure_loaded()
+        monkeypatch.setattr(Leaderboard, "_load", load)
+        
+        assert leaderboard.points_of(users[0].id) == 150
+        assert leaderboard.points_of(users[4].id) == 100
+        data = (await client.get("/stats/leaderboard")).json()
+        assert data["total"] == 5
+        assert [e["total_points"] for e in data["entries"]] == [150, 100, 100, 100, 20]
+
+    @pytest.mark.asyncio
+    async def test_leaderboard_unknown_user(self, client: AsyncClient, sample_user: User):
+        """Test rank lookup for a missing user."""
+        response = await client.get("/stats/leaderboard/999")
+        
+        assert response.status_code == 404
+        assert response.json()["detail"] == "User not found"
+
+    def test_usernames_statement_is_fixed_on_postgresql(self):
+        """Test that the username lookup renders the same SQL for any number of ids on PostgreSQL."""
+        dialect = asyncpg.dialect()
+        sql = str(_USERNAMES_ARRAY.compile(dialect=dialect))
+        
+        assert "= ANY ($1::INTEGER[])" in sql
+        assert " IN " not in sql
+        assert "POSTCOMPILE" in str(_USERNAMES.compile(dialect=dialect))
@@ -0,0 +1,172 @@
+"""Query plan regression tests.
+
+Every statement issued by the ``StatisticsService`` / ``UserService`` read
+paths is captured and re-run under EXPLAIN; a full scan of one of the large
+tables fails the test. On SQLite that is any ``SCAN <table>`` step, except
+in a query with a LIMIT, where walking an index in order stops early. On
+PostgreSQL sequential scans are disabled for the EXPLAIN, so a remaining
+``Seq Scan`` means no usable index.
+"""
+
+import re
+from datetime import date
+from pathlib import Path
+from typing import Any, List, Tuple
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import Base
+from app.services.statistics_service import PointsSource, StatisticsService
+from app.services.user_service import UserService
+
+# Tables that grow with users or awards
+LARGE_TABLES = ("users", "user_achievements", "user_stats", "user_streaks", "user_daily_activity")
+
+# Statement prefixes allowed to scan, with the reason
+ALLOWED_SCANS = {
+    # Offset pagination walks the primary key; clients should use the ``after`` cursor
+    "SELECT users.id, users.username, users.language FROM users ORDER BY users.id LIMIT",
+    # source=live deliberately aggregates the whole award log
+    "SELECT users.id, users.username, coalesce(sum(achievements.points),",
+}
+
+SERVICE_CALLS = [
+    ("statistics", "get_top_by_achievements", ()),
+    ("statistics", "get_top_by_points", ()),
+    ("statistics", "get_top_by_achievements_in_window", (date(2024, 1, 1), date(2024, 1, 31))),
+    ("statistics", "get_top_by_points_in_window", (None, date(2024, 1, 31))),
+    ("statistics", "get_min_max_points_difference", (PointsSource.PRECOMPUTED,)),
+    ("statistics", "get_min_max_points_difference", (PointsSource.LIVE,)),
+    ("statistics", "get_streak_users", (7,)),
+    ("statistics", "get_leaderboard", (0, 10)),
+    ("statistics", "get_leaderboard_position", ("user", 2)),
+    ("users", "get_user", ("user",)),
+    ("users", "get_users", (0, 10)),
+    ("users", "get_users", (0, 10, 2)),
+    ("users", "get_users_json", (0, 10, 2)),
+    ("users", "get_user_achievements", ("user",)),
+]
+
+
+def _explain(connection, statement: str, parameters: Any) -> List[str]:
+    """Plan lines for a captured statement."""
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql("EXPLAIN " + statement, parameters).all()
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = on")
+        return [row[0] for row in rows]
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return [row[-1] for row in rows]
+
+
+def _full_scans(dialect: str, plan: List[str], limited: bool = False) -> List[str]:
+    """Plan lines that read a whole large table."""
+    if dialect == "postgresql":
+        pattern = re.compile(r"Seq Scan on (\w+)")
+    elif limited:
+        # Only an unindexed scan can't stop early under a LIMIT
+        pattern = re.compile(r"^SCAN (\w+)$")
+    else:
+        pattern = re.compile(r"^SCAN (\w+)")
+    return [
+        line for line in plan
+        if (match := pattern.search(line.strip())) and match.group(1) in LARGE_TABLES
+    ]
+
+
+async def _capture_statements(test_db: AsyncSession, call) -> List[Tuple[str, Any]]:
+    """Run ``call`` and return the SELECT statements it executed."""
+    captured: List[Tuple[str, Any]] = []
+    sync_engine = test_db.bind.sync_engine if hasattr(test_db.bind, "sync_engine") else test_db.bind
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        await call
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+    return captured
+
+
+class TestQueryPlans:
+    """Test class for index usage of the service queries."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "service,method,args", SERVICE_CALLS,
+        ids=[f"{service}.{method}{list(args)}" for service, method, args in SERVICE_CALLS]
+    )
+    async def test_no_full_scans(self, test_db: AsyncSession, populated_database, service, method, args):
+        """Test that the service query does not scan a large table."""
+        user_id = populated_database["users"][0].id
+        args = tuple(user_id if arg == "user" else arg for arg in args)
+        instance = StatisticsService(test_db) if service == "statistics" else UserService(test_db)
+
+        statements = await _capture_statements(test_db, getattr(instance, method)(*args))
+        assert statements
+
+        failures = []
+        for statement, parameters in statements:
+            normalised = " ".join(statement.split())
+            if normalised.startswith(tuple(ALLOWED_SCANS)):
+                continue
+            plan = await test_db.run_sync(
+                lambda session: _explain(session.connection(), statement, parameters)
+            )
+            limited = re.search(r"\bLIMIT\b", normalised) is not None
+            scans = _full_scans(test_db.bind.dialect.name, plan, limited)
+            if scans:
+                failures.append(f"{normalised}\n    " + "\n    ".join(plan))
+        assert not failures, "Full table scans:\n" + "\n".join(failures)
+
+    def test_detects_full_scans(self):
+        """Test the scan detection on known plan lines."""
+        assert _full_scans("sqlite", ["SCAN user_achievements"]) == ["SCAN user_achievements"]
+        assert _full_scans("sqlite", ["SCAN users USING COVERING INDEX ix_users_username"]) != []
+        assert _full_scans("sqlite", ["SCAN user_stats USING INDEX ix_user_stats_total_points"], limited=True) == []
+        assert _full_scans("sqlite", ["SCAN achievements"]) == []
+        assert _full_scans("postgresql", ["  ->  Seq Scan on user_achievements  (cost=...)"]) != []
+        assert _full_scans("postgresql", ["Index Scan using ix_user_achievements_achievement_id"]) == []
+
+
+class TestMigrations:
+    """Test class for the Alembic migrations."""
+
+    def test_migrations_match_models(self, tmp_path, monkeypatch):
+        """Test that upgrading to head yields the models' schema, indexes included."""
+        database = tmp_path / "migrations.db"
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{database}")
+        # No config file, so env.py leaves the logging configuration alone
+        config = Config()
+        config.set_main_option("script_location", str(Path(__file__).parents[2] / "alembic"))
+        
+        command.upgrade(config, "head")
+        
+        engine = create_engine(f"sqlite:///{database}")
+        try:
+            with engine.connect() as connection:
+                diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+                indexes = {
+                    row[0] for row in connection.exec_driver_sql(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'user_achievements'"
+                    )
+                }
+        finally:
+            engine.dispose()
+        
+        assert diff == []
+        assert {
+            "ix_user_achievements_user_id_awarded_at",
+            "ix_user_achievements_achievement_id",
+        } <= indexes
+        
+        command.downgrade(config, "base")
@@ -1,11 +1,27 @@
 """Tests for statistics endpoints."""
 
+import asyncio
+import threading
+import tracemalloc
+from dataclasses import replace
+
 import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select
+from datetime import datetime, timedelta, timezone
 
-from app.models import User, Achievement, UserAchievement
+from app.models import User, Achievement, UserAchievement, UserDailyActivity, UserStats, UserStreak, LanguageEnum
+from app.services import aggregates
+from app.services.aggregates import rebuild_aggregates
+from app.api.statistics import COMPUTED_AT_HEADER
+from app.core.http_cache import STATS_CACHE_MAX_AGE
+from app.services.statistics_service import StatisticsService, PointsSource
+from app.core.snapshot_file import SnapshotFile
+from app.services.statistics_snapshot import (
+    DEFAULT_SNAPSHOT_KEYS, StatisticsSnapshotStore, statistics_snapshots, STATS_MAX_STALENESS
+)
+from app.tests.conftest import TestSessionLocal
 
 
 class TestStatisticsEndpoints:
@@ -96,20 +112,23 @@ class TestStatisticsEndpoints:
         await test_db.commit()
         await test_db.refresh(user)
         
-        achievement = Achievement(
-            name_ru="Ежедневное достижение",
-            name_en="Daily Achievement",
-            description_ru="Получается каждый день",
-            description_en="Earned daily",
-            points=1
-        )
-        test_db.add(achievement)
+        # Each achievement can be awarded once, so use a different one per day
+        achievements = []
+        for i in range(7):
+            achievement = Achievement(
+                name_ru=f"Ежедневное достижение {i + 1}",
+                name_en=f"Daily Achievement {i + 1}",
+                description_ru="Получается каждый день",
+                description_en="Earned daily",
+                points=1
+            )
+            test_db.add(achievement)
+            achievements.append(achievement)
         await test_db.commit()
-        await test_db.refresh(achievement)
         
         # Create 7 consecutive days of achievements
         base_date = datetime.now() - timedelta(days=10)
-        for i in range(7):
+        for i, achievement in enumerate(achievements):
             award_date = base_date + timedelta(days=i)
             user_achievement = UserAchievement(
                 user_id=user.id,
@@ -281,4 +300,549 @@ class TestStatisticsEndpoints:
             elif endpoint == "/stats/min-max-points-difference":
                 assert "message" in data
             else:
-                assert data["message"] == "No users with achievements found"
\ No newline at end of file
+                assert data["message"] == "No users with achievements found"
+
+    @pytest.mark.asyncio
+    async def test_user_stats_updated_on_award(self, client: AsyncClient, multiple_users, multiple_achievements):
+        """Test that awarding through the API keeps the user_stats aggregate current."""
+        user = multiple_users[0]
+        for achievement in multiple_achievements[3:]:
+            response = await client.post(
+                "/achievements/award",
+                json={"user_id": user.id, "achievement_id": achievement.id}
+            )
+            assert response.status_code == 201
+        
+        response = await client.get("/stats/top-by-points")
+        data = response.json()
+        assert data["user_id"] == user.id
+        assert data["total_points"] == 150
+        
+        response = await client.get("/stats/top-by-achievements")
+        data = response.json()
+        assert data["user_id"] == user.id
+        assert data["achievement_count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_rebuild_user_stats(self, test_db: AsyncSession, populated_database):
+        """Test that a rebuild reproduces the incrementally maintained aggregate."""
+        user_ids = [user.id for user in populated_database["users"]]
+        query = select(
+            UserStats.user_id, UserStats.achievement_count, UserStats.total_points
+        ).order_by(UserStats.user_id)
+        incremental = (await test_db.execute(query)).all()
+        
+        await test_db.execute(delete(UserStats))
+        await test_db.run_sync(rebuild_aggregates)
+        await test_db.commit()
+        
+        rebuilt = (await test_db.execute(query)).all()
+        assert rebuilt == incremental
+        assert [tuple(row) for row in rebuilt] == [
+            (user_ids[0], 3, 50),
+            (user_ids[1], 4, 100),
+            (user_ids[2], 1, 100),
+            (user_ids[3], 2, 20),
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("source", ["precomputed", "live"])
+    async def test_min_max_points_difference_sources(self, client: AsyncClient, populated_database, source):
+        """Test that live and precomputed totals give the same extremes."""
+        response = await client.get(f"/stats/min-max-points-difference?source={source}")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["min_points_user"]["username"] == "user5"
+        assert data["min_points_user"]["total_points"] == 0
+        # user2 and user3 tie at 100 points; the lower id wins
+        assert data["max_points_user"]["username"] == "user2"
+        assert data["points_difference"] == 100
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("source", ["precomputed", "live"])
+    async def test_min_max_points_memory_is_flat(self, test_db: AsyncSession, sample_achievement, source):
+        """Benchmark: peak Python memory must not grow with the number of users."""
+        service = StatisticsService(test_db)
+        peaks = []
+        created = 0
+        for total_users in (500, 5000):
+            await test_db.execute(insert(User), [
+                {"username": f"bench_{i}", "language": LanguageEnum.RU}
+                for i in range(created, total_users)
+            ])
+            await test_db.commit()
+            created = total_users
+            
+            tracemalloc.start()
+            data = await service.get_min_max_points_difference(source=PointsSource(source))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            assert data["points_difference"] == 0
+            peaks.append(peak)
+        
+        # 10x the users must not cost anywhere near 10x the memory
+        assert peaks[1] < peaks[0] * 2
+
+    @pytest.mark.asyncio
+    async def test_streak_users_min_days_and_backfill(self, client: AsyncClient, test_db: AsyncSession, multiple_users, multiple_achievements):
+        """Test arbitrary min_days and streak state after out-of-order awards."""
+        user = multiple_users[0]
+        base_date = datetime(2024, 3, 1, 12, 0)
+        
+        # Days 0-2 and 4-5 arrive first: runs of 3 and 2 days
+        for achievement, offset in zip(multiple_achievements, [0, 1, 2, 4, 5]):
+            test_db.add(UserAchievement(
+                user_id=user.id,
+                achievement_id=achievement.id,
+                awarded_at=base_date + timedelta(days=offset)
+            ))
+        await test_db.commit()
+        
+        response = await client.get("/stats/7-day-streak-users?min_days=3")
+        data = response.json()
+        assert len(data) == 1
+        assert data[0]["consecutive_days"] == 3
+        assert data[0]["streak_start"] == "2024-03-01"
+        assert data[0]["streak_end"] == "2024-03-03"
+        
+        # Backfilling day 3 joins both runs into a 6-day streak
+        extra = Achievement(
+            name_ru="Доп", name_en="Extra",
+            description_ru="Доп", description_en="Extra", points=1
+        )
+        test_db.add(extra)
+        await test_db.commit()
+        test_db.add(UserAchievement(
+            user_id=user.id,
+            achievement_id=extra.id,
+            awarded_at=base_date + timedelta(days=3)
+        ))
+        await test_db.commit()
+        
+        response = await client.get("/stats/7-day-streak-users?min_days=6")
+        data = response.json()
+        assert len(data) == 1
+        assert data[0]["consecutive_days"] == 6
+        assert data[0]["streak_end"] == "2024-03-06"
+        
+        response = await client.get("/stats/7-day-streak-users")
+        assert response.json() == []
+
+    @pytest.mark.asyncio
+    async def test_award_inside_current_streak_skips_recompute(
+        self, test_db: AsyncSession, multiple_users, multiple_achievements, monkeypatch
+    ):
+        """Test that an award dated inside the current run leaves it as is, without a history recompute."""
+        user = multiple_users[0]
+        base_date = datetime(2024, 3, 1, 12, 0)
+        for achievement, offset in zip(multiple_achievements, [0, 1, 2]):
+            test_db.add(UserAchievement(
+                user_id=user.id,
+                achievement_id=achievement.id,
+                awarded_at=base_date + timedelta(days=offset)
+            ))
+        await test_db.commit()
+        
+        recomputed = []
+        streaks_from_history = aggregates._streaks_from_history
+        
+        def spy(connection, user_ids):
+            recomputed.extend(user_ids)
+            return streaks_from_history(connection, user_ids)
+        
+        monkeypatch.setattr(aggregates, "_streaks_from_history", spy)
+        test_db.add(UserAchievement(
+            user_id=user.id,
+            achievement_id=multiple_achievements[3].id,
+            awarded_at=base_date + timedelta(days=1)
+        ))
+        await test_db.commit()
+        
+        streak = (await test_db.execute(
+            select(UserStreak).filter(UserStreak.user_id == user.id)
+        )).scalar_one()
+        assert recomputed == []
+        assert (streak.current_start.isoformat(), streak.current_length) == ("2024-03-01", 3)
+
+    @pytest.mark.asyncio
+    async def test_streak_users_invalid_min_days(self, client: AsyncClient):
+        """Test that min_days must be positive."""
+        response = await client.get("/stats/7-day-streak-users?min_days=0")
+        
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_rebuild_user_streaks(self, test_db: AsyncSession, multiple_users, multiple_achievements):
+        """Test that a rebuild backfills streak state from the award history."""
+        for user in multiple_users[:2]:
+            for offset, achievement in enumerate(multiple_achievements):
+                test_db.add(UserAchievement(
+                    user_id=user.id,
+                    achievement_id=achievement.id,
+                    awarded_at=datetime(2024, 1, 1) + timedelta(days=offset)
+                ))
+        await test_db.commit()
+        service = StatisticsService(test_db)
+        expected = await service.get_streak_users(min_days=5)
+        assert len(expected) == 2
+        
+        await test_db.execute(delete(UserStreak))
+        await test_db.commit()
+        assert await service.get_streak_users(min_days=5) == []
+        
+        await test_db.run_sync(rebuild_aggregates)
+        await test_db.commit()
+        assert await service.get_streak_users(min_days=5) == expected
+
+    @pytest.mark.asyncio
+    async def test_statistics_served_from_snapshot(self, client: AsyncClient, test_db: AsyncSession, populated_database):
+        """Test that stats are served from a snapshot until it exceeds the staleness bound."""
+        users = populated_database["users"]
+        achievements = populated_database["achievements"]
+        
+        response = await client.get("/stats/top-by-achievements")
+        computed_at = response.headers[COMPUTED_AT_HEADER]
+        assert response.json()["user_id"] == users[1].id
+        
+        # user1 overtakes user2, but the snapshot is still within its staleness bound
+        for achievement in achievements[3:]:
+            test_db.add(UserAchievement(user_id=users[0].id, achievement_id=achievement.id))
+        await test_db.commit()
+        
+        response = await client.get("/stats/top-by-achievements")
+        assert response.headers[COMPUTED_AT_HEADER] == computed_at
+        assert response.json()["user_id"] == users[1].id
+        
+        statistics_snapshots.max_staleness = 0
+        try:
+            response = await client.get("/stats/top-by-achievements")
+        finally:
+            statistics_snapshots.max_staleness = STATS_MAX_STALENESS
+        assert response.headers[COMPUTED_AT_HEADER] > computed_at
+        assert response.json()["user_id"] == users[0].id
+
+    @pytest.mark.asyncio
+    async def test_statistics_snapshot_refresh(self, client: AsyncClient, populated_database):
+        """Test that the background refresh recomputes cached and default snapshots."""
+        response = await client.get("/stats/7-day-streak-users?min_days=1")
+        assert len(response.json()) == 4
+        
+        await statistics_snapshots.refresh_all(TestSessionLocal)
+        
+        snapshot = await statistics_snapshots.get(None, "get_top_by_points")
+        assert snapshot.value["total_points"] == 100
+        snapshot = await statistics_snapshots.get(None, "get_streak_users", 1)
+        assert len(snapshot.value) == 4
+
+    @pytest.mark.asyncio
+    async def test_statistics_conditional_get(self, client: AsyncClient, test_db: AsyncSession, populated_database):
+        """Test ETag / If-None-Match handling and Cache-Control on stats responses."""
+        response = await client.get("/stats/top-by-points")
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"] == f"public, max-age={STATS_CACHE_MAX_AGE}"
+        
+        response = await client.get("/stats/top-by-points", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        
+        # A recomputed snapshot with the same result keeps its tag
+        await statistics_snapshots.refresh_all(TestSessionLocal)
+        response = await client.get("/stats/top-by-points", headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert response.status_code == 304
+        
+        users = populated_database["users"]
+        for achievement in populated_database["achievements"][3:]:
+            test_db.add(UserAchievement(user_id=users[0].id, achievement_id=achievement.id))
+        await test_db.commit()
+        await statistics_snapshots.refresh_all(TestSessionLocal)
+        response = await client.get("/stats/top-by-points", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["user_id"] == users[0].id
+        
+        response = await client.get("/stats/leaderboard?limit=2")
+        etag = response.headers["etag"]
+        response = await client.get("/stats/leaderboard?limit=2", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+    @pytest.mark.asyncio
+    async def test_snapshot_computations_are_coalesced(self, test_db: AsyncSession, monkeypatch):
+        """Test that concurrent requests for a stale snapshot share one computation."""
+        calls = []
+        release = asyncio.Event()
+        
+        async def slow_streak_users(self, min_days):
+            calls.append(min_days)
+            await release.wait()
+            return [{"user_id": 1, "streak_days": min_days}]
+        
+        monkeypatch.setattr(StatisticsService, "get_streak_users", slow_streak_users)
+        waiters = [
+            asyncio.create_task(statistics_snapshots.get(test_db, "get_streak_users", 7))
+            for _ in range(10)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        snapshots = await asyncio.gather(*waiters)
+        
+        assert calls == [7]
+        assert all(snapshot is snapshots[0] for snapshot in snapshots)
+        assert statistics_snapshots.stats()["coalesced"] == 9
+        assert statistics_snapshots.stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_coalesced_failure_and_cancellation(self, test_db: AsyncSession, monkeypatch):
+        """Test that waiters see the computation's error and survive its cancellation."""
+        release = asyncio.Event()
+        
+        async def failing(self, min_days):
+            await release.wait()
+            raise RuntimeError("boom")
+        
+        monkeypatch.setattr(StatisticsService, "get_streak_users", failing)
+        leader = asyncio.create_task(statistics_snapshots.get(test_db, "get_streak_users", 7))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(statistics_snapshots.get(test_db, "get_streak_users", 7))
+        await asyncio.sleep(0)
+        release.set()
+        for task in (leader, follower):
+            with pytest.raises(RuntimeError):
+                await task
+        
+        release.clear()
+        leader = asyncio.create_task(statistics_snapshots.get(test_db, "get_streak_users", 7))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(statistics_snapshots.get(test_db, "get_streak_users", 7))
+        await asyncio.sleep(0)
+        
+        async def recovered(self, min_days):
+            return []
+        
+        # The leader is stuck in the old computation; the follower takes over
+        monkeypatch.setattr(StatisticsService, "get_streak_users", recovered)
+        leader.cancel()
+        assert (await follower).value == []
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self, client: AsyncClient, test_db: AsyncSession, populated_database, monkeypatch):
+        """Test that a stale snapshot is served at once and recomputed in the background."""
+        users = populated_database["users"]
+        monkeypatch.setattr(statistics_snapshots, "max_staleness", 0)
+        monkeypatch.setattr(statistics_snapshots, "stale_while_revalidate", 60)
+        
+        response = await client.get("/stats/top-by-achievements")
+        computed_at = response.headers[COMPUTED_AT_HEADER]
+        assert "stale-while-revalidate=60" in response.headers["cache-control"]
+        
+        for achievement in populated_database["achievements"][3:]:
+            test_db.add(UserAchievement(user_id=users[0].id, achievement_id=achievement.id))
+        await test_db.commit()
+        
+        response = await client.get("/stats/top-by-achievements")
+        assert response.headers[COMPUTED_AT_HEADER] == computed_at
+        assert response.json()["user_id"] == users[1].id
+        assert statistics_snapshots.stats()["stale_served"] == 1
+        
+        await asyncio.gather(*statistics_snapshots._revalidations)
+        snapshot = statistics_snapshots._snapshots[("get_top_by_achievements", ())]
+        assert snapshot.value["user_id"] == users[0].id
+        
+        # Past the revalidation window the request waits for a fresh result
+        monkeypatch.setattr(statistics_snapshots, "stale_while_revalidate", 0)
+        response = await client.get("/stats/top-by-achievements")
+        assert response.headers[COMPUTED_AT_HEADER] > computed_at
+        assert statistics_snapshots.stats()["stale_served"] == 1
+
+    @pytest.mark.asyncio
+    async def test_windowed_top_users(self, client: AsyncClient, test_db: AsyncSession, multiple_users, multiple_achievements):
+        """Test top-by-points/achievements over date windows and as-of dates."""
+        today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+        veteran, newcomer = multiple_users[0], multiple_users[1]
+        
+        # Veteran: three awards (5 + 15 + 30 points) 20 days ago
+        for achievement in multiple_achievements[:3]:
+            test_db.add(UserAchievement(
+                user_id=veteran.id,
+                achievement_id=achievement.id,
+                awarded_at=today - timedelta(days=20)
+            ))
+        # Newcomer: one 100-point award 2 days ago
+        test_db.add(UserAchievement(
+            user_id=newcomer.id,
+            achievement_id=multiple_achievements[4].id,
+            awarded_at=today - timedelta(days=2)
+        ))
+        await test_db.commit()
+        
+        response = await client.get("/stats/top-by-points/window?days=7")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["user_id"] == newcomer.id
+        assert data["total_points"] == 100
+        assert data["end"] == today.date().isoformat()
+        assert data["start"] == (today - timedelta(days=6)).date().isoformat()
+        
+        response = await client.get("/stats/top-by-achievements/window?days=30")
+        assert response.json()["user_id"] == veteran.id
+        assert response.json()["achievement_count"] == 3
+        
+        # As of ten days ago only the veteran had awards
+        as_of = (today - timedelta(days=10)).date().isoformat()
+        response = await client.get(f"/stats/top-by-points/window?end={as_of}")
+        data = response.json()
+        assert data["user_id"] == veteran.id
+        assert data["total_points"] == 50
+        assert data["start"] is None
+        
+        start = (today - timedelta(days=15)).date().isoformat()
+        response = await client.get(f"/stats/top-by-points/window?start={start}&end={as_of}")
+        assert response.json()["message"] == "No users with achievements found"
+
+    @pytest.mark.asyncio
+    async def test_windowed_top_invalid_window(self, client: AsyncClient):
+        """Test window parameter validation."""
+        response = await client.get("/stats/top-by-points/window?start=2024-01-01&days=7")
+        assert response.status_code == 400
+        
+        response = await client.get("/stats/top-by-points/window?start=2024-02-01&end=2024-01-01")
+        assert response.status_code == 400
+        
+        response = await client.get("/stats/top-by-achievements/window?days=0")
+        assert response.status_code == 422
+        
+        # Windows reaching before date.min
+        for query in ("days=1000000", "end=0001-01-01&days=2", "days=999999999", "days=1000000000"):
+            response = await client.get(f"/stats/top-by-points/window?{query}")
+            assert response.status_code == 400, query
+
+    @pytest.mark.asyncio
+    async def test_rebuild_user_daily_activity(self, test_db: AsyncSession, populated_database):
+        """Test that a rebuild reproduces the incrementally maintained daily buckets."""
+        query = select(
+            UserDailyActivity.user_id,
+            UserDailyActivity.day,
+            UserDailyActivity.award_count,
+            UserDailyActivity.points
+        ).order_by(UserDailyActivity.user_id, UserDailyActivity.day)
+        incremental = (await test_db.execute(query)).all()
+        assert sum(row.award_count for row in incremental) == 10
+        
+        await test_db.execute(delete(UserDailyActivity))
+        await test_db.run_sync(rebuild_aggregates)
+        await test_db.commit()
+        
+        assert (await test_db.execute(query)).all() == incremental
+
+
+    @pytest.mark.asyncio
+    async def test_refresh_skips_unread_snapshots(self, test_db: AsyncSession, populated_database):
+        """Test that the refresher only recomputes default and recently read snapshots."""
+        store = StatisticsSnapshotStore(max_staleness=30)
+        await store.get(test_db, "get_streak_users", 1)
+        await store.get(test_db, "get_streak_users", 2)
+        unread = ("get_streak_users", (2,))
+        store._last_read[unread] -= 60
+        computations = store.computations
+        
+        await store.refresh_all(TestSessionLocal)
+        
+        assert store.computations - computations == len(DEFAULT_SNAPSHOT_KEYS) + 1
+        assert unread in store._snapshots
+        
+        # Once it can no longer be served it is dropped instead of refreshed
+        snapshot = store._snapshots[unread]
+        store._snapshots[unread] = replace(snapshot, computed_monotonic=snapshot.computed_monotonic - 60)
+        await store.refresh_all(TestSessionLocal)
+        
+        assert unread not in store._snapshots
+        assert ("get_streak_users", (1,)) in store._snapshots
+
+
+class TestSharedSnapshots:
+    """Test class for the cross-worker snapshot file."""
+
+    def test_snapshot_file_swaps_slots(self, tmp_path):
+        """Test generations, slot swapping, checksums and re-layout on resize."""
+        path = str(tmp_path / "stats.snap")
+        writer, reader = SnapshotFile(path, 4096), SnapshotFile(path, 4096)
+        try:
+            assert reader.read() == (0, None)
+            assert writer.write(b"first") == 1
+            assert writer.update(lambda payload: payload + b"+second") == 2
+            assert reader.read() == (2, b"first+second")
+            
+            with pytest.raises(ValueError):
+                writer.write(b"x" * (writer.capacity + 1))
+            
+            # A damaged current slot is never returned
+            writer._map[64 + 16:64 + 17] = b"!"
+            writer._map[64 + writer.slot_size + 16:64 + writer.slot_size + 17] = b"!"
+            assert reader.read() == (2, None)
+        finally:
+            writer.close()
+            reader.close()
+        
+        resized = SnapshotFile(path, 8192)
+        try:
+            assert resized.read() == (0, None)
+        finally:
+            resized.close()
+
+    @pytest.mark.asyncio
+    async def test_workers_share_snapshots(self, test_db: AsyncSession, populated_database, tmp_path):
+        """Test that one worker's computation is served by the others and after a restart."""
+        path = str(tmp_path / "stats.snap")
+        first, second = StatisticsSnapshotStore(), StatisticsSnapshotStore()
+        first.attach_shared(path, 65536)
+        second.attach_shared(path, 65536)
+        try:
+            computed = await first.get(test_db, "get_top_by_points")
+            await first.get(test_db, "get_streak_users", 1)
+            
+            # No session: the second worker must not touch the database
+            shared = await second.get(None, "get_top_by_points")
+            assert second.stats()["computations"] == 0
+            assert (shared.body, shared.etag, shared.value) == (computed.body, computed.etag, computed.value)
+            assert shared.computed_at == computed.computed_at
+            assert len((await second.get(None, "get_streak_users", 1)).value) == 4
+            
+            assert first.leader.try_acquire()
+            assert not second.leader.try_acquire()
+            first.detach_shared()
+            assert second.leader.try_acquire()
+            
+            restarted = StatisticsSnapshotStore()
+            restarted.attach_shared(path, 65536)
+            try:
+                assert (await restarted.get(None, "get_top_by_points")).etag == computed.etag
+            finally:
+                restarted.detach_shared()
+        finally:
+            first.detach_shared()
+            second.detach_shared()
+
+    @pytest.mark.asyncio
+    async def test_publish_runs_off_the_event_loop(self, test_db: AsyncSession, populated_database, tmp_path):
+        """Test that the locked file write happens in an executor thread."""
+        store = StatisticsSnapshotStore()
+        store.attach_shared(str(tmp_path / "stats.snap"), 65536)
+        threads = []
+        update = store.shared.update
+        
+        def recording_update(change):
+            threads.append(threading.current_thread())
+            return update(change)
+        
+        store.shared.update = recording_update
+        try:
+            await store.get(test_db, "get_top_by_points")
+        finally:
+            store.detach_shared()
+        
+        assert len(threads) == 1
+        assert threads[0] is not threading.main_thread()
@@ -1,10 +1,17 @@
 """Tests for user endpoints."""
 
+import csv
+import io
+import json
+
 import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, dump_json, encode_cursor
 from app.models import User
+from app.schemas import UserResponse
+from app.services import export_service
 
 
 class TestUserEndpoints:
@@ -178,4 +185,100 @@ class TestUserEndpoints:
         response_json = response.json()
         assert response_json["username"] == "default_lang_user"
         assert "language" in response_json
-        assert response_json["language"] == "ru"  # Проверяем язык по умолчанию
\ No newline at end of file
+        assert response_json["language"] == "ru"  # Проверяем язык по умолчанию
+
+    @pytest.mark.asyncio
+    async def test_get_users_cursor_pagination(self, client: AsyncClient, multiple_users):
+        """Test walking the user list with keyset cursors."""
+        seen = []
+        cursor = None
+        while True:
+            url = "/users/?limit=2" + (f"&after={cursor}" if cursor else "")
+            response = await client.get(url)
+            assert response.status_code == 200
+            seen.extend(user["id"] for user in response.json())
+            cursor = response.headers.get(NEXT_CURSOR_HEADER)
+            if cursor is None:
+                break
+        
+        assert seen == sorted(user.id for user in multiple_users)
+
+    @pytest.mark.asyncio
+    async def test_get_users_pagination_validation(self, client: AsyncClient, multiple_users):
+        """Test cursor and page size validation."""
+        cursor = encode_cursor(multiple_users[0].id)
+        
+        assert (await client.get("/users/?after=not-a-cursor")).status_code == 400
+        assert (await client.get(f"/users/?skip=1&after={cursor}")).status_code == 400
+        assert (await client.get(f"/users/?limit={MAX_PAGE_SIZE + 1}")).status_code == 422
+        
+        response = await client.get(f"/users/?after={cursor}")
+        assert response.status_code == 200
+        assert len(response.json()) == 4
+
+    @pytest.mark.asyncio
+    async def test_get_users_json_matches_response_model(self, client: AsyncClient, multiple_users):
+        """Test that the pre-rendered user list is the body response_model would produce."""
+        response = await client.get("/users/?limit=3")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        expected = [UserResponse.model_validate(user).model_dump(mode="json") for user in multiple_users[:3]]
+        assert response.content == dump_json(expected)
+        assert response.headers[NEXT_CURSOR_HEADER] == encode_cursor(multiple_users[2].id)
+        
+        response = await client.get(f"/users/?after={encode_cursor(multiple_users[-1].id)}")
+        assert response.content == b"[]"
+        assert NEXT_CURSOR_HEADER not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_export_users_ndjson(self, client: AsyncClient, multiple_users):
+        """Test streaming the user list as NDJSON."""
+        response = await client.get("/users/export")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["username"] for row in rows] == [f"user{i}" for i in range(1, 6)]
+        assert rows[1] == {"id": multiple_users[1].id, "username": "user2", "language": "en"}
+
+    @pytest.mark.asyncio
+    async def test_export_users_csv_in_chunks(self, client: AsyncClient, test_db: AsyncSession, monkeypatch):
+        """Test CSV export spanning several cursor chunks."""
+        monkeypatch.setattr(export_service, "EXPORT_CHUNK_SIZE", 10)
+        for i in range(25):
+            test_db.add(User(username=f"export_{i:02d}", language="en"))
+        await test_db.commit()
+        
+        response = await client.get("/users/export?format=csv")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 25
+        assert rows[0]["username"] == "export_00"
+        assert rows[-1]["language"] == "en"
+
+    @pytest.mark.asyncio
+    async def test_user_endpoints_query_budget(
+        self, client: AsyncClient, sample_user, sample_achievement, assert_max_queries
+    ):
+        """Test the statement count of the user endpoints."""
+        with assert_max_queries(1):
+            response = await client.post("/users/", json={"username": "budget", "language": "en"})
+        assert response.status_code == 201
+        
+        with assert_max_queries(1):
+            await client.get(f"/users/{sample_user.id}")
+        
+        with assert_max_queries(1):
+            await client.get("/users/?limit=10")
+        
+        await client.post("/achievements/award", json={
+            "user_id": sample_user.id,
+            "achievement_id": sample_achievement.id
+        })
+        # User + award ids; achievements come from the in-process catalog
+        with assert_max_queries(2):
+            response = await client.get(f"/users/{sample_user.id}/achievements")
+        assert len(response.json()) == 1
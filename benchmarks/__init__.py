@@ -0,0 +1,7 @@
+"""Benchmarks for the Achievements API.
+
+``benchmarks.generator`` bulk-loads a seeded synthetic dataset and
+``benchmarks.harness`` measures every API route against it::
+
+    python -m benchmarks.harness --database-url sqlite+aiosqlite:///bench.db
+"""
@@ -0,0 +1,47 @@
+"""Compare two benchmark result files.
+
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+
+import argparse
+import json
+from typing import Dict, List, Optional
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _change(old: Optional[float], new: Optional[float]) -> str:
+    if not old or new is None:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(baseline: Dict, candidate: Dict) -> List[str]:
+    """One line per route present in both runs."""
+    lines = [f"{'route':48} " + " ".join(f"{metric:>24}" for metric in METRICS)]
+    for route, old in baseline["routes"].items():
+        new = candidate["routes"].get(route)
+        if new is None:
+            continue
+        cells = [
+            f"{old[metric]!s:>9} → {new[metric]!s:>9} {_change(old[metric], new[metric]):>7}"
+            for metric in METRICS
+        ]
+        lines.append(f"{route:48} " + " ".join(f"{cell:>24}" for cell in cells))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as baseline, open(args.candidate, encoding="utf-8") as candidate:
+        baseline_report, candidate_report = json.load(baseline), json.load(candidate)
+    print(f"baseline:  {baseline_report['meta'].get('commit')}")
+    print(f"candidate: {candidate_report['meta'].get('commit')}")
+    print("\n".join(compare(baseline_report, candidate_report)))
+
+
+if __name__ == "__main__":
+    main()
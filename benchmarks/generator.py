@@ -0,0 +1,155 @@
+"""Seeded synthetic dataset generator.
+
+Users get a log-normal activity level and achievements a Zipf-like
+popularity, so a few users hold many awards and a few achievements are
+common. A share of users additionally get runs of awards on consecutive
+days, so the streak statistics have something to find. The same seed
+always produces the same rows.
+"""
+
+import math
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Set, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models import Achievement, User, UserAchievement
+from app.models.user import LanguageEnum
+from app.services.aggregates import rebuild_aggregates
+
+INSERT_CHUNK_SIZE = 5000
+
+
+@dataclass
+class DatasetSpec:
+    """Size and shape of a generated dataset."""
+    users: int = 10000
+    achievements: int = 200
+    awards: int = 100000
+    days: int = 365
+    # Share of users given a run of awards on consecutive days
+    streak_fraction: float = 0.1
+    max_streak_days: int = 21
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    """Identifiers of the generated rows."""
+    spec: DatasetSpec
+    user_ids: List[int]
+    achievement_ids: List[int]
+    awarded: Set[Tuple[int, int]] = field(default_factory=set)
+
+
+def _insert_chunks(session: Session, table, rows: List[dict]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        session.execute(insert(table), rows[start:start + INSERT_CHUNK_SIZE])
+
+
+def _reset_sequences(session: Session) -> None:
+    """Move PostgreSQL id sequences past the explicitly inserted ids."""
+    if session.bind.dialect.name != "postgresql":
+        return
+    for table in ("users", "achievements", "user_achievements"):
+        session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+        ))
+
+
+def _award_pairs(spec: DatasetSpec, rng: random.Random) -> List[Tuple[int, int, datetime]]:
+    """(user_id, achievement_id, awarded_at) triples, unique per (user, achievement)."""
+    user_ids = range(1, spec.users + 1)
+    achievement_ids = range(1, spec.achievements + 1)
+    end = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=spec.days)
+
+    awarded: Set[Tuple[int, int]] = set()
+    awards: List[Tuple[int, int, datetime]] = []
+
+    # Consecutive-day runs first, one award per day with distinct achievements
+    streak_users = rng.sample(list(user_ids), int(spec.users * spec.streak_fraction))
+    for user_id in streak_users:
+        length = rng.randint(2, min(spec.max_streak_days, spec.achievements, spec.days))
+        first_day = start + timedelta(days=rng.randrange(spec.days - length + 1))
+        for offset, achievement_id in enumerate(rng.sample(achievement_ids, length)):
+            if len(awards) >= spec.awards:
+                break
+            awarded.add((user_id, achievement_id))
+            awards.append((user_id, achievement_id, first_day + timedelta(days=offset)))
+
+    user_weights = [rng.lognormvariate(0, 1) for _ in user_ids]
+    achievement_weights = [1 / (rank ** 0.8) for rank in range(1, spec.achievements + 1)]
+    rng.shuffle(achievement_weights)
+
+    attempts = 0
+    while len(awards) < spec.awards:
+        batch = spec.awards - len(awards)
+        attempts += batch
+        if attempts > spec.awards * 50:
+            raise ValueError("Could not place the requested number of distinct awards")
+        users = rng.choices(user_ids, weights=user_weights, k=batch)
+        achievements = rng.choices(achievement_ids, weights=achievement_weights, k=batch)
+        for pair in zip(users, achievements):
+            if pair in awarded:
+                continue
+            awarded.add(pair)
+            awarded_at = start + timedelta(seconds=rng.randrange(spec.days * 86400))
+            awards.append((pair[0], pair[1], awarded_at))
+    return awards
+
+
+def generate_dataset(session: Session, spec: DatasetSpec) -> Dataset:
+    """Recreate the schema and load a dataset, then rebuild the aggregates.
+
+    Sync; async callers use ``await db.run_sync(generate_dataset, spec)``.
+    Commits are left to the caller.
+    """
+    if spec.awards > spec.users * spec.achievements:
+        raise ValueError("More awards requested than (user, achievement) pairs exist")
+    rng = random.Random(spec.seed)
+
+    connection = session.connection()
+    Base.metadata.drop_all(connection)
+    Base.metadata.create_all(connection)
+
+    _insert_chunks(session, User.__table__, [
+        {
+            "id": user_id,
+            "username": f"user_{user_id:07d}",
+            "language": LanguageEnum.RU if rng.random() < 0.6 else LanguageEnum.EN,
+        }
+        for user_id in range(1, spec.users + 1)
+    ])
+    _insert_chunks(session, Achievement.__table__, [
+        {
+            "id": achievement_id,
+            "name_ru": f"Достижение {achievement_id}",
+            "name_en": f"Achievement {achievement_id}",
+            "description_ru": f"Описание достижения {achievement_id}",
+            "description_en": f"Description of achievement {achievement_id}",
+            # Rarer achievements are worth more, roughly
+            "points": max(1, int(5 * math.exp(rng.random() * 3))),
+        }
+        for achievement_id in range(1, spec.achievements + 1)
+    ])
+
+    awards = sorted(_award_pairs(spec, rng), key=lambda award: award[2])
+    _insert_chunks(session, UserAchievement.__table__, [
+        {"id": award_id, "user_id": user_id, "achievement_id": achievement_id, "awarded_at": awarded_at}
+        for award_id, (user_id, achievement_id, awarded_at) in enumerate(awards, start=1)
+    ])
+
+    _reset_sequences(session)
+    rebuild_aggregates(session)
+    return Dataset(
+        spec=spec,
+        user_ids=list(range(1, spec.users + 1)),
+        achievement_ids=list(range(1, spec.achievements + 1)),
+        awarded={(user_id, achievement_id) for user_id, achievement_id, _ in awards},
+    )